@@ -0,0 +1,55 @@
+"""Baseline schema: people and JSON face encodings
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created before migrations were introduced are stamped with this
+revision by init_db() and upgraded from here.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'people',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=True),
+        sa.Column('is_verified', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_people_id', 'people', ['id'])
+    op.create_index('ix_people_name', 'people', ['name'])
+    op.create_index('ix_people_email', 'people', ['email'], unique=True)
+
+    op.create_table(
+        'face_encodings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('person_id', sa.Integer(), nullable=True),
+        sa.Column('encoding', sa.Text(), nullable=False),
+        sa.Column('image_path', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_face_encodings_id', 'face_encodings', ['id'])
+    op.create_index('ix_face_encodings_person_id', 'face_encodings', ['person_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('face_encodings')
+    op.drop_table('people')
@@ -0,0 +1,114 @@
+"""Binary embeddings, gallery version and person prototypes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:05:00
+
+Replaces the ad-hoc migrate_encodings() that used to run from init_db().
+Databases that already went through it, or were created with
+Base.metadata.create_all(), have some of these objects, so every step
+checks the live schema first.
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+from app.database.embeddings import encode_embedding, decode_embedding
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    # Metadata columns for binary encodings
+    columns = {column['name'] for column in inspector.get_columns('face_encodings')}
+    with op.batch_alter_table('face_encodings') as batch_op:
+        if 'dim' not in columns:
+            batch_op.add_column(sa.Column('dim', sa.Integer(), nullable=True))
+        if 'dtype' not in columns:
+            batch_op.add_column(sa.Column('dtype', sa.String(length=16), nullable=True))
+        if 'model_name' not in columns:
+            batch_op.add_column(sa.Column('model_name', sa.String(length=50), nullable=True))
+    if 'ix_face_encodings_model_name' not in {index['name'] for index in inspector.get_indexes('face_encodings')}:
+        op.create_index('ix_face_encodings_model_name', 'face_encodings', ['model_name'])
+
+    # SQLite keeps BLOB values in the old TEXT column as-is, so legacy JSON
+    # rows are rewritten in place with their blob, dimension, dtype and model
+    legacy_rows = conn.execute(sa.text(
+        "SELECT id, encoding FROM face_encodings WHERE typeof(encoding) = 'text'"
+    )).fetchall()
+    for row_id, encoding in legacy_rows:
+        vector = json.loads(encoding)
+        conn.execute(
+            sa.text(
+                "UPDATE face_encodings SET encoding = :encoding, dim = :dim, "
+                "dtype = :dtype, model_name = :model_name WHERE id = :id"
+            ),
+            {
+                "encoding": encode_embedding(vector, settings.EMBEDDING_DTYPE),
+                "dim": len(vector),
+                "dtype": settings.EMBEDDING_DTYPE,
+                # Legacy rows were produced by the configured model
+                "model_name": settings.FACE_RECOGNITION_MODEL,
+                "id": row_id,
+            }
+        )
+
+    if 'person_prototypes' not in tables:
+        op.create_table(
+            'person_prototypes',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('person_id', sa.Integer(), nullable=False),
+            sa.Column('encoding', sa.LargeBinary(), nullable=False),
+            sa.Column('dim', sa.Integer(), nullable=False),
+            sa.Column('dtype', sa.String(length=16), nullable=False),
+            sa.Column('model_name', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_person_prototypes_id', 'person_prototypes', ['id'])
+        op.create_index('ix_person_prototypes_person_id', 'person_prototypes', ['person_id'])
+        op.create_index('ix_person_prototypes_model_name', 'person_prototypes', ['model_name'])
+
+    if 'gallery_state' not in tables:
+        op.create_table(
+            'gallery_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    # Seed the gallery version row so writers only ever need an UPDATE
+    if conn.execute(sa.text("SELECT id FROM gallery_state")).first() is None:
+        conn.execute(sa.text("INSERT INTO gallery_state (id, version) VALUES (1, 0)"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    blob_rows = conn.execute(sa.text(
+        "SELECT id, encoding, dtype FROM face_encodings WHERE typeof(encoding) = 'blob'"
+    )).fetchall()
+    for row_id, encoding, dtype in blob_rows:
+        conn.execute(
+            sa.text("UPDATE face_encodings SET encoding = :encoding WHERE id = :id"),
+            {"encoding": json.dumps(decode_embedding(encoding, dtype or 'float32').tolist()), "id": row_id}
+        )
+
+    op.drop_table('gallery_state')
+    op.drop_table('person_prototypes')
+    op.drop_index('ix_face_encodings_model_name', table_name='face_encodings')
+    with op.batch_alter_table('face_encodings') as batch_op:
+        batch_op.drop_column('model_name')
+        batch_op.drop_column('dtype')
+        batch_op.drop_column('dim')
@@ -0,0 +1,99 @@
+"""Foreign keys with cascading deletes, unique names and covering indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00
+
+- face_encodings.person_id and person_prototypes.person_id reference
+  people.id with ON DELETE CASCADE; orphaned rows are removed first
+- people.name becomes unique; existing duplicates get their id appended
+- face_encodings.model_name/dim/dtype become NOT NULL so a scan can never
+  mix embeddings of different models or sizes
+- (person_id, model_name, dim) covers per-person lookups and counts and
+  (model_name, dim) covers the gallery scan
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+
+    # Rows the new constraints would reject
+    conn.execute(sa.text(
+        "DELETE FROM face_encodings WHERE person_id IS NULL "
+        "OR person_id NOT IN (SELECT id FROM people)"
+    ))
+    conn.execute(sa.text(
+        "DELETE FROM person_prototypes WHERE person_id NOT IN (SELECT id FROM people)"
+    ))
+    conn.execute(
+        sa.text("UPDATE face_encodings SET dtype = 'float32' WHERE dtype IS NULL")
+    )
+    conn.execute(
+        sa.text("UPDATE face_encodings SET model_name = :model_name WHERE model_name IS NULL"),
+        {"model_name": settings.FACE_RECOGNITION_MODEL}
+    )
+    conn.execute(sa.text(
+        "UPDATE face_encodings SET dim = length(encoding) / "
+        "CASE dtype WHEN 'float16' THEN 2 ELSE 4 END WHERE dim IS NULL"
+    ))
+    conn.execute(sa.text(
+        "UPDATE people SET name = name || ' (' || id || ')' WHERE id NOT IN "
+        "(SELECT MIN(id) FROM people GROUP BY name)"
+    ))
+
+    with op.batch_alter_table('face_encodings', recreate='always') as batch_op:
+        batch_op.alter_column('person_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('encoding', existing_type=sa.Text(), type_=sa.LargeBinary(), existing_nullable=False)
+        batch_op.alter_column('dim', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('dtype', existing_type=sa.String(length=16), nullable=False)
+        batch_op.alter_column('model_name', existing_type=sa.String(length=50), nullable=False)
+        batch_op.create_foreign_key(
+            'fk_face_encodings_person_id_people', 'people', ['person_id'], ['id'], ondelete='CASCADE'
+        )
+        batch_op.drop_index('ix_face_encodings_person_id')
+        batch_op.drop_index('ix_face_encodings_model_name')
+        batch_op.create_index('ix_face_encodings_person_model', ['person_id', 'model_name', 'dim'])
+        batch_op.create_index('ix_face_encodings_model_dim', ['model_name', 'dim'])
+
+    with op.batch_alter_table('person_prototypes', recreate='always') as batch_op:
+        batch_op.create_foreign_key(
+            'fk_person_prototypes_person_id_people', 'people', ['person_id'], ['id'], ondelete='CASCADE'
+        )
+
+    op.drop_index('ix_people_name', table_name='people')
+    op.create_index('ix_people_name', 'people', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_people_name', table_name='people')
+    op.create_index('ix_people_name', 'people', ['name'])
+
+    with op.batch_alter_table('person_prototypes', recreate='always') as batch_op:
+        batch_op.drop_constraint('fk_person_prototypes_person_id_people', type_='foreignkey')
+
+    with op.batch_alter_table('face_encodings', recreate='always') as batch_op:
+        batch_op.drop_index('ix_face_encodings_model_dim')
+        batch_op.drop_index('ix_face_encodings_person_model')
+        batch_op.create_index('ix_face_encodings_model_name', ['model_name'])
+        batch_op.create_index('ix_face_encodings_person_id', ['person_id'])
+        # The column keeps its BLOB type: a batch copy would CAST the blobs to text
+        batch_op.drop_constraint('fk_face_encodings_person_id_people', type_='foreignkey')
+        batch_op.alter_column('model_name', existing_type=sa.String(length=50), nullable=True)
+        batch_op.alter_column('dtype', existing_type=sa.String(length=16), nullable=True)
+        batch_op.alter_column('dim', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('person_id', existing_type=sa.Integer(), nullable=True)
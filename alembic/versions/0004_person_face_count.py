@@ -0,0 +1,35 @@
+"""Denormalized face count on people
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:20:00
+
+people.face_count is kept in step with face_encodings by DatabaseService,
+so person lookups and the people listing never read the encodings table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('people', sa.Column('face_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE people SET face_count = "
+        "(SELECT COUNT(*) FROM face_encodings WHERE face_encodings.person_id = people.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('people') as batch_op:
+        batch_op.drop_column('face_count')
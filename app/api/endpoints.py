@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
-from typing import List, Optional
-import os
-import uuid
-from pathlib import Path
+from typing import List, Optional, Tuple
+import asyncio
+import io
+import tarfile
+import zipfile
 
 from app.database.models import Person, FaceEncoding, get_db
-from app.services.face_service import FaceService
+from app.services.face_service import FaceService, decode_image
+from app.services.face_tracker import FaceTracker
 from app.services.db_service import DatabaseService
+from app.services.executors import inference_executor, io_executor, ExecutorBusy
+from app.services.sharded_gallery import ShardsUnavailable
+from app.services.embedding_cache import embedding_cache
 from sqlalchemy.orm import Session
 from app.config import settings
 
 router = APIRouter()
 
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+
 def get_face_service(db: Session = Depends(get_db)) -> FaceService:
     """Dependency to get FaceService instance"""
     db_service = DatabaseService(db)
@@ -34,45 +42,37 @@ async def register_person(
         images: List of face images (10 images recommended for better accuracy)
     """
     try:
-        # Save uploaded images to temporary files
-        temp_paths = []
+        # Read uploaded images into memory
+        contents = []
         for img in images:
             # Validate file type
             if not img.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
                 raise HTTPException(status_code=400, detail="Only .png, .jpg and .jpeg files are allowed")
             
-            # Create a temporary file
-            file_ext = Path(img.filename).suffix
-            temp_file = f"/tmp/{uuid.uuid4()}{file_ext}"
-            
-            # Save the uploaded file
-            with open(temp_file, "wb") as buffer:
-                buffer.write(await img.read())
-                
-            temp_paths.append(temp_file)
+            contents.append(await img.read())
         
-        # Register the person with the face service
-        result = face_service.register_person(name, temp_paths, email)
+        # Decode each upload exactly once
+        frames = await io_executor.run(lambda: [decode_image(data) for data in contents])
         
-        # Clean up temporary files
-        for path in temp_paths:
-            try:
-                os.remove(path)
-            except:
-                pass
+        # Register the person with the face service
+        result = await inference_executor.run(
+            face_service.register_person_frames,
+            name,
+            frames,
+            email,
+            [img.filename for img in images]
+        )
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
             
         return {"status": "success", "person_id": result["person_id"], "name": name}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up any temporary files if an error occurs
-        for path in temp_paths:
-            try:
-                os.remove(path)
-            except:
-                pass
+        if isinstance(e, (ExecutorBusy, ShardsUnavailable)):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/recognize")
@@ -91,22 +91,12 @@ async def recognize_face(
         if not image.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             raise HTTPException(status_code=400, detail="Only .png, .jpg and .jpeg files are allowed")
         
-        # Create a temporary file
-        file_ext = Path(image.filename).suffix
-        temp_file = f"/tmp/{uuid.uuid4()}{file_ext}"
-        
-        # Save the uploaded file
-        with open(temp_file, "wb") as buffer:
-            buffer.write(await image.read())
+        # Decode the upload straight from memory
+        contents = await image.read()
+        frame = await io_executor.run(decode_image, contents)
         
         # Recognize the face
-        result = face_service.recognize_face(temp_file)
-        
-        # Clean up
-        try:
-            os.remove(temp_file)
-        except:
-            pass
+        result = await inference_executor.run(face_service.recognize_frame, frame)
         
         if result["status"] == "no_face":
             return {"status": "no_face", "message": "No face detected in the image"}
@@ -120,14 +110,204 @@ async def recognize_face(
             "confidence": result["person"]["confidence"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up temporary file if an error occurs
+        if isinstance(e, (ExecutorBusy, ShardsUnavailable)):
+            raise
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _read_archive(filename: str, data: bytes, max_images: int) -> List[Tuple[str, bytes]]:
+    """Extract the images of a zip or tar archive in memory
+    
+    Entry sizes are checked before anything is decompressed, so an archive
+    with too many or too large images is refused without inflating it.
+    """
+    entries = []
+    total = 0
+    
+    def check(name: str, size: int) -> None:
+        nonlocal total
+        if len(entries) >= max_images:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_IMAGES} images per batch")
+        if size > settings.BATCH_MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image {name} is larger than {settings.BATCH_MAX_IMAGE_BYTES} bytes")
+        total += size
+        if total > settings.BATCH_MAX_ARCHIVE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Archive images exceed {settings.BATCH_MAX_ARCHIVE_BYTES} bytes")
+    
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    check(info.filename, info.file_size)
+                    # Reads stop at the declared file_size
+                    entries.append((info.filename, archive.read(info)))
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+            # Iterate lazily rather than indexing every member up front
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    check(member.name, member.size)
+                    entries.append((member.name, archive.extractfile(member).read()))
+    return entries
+
+@router.post("/recognize/batch")
+async def recognize_batch(
+    images: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    top_k: int = Form(settings.BATCH_TOP_K),
+    face_service: FaceService = Depends(get_face_service)
+):
+    """
+    Recognize every face in a batch of images
+    
+    Args:
+        images: Images to recognize
+        archive: A .zip or .tar(.gz) archive of images, instead of or in addition to images
+        top_k: Number of candidate people to return per face
+    """
+    try:
+        uploads = []
+        for img in images or []:
+            # Validate file type
+            if not img.filename.lower().endswith(IMAGE_EXTENSIONS):
+                raise HTTPException(status_code=400, detail="Only .png, .jpg and .jpeg files are allowed")
+            uploads.append((img.filename, await img.read()))
+        
+        if archive is not None:
+            if not archive.filename.lower().endswith(ARCHIVE_EXTENSIONS):
+                raise HTTPException(status_code=400, detail="Only .zip, .tar, .tar.gz and .tgz archives are allowed")
+            uploads.extend(await io_executor.run(
+                _read_archive, archive.filename, await archive.read(), settings.BATCH_MAX_IMAGES - len(uploads)
+            ))
+        
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No images provided")
+        if len(uploads) > settings.BATCH_MAX_IMAGES:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_IMAGES} images per batch")
+        
+        # Decode each image exactly once
+        frames = await io_executor.run(lambda: [decode_image(data) for _, data in uploads])
+        
+        # Detect, embed and match the whole batch together
+        results = await inference_executor.run(face_service.recognize_frames, frames, max(1, top_k))
+        
+        return {
+            "status": "success",
+            "results": [
+                {"filename": filename, **result}
+                for (filename, _), result in zip(uploads, results)
+            ]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        if isinstance(e, (ExecutorBusy, ShardsUnavailable)):
+            raise
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.websocket("/recognize/stream")
+async def recognize_stream(
+    websocket: WebSocket,
+    face_service: FaceService = Depends(get_face_service)
+):
+    """
+    Recognize faces in a live stream of JPEG/PNG frames sent as binary messages
+    
+    Each processed frame is answered with a JSON message holding one entry per
+    tracked face. Frames that arrive while the previous one is still being
+    processed are dropped, so results stay close to real time.
+    """
+    await websocket.accept()
+    tracker = FaceTracker()
+    latest = {"data": None, "received": 0, "closed": False}
+    frame_ready = asyncio.Event()
+    
+    async def receive_frames():
         try:
-            if 'temp_file' in locals() and os.path.exists(temp_file):
-                os.remove(temp_file)
-        except:
+            while True:
+                latest["data"] = await websocket.receive_bytes()
+                latest["received"] += 1
+                frame_ready.set()
+        except (WebSocketDisconnect, RuntimeError, KeyError):
             pass
-        raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            latest["closed"] = True
+            frame_ready.set()
+    
+    receiver = asyncio.create_task(receive_frames())
+    processed = 0
+    try:
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if latest["closed"]:
+                break
+            
+            data, frame_number = latest["data"], latest["received"]
+            try:
+                frame = await io_executor.run(decode_image, data)
+                result = await inference_executor.run(face_service.recognize_tracked_frame, frame, tracker)
+            except (ExecutorBusy, ShardsUnavailable) as e:
+                result = {"status": "busy", "message": str(e), "tracks": []}
+            except Exception as e:
+                result = {"status": "error", "message": str(e), "tracks": []}
+            
+            processed += 1
+            await websocket.send_json({
+                "frame": frame_number,
+                "dropped": frame_number - processed,
+                **result
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+
+def _person_summary(person: Person) -> dict:
+    """Public fields of a person, including the stored face count"""
+    return {
+        "id": person.id,
+        "name": person.name,
+        "email": person.email,
+        "is_verified": bool(person.is_verified),
+        "face_count": person.face_count,
+        "created_at": person.created_at
+    }
+
+@router.get("/people")
+async def list_people(
+    after: Optional[int] = Query(None, description="ID of the last person on the previous page"),
+    limit: int = Query(settings.PEOPLE_PAGE_SIZE, ge=1, le=settings.PEOPLE_MAX_PAGE_SIZE),
+    name: Optional[str] = Query(None, description="Only people whose name starts with this"),
+    min_faces: Optional[int] = Query(None, ge=0),
+    verified: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    List registered people ordered by ID, one page at a time
+    
+    Args:
+        after: Cursor from the previous page's next_after; omit for the first page
+        limit: Maximum number of people per page
+        name: Name prefix filter
+        min_faces: Only people with at least this many face encodings
+        verified: Only verified or unverified people
+    """
+    db_service = DatabaseService(db)
+    # Fetch one extra row to know whether another page follows
+    people = await io_executor.run(
+        db_service.list_people, after, limit + 1, name, min_faces, verified
+    )
+    
+    has_more = len(people) > limit
+    people = people[:limit]
+    return {
+        "people": [_person_summary(person) for person in people],
+        "next_after": people[-1].id if has_more else None
+    }
 
 @router.get("/person/{person_id}")
 async def get_person(
@@ -138,20 +318,43 @@ async def get_person(
     Get person details by ID
     """
     db_service = DatabaseService(db)
-    person = db_service.get_person(person_id)
+    person = await io_executor.run(db_service.get_person, person_id)
     
     if not person:
         raise HTTPException(status_code=404, detail="Person not found")
         
-    # Get all face encodings for this person
-    encodings = db_service.get_person_encodings(person_id)
+    return _person_summary(person)
+
+@router.get("/person/{person_id}/faces")
+async def get_person_faces(
+    person_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Get metadata of a person's stored face encodings, without the embeddings
+    """
+    db_service = DatabaseService(db)
+    person = await io_executor.run(db_service.get_person, person_id)
+    
+    if not person:
+        raise HTTPException(status_code=404, detail="Person not found")
+        
+    faces = await io_executor.run(db_service.get_person_face_metadata, person_id)
     
     return {
-        "id": person.id,
-        "name": person.name,
-        "email": person.email,
-        "face_count": len(encodings),
-        "created_at": person.created_at
+        "person_id": person.id,
+        "face_count": person.face_count,
+        "faces": [
+            {
+                "id": face.id,
+                "image_path": face.image_path,
+                "model_name": face.model_name,
+                "dim": face.dim,
+                "dtype": face.dtype,
+                "created_at": face.created_at
+            }
+            for face in faces
+        ]
     }
 
 @router.delete("/person/{person_id}")
@@ -163,9 +366,16 @@ async def delete_person(
     Delete a person and all their face encodings
     """
     db_service = DatabaseService(db)
-    success = db_service.delete_person(person_id)
+    success = await io_executor.run(db_service.delete_person, person_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Person not found")
         
     return {"status": "success", "message": "Person deleted successfully"}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Get hit, miss and eviction counters of the embedding cache
+    """
+    return embedding_cache.stats()
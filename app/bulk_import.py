@@ -0,0 +1,246 @@
+"""Bulk enrollment of large identity datasets.
+
+Reads either a directory tree (one sub-folder of images per person) or a CSV
+manifest with `name,image_path[,email]` rows, embeds faces with a pool of
+worker processes and writes people and encodings in large transactions.
+Finished people are appended to a checkpoint file so an interrupted import
+resumes where it stopped.
+
+Usage:
+    python -m app.bulk_import /data/roster
+    python -m app.bulk_import manifest.csv --workers 8 --commit-every 1000
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+import cv2
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def load_roster(source: Path) -> "OrderedDict[str, Dict[str, Any]]":
+    """Map each person name to their email and image paths"""
+    roster: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    if source.is_dir():
+        for person_dir in sorted(p for p in source.iterdir() if p.is_dir()):
+            images = sorted(
+                str(p) for p in person_dir.rglob("*")
+                if p.suffix.lower() in IMAGE_EXTENSIONS
+            )
+            if images:
+                roster[person_dir.name.replace("_", " ")] = {"email": None, "images": images}
+        return roster
+
+    with open(source, newline="") as manifest:
+        for row in csv.DictReader(manifest):
+            name = (row.get("name") or "").strip()
+            image_path = (row.get("image_path") or "").strip()
+            if not name or not image_path:
+                continue
+            # Relative image paths are relative to the manifest
+            if not os.path.isabs(image_path):
+                image_path = str(source.parent / image_path)
+            entry = roster.setdefault(name, {"email": None, "images": []})
+            entry["images"].append(image_path)
+            entry["email"] = entry["email"] or (row.get("email") or "").strip() or None
+    return roster
+
+def load_checkpoint(path: Path) -> set:
+    """Names already imported by a previous run"""
+    if not path.exists():
+        return set()
+    with open(path) as checkpoint:
+        return {line.rstrip("\n") for line in checkpoint if line.strip()}
+
+def _init_worker() -> None:
+    """Load the model once per worker process"""
+    from app.services.model_manager import model_manager
+    model_manager.load(warm_up=False)
+
+def embed_person(name: str, image_paths: List[str]) -> Tuple[str, List[Tuple[str, list]], List[Tuple[str, str]]]:
+    """Detect and embed the first face of every image of one person.
+
+    Runs inside a worker process.
+
+    Returns:
+        (name, [(image_path, embedding)], [(image_path, rejection reason)])
+    """
+    from app.services.model_manager import model_manager
+
+    accepted_paths = []
+    crops = []
+    rejected = []
+    for image_path in image_paths:
+        frame = cv2.imread(image_path)
+        if frame is None:
+            rejected.append((image_path, "unreadable image"))
+            continue
+        try:
+            faces = model_manager.extract_faces(frame, enforce_detection=True)
+        except Exception as e:
+            rejected.append((image_path, f"no face detected: {str(e)}"))
+            continue
+        # Use the first detected face, like FaceService.register_person
+        accepted_paths.append(image_path)
+        crops.append(faces[0]["face"])
+
+    encodings = []
+    if crops:
+        try:
+            embeddings = model_manager.embed_batch(crops)
+            encodings = [(path, embedding.tolist()) for path, embedding in zip(accepted_paths, embeddings)]
+        except Exception as e:
+            rejected.extend((path, f"embedding failed: {str(e)}") for path in accepted_paths)
+
+    return name, encodings, rejected
+
+def run_import(
+    source: Path,
+    workers: int,
+    commit_every: int,
+    checkpoint_path: Path,
+    rejects_path: Path
+) -> Dict[str, Any]:
+    """Import a roster and return throughput statistics"""
+    from app.database.models import init_db, get_db
+    from app.services.db_service import DatabaseService
+
+    init_db()
+    roster = load_roster(source)
+    done = load_checkpoint(checkpoint_path)
+
+    stats = {"people": 0, "images": 0, "encodings": 0, "rejected": 0, "skipped": 0, "duplicates": 0}
+    started = time.perf_counter()
+
+    for db in get_db():
+        db_service = DatabaseService(db)
+
+        # Skip people finished by an earlier run or registered some other way
+        pending = [name for name in roster if name not in done]
+        existing = db_service.get_existing_names(pending)
+        stats["skipped"] = len(roster) - len(pending) + len(existing)
+        pending = [name for name in pending if name not in existing]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+                open(checkpoint_path, "a") as checkpoint, \
+                open(rejects_path, "a", newline="") as rejects_file:
+            rejects = csv.writer(rejects_file)
+
+            def write(people: List[Dict[str, Any]]) -> List[str]:
+                """Write a batch in one transaction; returns the names that could not be written"""
+                try:
+                    db_service.add_people_bulk(people)
+                    return []
+                except IntegrityError:
+                    db.rollback()
+                if len(people) == 1:
+                    return [people[0]["name"]]
+                # Someone in the batch clashes on name or email; find them person by person
+                return [name for person in people for name in write([person])]
+
+            def flush(people: List[Dict[str, Any]], finished: List[str]) -> None:
+                # One transaction for the whole batch of people
+                duplicates = set(write(people)) if people else set()
+                for person in people:
+                    if person["name"] in duplicates:
+                        rejects.writerow((person["name"], "", "name or email already registered"))
+                        continue
+                    stats["people"] += 1
+                    stats["encodings"] += len(person["encodings"])
+                stats["duplicates"] += len(duplicates)
+
+                # Only checkpoint what is committed; clashing people are retried by the next run
+                checkpoint.writelines(f"{name}\n" for name in finished if name not in duplicates)
+                checkpoint.flush()
+                rejects_file.flush()
+
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{stats['people']} people, {stats['images']} images "
+                    f"({stats['images'] / elapsed:.1f} images/s), {stats['rejected']} rejected"
+                )
+
+            # Keep only a few people per worker in flight, so memory does not grow with the roster
+            window = 4 * workers
+            queue = iter(pending)
+            running = set()
+
+            people = []
+            finished = []
+            while True:
+                for name in queue:
+                    running.add(pool.submit(embed_person, name, roster[name]["images"]))
+                    if len(running) >= window:
+                        break
+                if not running:
+                    break
+
+                completed, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    name, encodings, rejected = future.result()
+                    finished.append(name)
+                    stats["images"] += len(encodings) + len(rejected)
+                    stats["rejected"] += len(rejected)
+                    rejects.writerows((name, path, reason) for path, reason in rejected)
+                    if encodings:
+                        people.append({
+                            "name": name,
+                            "email": roster[name]["email"],
+                            "encodings": encodings
+                        })
+
+                if len(finished) >= commit_every:
+                    flush(people, finished)
+                    people, finished = [], []
+
+            if finished:
+                flush(people, finished)
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["images_per_second"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-enroll people from a directory tree or CSV manifest")
+    parser.add_argument("source", type=Path, help="Directory with one sub-folder per person, or a CSV manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Embedding worker processes")
+    parser.add_argument("--commit-every", type=int, default=500, help="People written per transaction")
+    parser.add_argument("--checkpoint", type=Path, help="Resume file (default: <source>.checkpoint)")
+    parser.add_argument("--rejects", type=Path, help="CSV of rejected images (default: <source>.rejects.csv)")
+    args = parser.parse_args(argv)
+
+    if not args.source.exists():
+        print(f"Error: {args.source} does not exist")
+        return 1
+
+    base = str(args.source).rstrip("/")
+    stats = run_import(
+        args.source,
+        workers=max(1, args.workers),
+        commit_every=max(1, args.commit_every),
+        checkpoint_path=args.checkpoint or Path(f"{base}.checkpoint"),
+        rejects_path=args.rejects or Path(f"{base}.rejects.csv")
+    )
+
+    print(
+        f"Imported {stats['people']} people with {stats['encodings']} encodings "
+        f"from {stats['images']} images in {stats['seconds']:.1f}s "
+        f"({stats['images_per_second']:.1f} images/s); "
+        f"{stats['rejected']} images rejected, {stats['skipped']} people skipped, "
+        f"{stats['duplicates']} people already registered under their name or email"
+    )
+    print(f"Model: {settings.FACE_RECOGNITION_MODEL}, detector: {settings.FACE_DETECTION_MODEL}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
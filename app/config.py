@@ -1,7 +1,6 @@
-import os
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Set
+from typing import Optional, Set
 from pathlib import Path
 
 # Base directory
@@ -14,12 +13,93 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = f"sqlite:///{BASE_DIR}/faceid.db"
+    SQLITE_WAL: bool = True  # Readers never block the single writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL; FULL fsyncs on every commit
+    SQLITE_CACHE_SIZE_MB: int = 64  # Page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait this long for the write lock before failing
     
     # Face recognition settings
     FACE_DETECTION_MODEL: str = "opencv"
     FACE_RECOGNITION_MODEL: str = "Facenet"
-    DISTANCE_METRIC: str = "cosine"
-    THRESHOLD: float = 0.6
+    DISTANCE_METRIC: str = "cosine"  # "cosine", "euclidean" or "euclidean_l2"
+    THRESHOLD: Optional[float] = None  # Max match distance; unset uses DeepFace's value for the model and metric
+    WARM_UP_MODELS: bool = True  # Run a synthetic inference at startup
+    BACKGROUND_MODEL_LOAD: bool = True  # Serve CRUD endpoints while the model loads; /readyz turns 200 when done
+    FACE_MODEL_BACKEND: str = "deepface"  # "stub" fakes detection and embedding to benchmark without TensorFlow
+    STUB_MODEL_LATENCY_MS: float = 0.0  # Simulated forward pass time per batch with the stub backend
+    
+    # Inference batching settings
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+    INFERENCE_MAX_WAIT_MS: float = 5.0  # How long to wait for more crops to join a batch
+    
+    # Executor settings (requests beyond workers + queue get a 503)
+    INFERENCE_WORKERS: int = 4
+    INFERENCE_QUEUE_SIZE: int = 32
+    IO_WORKERS: int = 8
+    IO_QUEUE_SIZE: int = 128
+    RETRY_AFTER_SECONDS: int = 1
+    
+    # Multi-worker settings (python -m app.serve)
+    SERVE_WORKERS: int = 0  # uvicorn worker processes; 0 starts one per CPU
+    SHARED_GALLERY_DIR: str = ""  # Set by app.serve: workers map the gallery published here read-only
+    SHARED_GALLERY_POLL_SECONDS: float = 0.25  # How often the launcher checks the database for gallery changes
+    SHARED_GALLERY_WAIT_SECONDS: float = 30.0  # How long a starting worker waits for the first published gallery
+    
+    # Sharded gallery settings (python -m app.shard_worker)
+    GALLERY_SHARDS: str = ""  # Comma-separated shard worker URLs; empty keeps the whole gallery in this process
+    SHARD_TIMEOUT_MS: float = 250.0  # Deadline for the shards to answer a search
+    SHARD_ALLOW_PARTIAL: bool = True  # Answer from the shards that made the deadline; false fails the search with a 503
+    SHARD_POLL_SECONDS: float = 0.25  # How often a shard worker checks the database for gallery changes
+    
+    # Observability settings
+    SLOW_REQUEST_MS: float = 1000.0  # Log the stage breakdown of slower requests; 0 disables
+    
+    # Batch recognition settings
+    BATCH_MAX_IMAGES: int = 64
+    BATCH_MAX_IMAGE_BYTES: int = 20 * 1024 * 1024  # Largest uncompressed image accepted from an archive
+    BATCH_MAX_ARCHIVE_BYTES: int = 256 * 1024 * 1024  # Largest total of uncompressed images per archive
+    BATCH_TOP_K: int = 3
+    EMBEDDING_DTYPE: str = "float32"  # On-disk precision: float32 or float16
+    
+    # People listing settings
+    PEOPLE_PAGE_SIZE: int = 50
+    PEOPLE_MAX_PAGE_SIZE: int = 500
+    
+    # Gallery index settings
+    GALLERY_COMPACT_RATIO: float = 0.25  # Compact once this share of rows is deleted
+    GALLERY_DTYPE: str = "float32"  # In-memory matrix precision: float16 halves memory, searches a little slower
+    SEARCH_BACKEND: str = "exact"  # "exact" brute-force scan or "ivfpq" approximate search
+    ANN_MIN_GALLERY_SIZE: int = 20000  # Smaller galleries always use the exact scan
+    ANN_NLIST: int = 0  # Number of IVF lists; 0 picks about 4 * sqrt(gallery size)
+    ANN_NPROBE: int = 16  # Lists scanned per probe: higher means better recall, slower search
+    ANN_PQ_SUBVECTORS: int = 16  # One-byte PQ codes per embedding
+    ANN_RERANK: int = 100  # Shortlist size re-ranked with exact distances
+    ANN_TRAIN_SAMPLE: int = 65536
+    ANN_RETRAIN_GROWTH: float = 4.0  # Retrain in the background once the gallery is this many times the trained size; 0 disables
+    ANN_INDEX_PATH: str = str(BASE_DIR / "faceid.ann.npz")
+    
+    # Two-stage matching: shortlist people by prototype, then compare their encodings
+    TWO_STAGE_MATCHING: bool = True
+    PROTOTYPE_SHORTLIST: int = 20  # People compared in full per probe
+    PROTOTYPE_CLUSTERS: int = 3  # Sub-centroids for people with many images
+    PROTOTYPE_MIN_IMAGES: int = 6  # Images needed before sub-centroids are computed
+    
+    # Streaming recognition settings
+    STREAM_DETECTOR_BACKEND: str = "opencv"  # Fast detector run on every streamed frame
+    STREAM_IOU_THRESHOLD: float = 0.3  # Minimum overlap to continue a track
+    STREAM_MAX_MISSED_FRAMES: int = 10  # Frames a track survives without a detection
+    STREAM_REEMBED_SECONDS: float = 2.0  # Identities older than this are recomputed
+    STREAM_APPEARANCE_THRESHOLD: float = 0.6  # Thumbnail change that forces a new embedding
+    STREAM_FRAME_SKIP: int = 1  # Ingestion worker: process every Nth frame of a source
+    STREAM_MAX_FPS: float = 0.0  # Ingestion worker: per-source frame cap, 0 for none
+    STREAM_QUEUE_SIZE: int = 4  # Ingestion worker: frames buffered per source before dropping the oldest
+    STREAM_RECONNECT_SECONDS: float = 2.0
+    
+    # Embedding cache settings (keyed by image content hash)
+    EMBEDDING_CACHE_SIZE: int = 1024  # Images kept in memory, 0 disables the cache
+    EMBEDDING_CACHE_TTL_SECONDS: float = 3600.0
+    EMBEDDING_CACHE_PATH: str = ""  # SQLite file for a cache that survives restarts, empty for memory only
+    EMBEDDING_CACHE_DISK_SIZE: int = 100000  # Images kept in the on-disk cache
     
     # Storage settings
     UPLOAD_FOLDER: str = str(BASE_DIR / "captured_faces")
@@ -32,6 +112,3 @@ class Settings(BaseSettings):
 
 # Create instance
 settings = Settings()
-
-# Create upload folder if it doesn't exist
-os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
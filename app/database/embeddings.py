@@ -0,0 +1,35 @@
+import numpy as np
+from typing import Sequence
+
+# Supported on-disk embedding formats, always little-endian
+EMBEDDING_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+def _resolve_dtype(dtype: str) -> np.dtype:
+    """Map a dtype tag stored next to an embedding to a NumPy dtype"""
+    try:
+        return EMBEDDING_DTYPES[dtype]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'")
+
+def encode_embedding(embedding, dtype: str = "float32") -> bytes:
+    """Serialize a single embedding into a compact binary blob"""
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    return vector.astype(_resolve_dtype(dtype)).tobytes()
+
+def decode_embedding(blob: bytes, dtype: str = "float32") -> np.ndarray:
+    """Deserialize a single embedding blob into a float32 vector"""
+    return np.frombuffer(blob, dtype=_resolve_dtype(dtype)).astype(np.float32)
+
+def decode_embeddings(blobs: Sequence[bytes], dim: int, dtype: str = "float32") -> np.ndarray:
+    """Deserialize a whole result set of equally sized blobs into one matrix.
+
+    The blobs are joined and decoded with a single np.frombuffer call instead
+    of building a Python list per row.
+    """
+    if not blobs:
+        return np.empty((0, dim), dtype=np.float32)
+    matrix = np.frombuffer(b"".join(blobs), dtype=_resolve_dtype(dtype))
+    return matrix.reshape(len(blobs), dim).astype(np.float32)
@@ -1,10 +1,36 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import create_engine, event, inspect, Column, ForeignKey, Index, Integer, String, DateTime, Boolean, LargeBinary
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import func
-from app.config import settings
+from app.config import settings, BASE_DIR
 
-# Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+def create_db_engine(url: str, wal: bool = None) -> Engine:
+    """Create an engine; SQLite connections get WAL and tuned pragmas on connect"""
+    if not url.startswith("sqlite"):
+        return create_engine(url)
+    
+    wal = settings.SQLITE_WAL if wal is None else wal
+    db_engine = create_engine(url, connect_args={"check_same_thread": False})
+    
+    @event.listens_for(db_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_MB * 1024}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        # SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked to
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+    
+    return db_engine
+
+# Create SQLAlchemy engine and the session factory shared by every request
+engine = create_db_engine(settings.DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class Person(Base):
@@ -12,9 +38,10 @@ class Person(Base):
     __tablename__ = "people"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(100), nullable=False, index=True)
+    name = Column(String(100), nullable=False, unique=True, index=True)
     email = Column(String(100), unique=True, index=True, nullable=True)
     is_verified = Column(Boolean, default=False)
+    face_count = Column(Integer, nullable=False, default=0, server_default="0")  # Kept in step with face_encodings
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -23,19 +50,63 @@ class FaceEncoding(Base):
     __tablename__ = "face_encodings"
     
     id = Column(Integer, primary_key=True, index=True)
-    person_id = Column(Integer, index=True)
-    encoding = Column(Text, nullable=False)  # JSON string of the face encoding
+    person_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), nullable=False)
+    encoding = Column(LargeBinary, nullable=False)  # Little-endian float32/float16 bytes
+    dim = Column(Integer, nullable=False)
+    dtype = Column(String(16), nullable=False, default="float32")
+    model_name = Column(String(50), nullable=False)
     image_path = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Covers per-person lookups and counts without touching the table
+        Index("ix_face_encodings_person_model", "person_id", "model_name", "dim"),
+        # Gallery scans only ever read one model and embedding size
+        Index("ix_face_encodings_model_dim", "model_name", "dim"),
+    )
 
-# Create tables
+class PersonPrototype(Base):
+    """Normalized centroid and cluster sub-centroids summarizing a person's encodings"""
+    __tablename__ = "person_prototypes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    person_id = Column(Integer, ForeignKey("people.id", ondelete="CASCADE"), index=True, nullable=False)
+    encoding = Column(LargeBinary, nullable=False)  # Little-endian float32/float16 bytes
+    dim = Column(Integer, nullable=False)
+    dtype = Column(String(16), nullable=False, default="float32")
+    model_name = Column(String(50), nullable=False, index=True)
+
+class GalleryState(Base):
+    """Single-row table whose version is bumped on every gallery change"""
+    __tablename__ = "gallery_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+def alembic_config():
+    """Alembic configuration pointing at the configured database"""
+    from alembic.config import Config
+    
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+    # Leave the application's logging alone
+    config.attributes["configure_logger"] = False
+    return config
+
+# Create or upgrade the tables
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """Bring the schema up to date with the Alembic migrations"""
+    from alembic import command
+    
+    config = alembic_config()
+    tables = inspect(engine).get_table_names()
+    if "people" in tables and "alembic_version" not in tables:
+        # Databases created before migrations existed start from the baseline
+        command.stamp(config, "0001")
+    command.upgrade(config, "head")
 
 # Dependency to get DB session
 def get_db():
-    from sqlalchemy.orm import sessionmaker
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
     try:
         yield db
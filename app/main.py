@@ -2,23 +2,68 @@ from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-import uvicorn
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import os
+import threading
 from pathlib import Path
 
-from app.database.models import init_db
+from app.database.models import init_db, get_db
 from app.config import settings
 from app.api.endpoints import router as api_router
+from app.services.db_service import DatabaseService
+from app.services.gallery_index import gallery_index
+from app.services.model_manager import model_manager
+from app.services.inference_scheduler import inference_scheduler
+from app.services.executors import inference_executor, io_executor, ExecutorBusy
+from app.services.embedding_cache import embedding_cache
+from app.services.metrics import registry, MetricsMiddleware
+from app.services.sharded_gallery import ShardsUnavailable
 
-# Initialize database
-init_db()
+def warm_start() -> None:
+    """Load everything expensive once, before recognition requests need it"""
+    # Build the in-memory gallery index so requests never reload it
+    for db in get_db():
+        gallery_index.build(DatabaseService(db))
+    
+    # Build and warm up the recognition model and face detector
+    model_manager.load(warm_up=settings.WARM_UP_MODELS)
+
+def warm_start_in_background() -> None:
+    """Run warm_start off the event loop; /readyz reports any failure"""
+    try:
+        warm_start()
+    except Exception as e:
+        print(f"Error in warm start: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Migrate the database, then load the gallery and models"""
+    # Initialize database, unless app.serve migrated it before spawning the workers
+    if not settings.SHARED_GALLERY_DIR:
+        init_db()
+    os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+    
+    # Start batching embedding requests across concurrent requests;
+    # batches wait for the model if it is still loading
+    inference_scheduler.start()
+    
+    if settings.BACKGROUND_MODEL_LOAD:
+        # CRUD endpoints are served right away; /readyz turns 200 once loaded
+        threading.Thread(target=warm_start_in_background, name="warm-start", daemon=True).start()
+    else:
+        warm_start()
+    yield
+    inference_scheduler.stop()
+    inference_executor.shutdown()
+    io_executor.shutdown()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     description="Face Recognition API using DeepFace",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -30,6 +75,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request and collect per-stage timings for /metrics and the slow-request log
+app.add_middleware(MetricsMiddleware)
+
+# Values sampled from the services when /metrics is scraped
+executors = (inference_executor, io_executor)
+registry.gauge("faceid_gallery_rows", "Live encodings in the in-memory gallery", lambda: len(gallery_index))
+registry.gauge("faceid_gallery_people", "People in the in-memory gallery", lambda: gallery_index.people)
+registry.gauge("faceid_gallery_version", "Gallery version of the published snapshot", lambda: gallery_index.version)
+registry.gauge(
+    "faceid_executor_in_flight", "Calls running or queued per executor",
+    lambda: {executor.name: executor.in_flight for executor in executors}, ("executor",)
+)
+registry.gauge(
+    "faceid_executor_queue_depth", "Calls waiting for a free worker per executor",
+    lambda: {executor.name: executor.queue_depth for executor in executors}, ("executor",)
+)
+registry.gauge("faceid_inference_queue_depth", "Face crops waiting for a forward pass", lambda: inference_scheduler.queue_depth)
+registry.gauge("faceid_embedding_cache_entries", "Images in the in-memory embedding cache", lambda: embedding_cache.stats()["entries"])
+registry.gauge("faceid_embedding_cache_hit_rate", "Share of embedding cache lookups that hit", lambda: embedding_cache.stats()["hit_rate"])
+registry.gauge(
+    "faceid_embedding_cache_lookups_total", "Embedding cache lookups by result",
+    lambda: {result: embedding_cache.stats()[result] for result in ("hits", "disk_hits", "misses")},
+    ("result",), kind="counter"
+)
+
+@app.exception_handler(ExecutorBusy)
+@app.exception_handler(ShardsUnavailable)
+async def executor_busy_handler(request: Request, exc: Exception):
+    """Shed load with a 503 instead of queueing without bound or answering from too few shards"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Get the base directory
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,12 +122,8 @@ app.include_router(api_router, prefix="/api/v1")
 # Mount static files
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "templates" / "static")), name="static")
 
-# Serve captured faces
-app.mount("/captured_faces", StaticFiles(directory=settings.UPLOAD_FOLDER), name="captured_faces")
-
-# Create directories if they don't exist
-os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(BASE_DIR / "templates" / "static", exist_ok=True)
+# Serve captured faces (the folder is created at startup, not import)
+app.mount("/captured_faces", StaticFiles(directory=settings.UPLOAD_FOLDER, check_dir=False), name="captured_faces")
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -62,7 +138,33 @@ async def api_info():
         "redoc": "/redoc"
     }
 
+@app.get("/healthz")
+async def liveness():
+    """Report that the process is up and serving; never waits for the models"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness():
+    """Report whether the gallery and models are loaded and warmed up"""
+    ready = model_manager.ready and gallery_index.loaded
+    status = {
+        "ready": ready,
+        "gallery_loaded": gallery_index.loaded,
+        "model": model_manager.model_name,
+        "detector": model_manager.detector_backend,
+        "load_seconds": model_manager.load_seconds,
+        "error": model_manager.load_error
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and service gauges in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
@@ -0,0 +1,119 @@
+"""Production launcher: several uvicorn workers sharing one gallery matrix.
+
+The launcher migrates the database, builds the gallery once and publishes
+it as memory-mapped files on tmpfs (see app.services.shared_gallery). Every
+worker maps them read-only, so the gallery takes the same memory whether
+there are 2 workers or 32. The launcher then polls the database gallery
+version and publishes a new generation after every enrollment or deletion;
+workers swap to it on their next recognition request, at most
+--poll-seconds plus one rebuild after the write.
+
+Each worker still loads its own recognition model.
+
+Usage:
+    python -m app.serve --workers 4 --port 8000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import List
+
+from app.config import settings
+
+class GalleryPublisher:
+    """Republishes the gallery from the database whenever its version changes"""
+
+    def __init__(self, directory: str, poll_seconds: float):
+        from app.services.shared_gallery import SharedGalleryWriter
+
+        self.writer = SharedGalleryWriter(directory)
+        self.poll_seconds = poll_seconds
+        self.version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish_if_changed(self) -> bool:
+        """Rebuild and publish the gallery if the database moved past the last generation"""
+        from app.database.models import SessionLocal
+        from app.services.db_service import DatabaseService
+        from app.services.gallery_index import GalleryIndex
+
+        db = SessionLocal()
+        try:
+            db_service = DatabaseService(db)
+            if db_service.get_gallery_version() == self.version:
+                return False
+
+            started = time.perf_counter()
+            # A private index that reads the database, dropped once written out
+            index = GalleryIndex(backend="exact", shared_dir="")
+            index.build(db_service)
+        finally:
+            db.close()
+
+        snapshot = index.snapshot()
+        generation = self.writer.publish(snapshot)
+        self.version = snapshot.version
+        print(
+            f"Published gallery generation {generation} (version {snapshot.version}, "
+            f"{len(snapshot)} rows) in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    def start(self) -> None:
+        """Publish the first generation, then keep polling on a background thread"""
+        self.publish_if_changed()
+        self._thread = threading.Thread(target=self._run, name="gallery-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.writer.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.publish_if_changed()
+            except Exception as e:
+                print(f"Error publishing gallery: {str(e)}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API from several workers sharing one gallery")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--gallery-dir", help="Where to publish the gallery (default: a fresh directory on /dev/shm)")
+    parser.add_argument("--poll-seconds", type=float, default=settings.SHARED_GALLERY_POLL_SECONDS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    from app.database.models import init_db
+    from app.services.shared_gallery import default_directory
+
+    # Migrate once here rather than racing from every worker; workers given a
+    # SHARED_GALLERY_DIR skip init_db in their lifespan
+    init_db()
+
+    if args.workers == 1:
+        # uvicorn serves from this process; there is nothing to share
+        uvicorn.run("app.main:app", host=args.host, port=args.port, log_level=args.log_level)
+        return 0
+
+    directory = args.gallery_dir or default_directory()
+    publisher = GalleryPublisher(directory, args.poll_seconds)
+    publisher.start()
+    # Workers are spawned with this environment, so they map the published gallery
+    os.environ["SHARED_GALLERY_DIR"] = directory
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    finally:
+        publisher.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import os
+import threading
+import numpy as np
+from typing import List, Optional, Tuple
+
+from app.config import settings
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the closest centroid (squared L2) for every row of data"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, and |x|^2 does not change the argmin
+        assignments[start:start + chunk_size] = np.argmin(centroid_norms[None, :] - 2 * chunk @ centroids.T, axis=1)
+    return assignments
+
+def kmeans(data: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means returning float32 centroids"""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _nearest_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.stack(
+            [np.bincount(assignments, weights=data[:, j], minlength=n_clusters) for j in range(data.shape[1])],
+            axis=1
+        )
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        # Re-seed empty clusters from random points
+        if not filled.all():
+            centroids[~filled] = data[rng.choice(len(data), int((~filled).sum()))]
+
+    return centroids
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantized residuals, in pure NumPy.
+
+    Rows are assigned to the closest of `nlist` coarse centroids and the
+    residual to that centroid is compressed to `m` one-byte codes. A search
+    scans only the `nprobe` closest inverted lists with asymmetric distance
+    lookup tables and returns a shortlist of row ids for exact re-ranking.
+
+    Row ids are the row positions of the owning GalleryIndex buffer; rows past
+    the caller's snapshot size or tombstoned rows are filtered by the caller.
+    Appends only ever add rows to the current lists, while anything that
+    renumbers rows (train, reset, remap) swaps in a new `lists` object, so a
+    gallery snapshot holding on to `state` always sees row ids it understands.
+    """
+
+    def __init__(self, nlist: int = None, pq_subvectors: int = None, nprobe: int = None, rerank: int = None):
+        self.nlist = nlist if nlist is not None else settings.ANN_NLIST
+        self.pq_subvectors = pq_subvectors or settings.ANN_PQ_SUBVECTORS
+        self.nprobe = nprobe or settings.ANN_NPROBE
+        self.rerank = rerank or settings.ANN_RERANK
+        self.coarse: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dsub)
+        self.version = -1
+        self.size = 0
+        # Gallery rows the quantizers were fitted to (before sampling)
+        self.trained_size = 0
+        # One (row ids, codes) pair per inverted list; each entry is swapped atomically
+        self.lists: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return self.coarse is not None and self.codebooks is not None
+
+    @property
+    def state(self) -> Tuple[np.ndarray, np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+        """Quantizers and inverted lists as one consistent tuple"""
+        return self.coarse, self.codebooks, self.lists
+
+    @property
+    def dim(self) -> int:
+        return self.coarse.shape[1] if self.coarse is not None else 0
+
+    def train(self, vectors: np.ndarray, sample_size: int = None, seed: int = 0) -> None:
+        """Learn the coarse quantizer and the PQ codebooks from a sample"""
+        sample_size = sample_size or settings.ANN_TRAIN_SAMPLE
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        trained_size = len(vectors)
+        if len(vectors) > sample_size:
+            vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+        nlist = self.nlist or int(np.clip(4 * np.sqrt(len(vectors)), 16, 4096))
+        coarse = kmeans(vectors, nlist, seed=seed)
+        residuals = vectors - coarse[_nearest_centroids(vectors, coarse)]
+
+        # Use as many subvectors as requested that still divide the dimension
+        m = max(d for d in range(1, self.pq_subvectors + 1) if vectors.shape[1] % d == 0)
+        dsub = vectors.shape[1] // m
+        ksub = min(256, len(vectors))
+        codebooks = np.zeros((m, ksub, dsub), dtype=np.float32)
+        for j in range(m):
+            codebooks[j] = kmeans(residuals[:, j * dsub:(j + 1) * dsub], ksub, seed=seed + j + 1)
+
+        with self._lock:
+            self.coarse = coarse
+            self.codebooks = codebooks
+            self.lists = [self._empty_list() for _ in range(len(coarse))]
+            self.size = 0
+            self.version = -1
+            self.trained_size = trained_size
+
+    def reset(self, vectors: np.ndarray, version: int) -> None:
+        """Re-encode every row with the existing codebooks into fresh lists"""
+        groups = self._group(np.asarray(vectors, dtype=np.float32), start_row=0)
+        lists = [groups.get(list_id, self._empty_list()) for list_id in range(len(self.coarse))]
+        with self._lock:
+            self.lists = lists
+            self.size = len(vectors)
+            self.version = version
+
+    def add(self, vectors: np.ndarray, start_row: int, version: int) -> None:
+        """Encode rows start_row.. and append them to their inverted lists"""
+        groups = self._group(np.asarray(vectors, dtype=np.float32), start_row)
+        with self._lock:
+            for list_id, (rows, codes) in groups.items():
+                old_rows, old_codes = self.lists[list_id]
+                self.lists[list_id] = (
+                    np.concatenate([old_rows, rows]),
+                    np.concatenate([old_codes, codes])
+                )
+            self.size = max(self.size, start_row + len(vectors))
+            self.version = version
+
+    def remap(self, alive: np.ndarray) -> None:
+        """Drop dead rows and renumber the rest after the gallery compacts"""
+        new_ids = np.cumsum(alive) - 1
+        with self._lock:
+            lists = []
+            for rows, codes in self.lists:
+                keep = rows < len(alive)
+                keep[keep] = alive[rows[keep]]
+                lists.append((new_ids[rows[keep]], codes[keep]))
+            self.lists = lists
+            self.size = int(alive.sum())
+
+    def shortlist(
+        self,
+        probe: np.ndarray,
+        state: Tuple = None,
+        nprobe: int = None,
+        count: int = None
+    ) -> np.ndarray:
+        """Row ids of the `count` closest encoded rows in the `nprobe` closest lists
+        
+        Args:
+            probe: L2-normalized probe embedding
+            state: Index state captured by a gallery snapshot (default: current)
+            nprobe: Number of inverted lists to scan
+            count: Size of the shortlist handed to exact re-ranking
+        """
+        coarse, codebooks, lists = state if state is not None else self.state
+        nprobe = min(nprobe or self.nprobe, len(coarse))
+        count = count or self.rerank
+
+        coarse_distances = np.einsum("ij,ij->i", coarse, coarse) - 2 * coarse @ probe
+        probe_lists = np.argpartition(coarse_distances, nprobe - 1)[:nprobe]
+
+        m, ksub, dsub = codebooks.shape
+        # Lookup tables of squared distances from each probe residual to every code
+        # using |r - c|^2 = |r|^2 - 2 r.c + |c|^2 so the bulk is one batched matmul
+        residuals = (probe[None, :] - coarse[probe_lists]).reshape(len(probe_lists), m, 1, dsub)
+        tables = (
+            (residuals ** 2).sum(axis=3)
+            - 2 * (residuals @ codebooks.transpose(0, 2, 1))[:, :, 0, :]
+            + (codebooks ** 2).sum(axis=2)[None]
+        )
+
+        candidate_rows = []
+        candidate_distances = []
+        for table, list_id in zip(tables, probe_lists):
+            rows, codes = lists[list_id]
+            if not len(rows):
+                continue
+            candidate_rows.append(rows)
+            candidate_distances.append(table[np.arange(m), codes].sum(axis=1))
+
+        if not candidate_rows:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.concatenate(candidate_rows)
+        distances = np.concatenate(candidate_distances)
+        if len(rows) > count:
+            keep = np.argpartition(distances, count - 1)[:count]
+            rows = rows[keep]
+        return rows
+
+    def save(self, path: str) -> None:
+        """Persist codebooks and inverted lists next to the database"""
+        with self._lock:
+            lists = list(self.lists)
+            rows = np.concatenate([r for r, _ in lists]) if lists else np.empty(0, dtype=np.int64)
+            codes = np.concatenate([c for _, c in lists]) if lists else np.empty((0, 0), dtype=np.uint8)
+            offsets = np.cumsum([0] + [len(r) for r, _ in lists])
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(
+                tmp_path,
+                coarse=self.coarse,
+                codebooks=self.codebooks,
+                rows=rows,
+                codes=codes,
+                offsets=offsets,
+                version=self.version,
+                size=self.size,
+                trained_size=self.trained_size
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Load a persisted index; returns False if there is nothing usable"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                offsets = data["offsets"]
+                rows, codes = data["rows"], data["codes"]
+                with self._lock:
+                    self.coarse = data["coarse"]
+                    self.codebooks = data["codebooks"]
+                    self.lists = [
+                        (rows[offsets[i]:offsets[i + 1]], codes[offsets[i]:offsets[i + 1]])
+                        for i in range(len(offsets) - 1)
+                    ]
+                    self.version = int(data["version"])
+                    self.size = int(data["size"])
+                    # Indexes saved before trained_size was recorded
+                    self.trained_size = int(data["trained_size"]) if "trained_size" in data else self.size
+            return True
+        except Exception as e:
+            print(f"Error loading ANN index: {str(e)}")
+            return False
+
+    def _group(self, vectors: np.ndarray, start_row: int) -> dict:
+        """Encode rows and group their (row ids, codes) by inverted list"""
+        if not len(vectors):
+            return {}
+
+        assignments = _nearest_centroids(vectors, self.coarse)
+        codes = self._encode(vectors - self.coarse[assignments])
+        rows = np.arange(start_row, start_row + len(vectors), dtype=np.int64)
+
+        order = np.argsort(assignments, kind="stable")
+        list_ids, starts = np.unique(assignments[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        return {
+            int(list_id): (rows[order[start:end]], codes[order[start:end]])
+            for list_id, start, end in zip(list_ids, starts, ends)
+        }
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        """Quantize residuals to one code per subvector"""
+        m, _, dsub = self.codebooks.shape
+        codes = np.empty((len(residuals), m), dtype=np.uint8)
+        for j in range(m):
+            codes[:, j] = _nearest_centroids(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def _empty_list(self) -> Tuple[np.ndarray, np.ndarray]:
+        m = self.codebooks.shape[0] if self.codebooks is not None else 0
+        return np.empty(0, dtype=np.int64), np.empty((0, m), dtype=np.uint8)
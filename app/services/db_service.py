@@ -1,30 +1,71 @@
 import os
-import json
+import numpy as np
+from collections import Counter
 from sqlalchemy.orm import Session
-from app.database.models import Person, FaceEncoding
+from app.database.models import Person, FaceEncoding, PersonPrototype, GalleryState
+from app.database.embeddings import encode_embedding, decode_embedding, decode_embeddings
 from app.config import settings
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from app.services.gallery_index import gallery_index
+from app.services.prototypes import compute_prototypes
+from app.services.metrics import timed
 
 class DatabaseService:
     def __init__(self, db: Session):
         self.db = db
 
-    def add_person(self, name: str, email: Optional[str] = None) -> Person:
+    def add_person(self, name: str, email: Optional[str] = None, commit: bool = True) -> Person:
         """Add a new person to the database"""
         person = Person(name=name, email=email)
         self.db.add(person)
+        if not commit:
+            # Assign the primary key without ending the transaction
+            self.db.flush()
+            return person
         self.db.commit()
         self.db.refresh(person)
         return person
 
+    @timed("db_person")
     def get_person(self, person_id: int) -> Optional[Person]:
         """Get a person by ID"""
         return self.db.query(Person).filter(Person.id == person_id).first()
 
+    @timed("db_person")
     def get_person_by_name(self, name: str) -> Optional[Person]:
         """Get a person by name"""
         return self.db.query(Person).filter(Person.name == name).first()
 
+    @timed("db_list")
+    def list_people(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = 50,
+        name_prefix: Optional[str] = None,
+        min_faces: Optional[int] = None,
+        verified: Optional[bool] = None
+    ) -> List[Person]:
+        """Get one page of people ordered by ID, without touching their encodings
+        
+        Args:
+            after_id: Keyset cursor; only people with a greater ID are returned
+            limit: Maximum number of people to return
+            name_prefix: Only people whose name starts with this
+            min_faces: Only people with at least this many face encodings
+            verified: Only verified (True) or unverified (False) people
+        """
+        query = self.db.query(Person)
+        if after_id is not None:
+            query = query.filter(Person.id > after_id)
+        if name_prefix:
+            query = query.filter(Person.name.startswith(name_prefix, autoescape=True))
+        if min_faces is not None:
+            query = query.filter(Person.face_count >= min_faces)
+        if verified is not None:
+            query = query.filter(Person.is_verified == verified)
+        
+        return query.order_by(Person.id).limit(limit).all()
+
     def add_face_encoding(
         self, 
         person_id: int, 
@@ -32,21 +73,79 @@ class DatabaseService:
         image_path: str
     ) -> FaceEncoding:
         """Add face encoding for a person"""
-        # Convert numpy array to JSON-serializable list
-        encoding_list = encoding.tolist() if hasattr(encoding, 'tolist') else encoding
-        
-        face_encoding = FaceEncoding(
-            person_id=person_id,
-            encoding=json.dumps(encoding_list),
-            image_path=image_path
-        )
+        face_encoding = self._build_face_encoding(person_id, encoding, image_path)
         
         self.db.add(face_encoding)
+        self._increment_face_count(person_id, 1)
         self.db.commit()
         self.db.refresh(face_encoding)
         
         return face_encoding
 
+    def add_face_encodings(
+        self,
+        person_id: int,
+        encodings: List[Tuple[str, List[float]]],
+        commit: bool = True
+    ) -> None:
+        """Add all of a person's face encodings in one transaction
+        
+        Args:
+            person_id: ID of the person
+            encodings: (image_path, embedding) pairs
+            commit: Commit now, or leave it to the caller's transaction
+        """
+        self.db.add_all([
+            self._build_face_encoding(person_id, embedding, image_path)
+            for image_path, embedding in encodings
+        ])
+        self._increment_face_count(person_id, len(encodings))
+        if commit:
+            self.db.commit()
+
+    def _increment_face_count(self, person_id: int, count: int) -> None:
+        """Keep the denormalized people.face_count in step with new encodings"""
+        self.db.query(Person).filter(Person.id == person_id).update(
+            {Person.face_count: Person.face_count + count}
+        )
+
+    def get_existing_names(self, names: List[str]) -> set:
+        """Return which of the given names are already registered"""
+        existing = set()
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            existing.update(
+                name for (name,) in self.db.query(Person.name).filter(Person.name.in_(chunk))
+            )
+        return existing
+
+    @timed("db_write")
+    def add_people_bulk(self, people: List[Dict[str, Any]]) -> List[int]:
+        """Add many people and their encodings in a single transaction
+        
+        Args:
+            people: Dicts with 'name', optional 'email' and 'encodings', a list
+                of (image_path, embedding) pairs
+        
+        Returns:
+            The new person IDs, in input order
+        """
+        persons = [Person(name=entry['name'], email=entry.get('email')) for entry in people]
+        self.db.add_all(persons)
+        # Assign primary keys without committing
+        self.db.flush()
+        
+        for person, entry in zip(persons, people):
+            self.add_face_encodings(person.id, entry['encodings'], commit=False)
+            embeddings = [embedding for _, embedding in entry['encodings']]
+            self.set_person_prototypes(person.id, compute_prototypes(embeddings), commit=False)
+        
+        self.bump_gallery_version(commit=False)
+        self.db.commit()
+        return [person.id for person in persons]
+
+    @timed("db_gallery_load")
     def get_all_face_encodings(self) -> List[Dict[str, Any]]:
         """Get all face encodings with person information"""
         results = self.db.query(
@@ -62,31 +161,201 @@ class DatabaseService:
             encodings.append({
                 'person_id': person.id,
                 'name': person.name,
-                'encoding': json.loads(face_encoding.encoding),
+                'encoding': decode_embedding(face_encoding.encoding, face_encoding.dtype or 'float32'),
                 'image_path': face_encoding.image_path
             })
             
         return encodings
 
-    def get_person_encodings(self, person_id: int) -> List[List[float]]:
+    @timed("db_gallery_load")
+    def get_gallery_embeddings(
+        self,
+        model_name: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, Dict[int, str], np.ndarray]:
+        """Load every encoding for a model as one matrix.
+
+        Args:
+            model_name: Recognition model whose encodings to load
+            shard: (index, count) to load only people with person_id % count == index
+
+        Returns:
+            (person_ids, names by person id, float32 matrix of shape (n, dim))
+        """
+        model_name = model_name or settings.FACE_RECOGNITION_MODEL
+        query = self.db.query(
+            FaceEncoding.person_id,
+            Person.name,
+            FaceEncoding.encoding,
+            FaceEncoding.dim,
+            FaceEncoding.dtype
+        ).join(
+            Person,
+            Person.id == FaceEncoding.person_id
+        ).filter(
+            FaceEncoding.model_name == model_name
+        )
+        if shard is not None:
+            query = query.filter(FaceEncoding.person_id % shard[1] == shard[0])
+        rows = query.all()
+        
+        if not rows:
+            return np.empty(0, dtype=np.int64), {}, np.empty((0, 0), dtype=np.float32)
+        
+        rows, matrix = self._decode_rows(rows)
+        person_ids = np.fromiter((row.person_id for row in rows), dtype=np.int64, count=len(rows))
+        names = {row.person_id: row.name for row in rows}
+        
+        return person_ids, names, matrix
+
+    def set_person_prototypes(self, person_id: int, prototypes: np.ndarray, commit: bool = True) -> None:
+        """Replace the stored prototypes of a person"""
+        self.db.query(PersonPrototype).filter(
+            PersonPrototype.person_id == person_id
+        ).delete()
+        
+        prototypes = np.atleast_2d(np.asarray(prototypes, dtype=np.float32))
+        self.db.add_all([
+            PersonPrototype(
+                person_id=person_id,
+                encoding=encode_embedding(prototype, settings.EMBEDDING_DTYPE),
+                dim=prototypes.shape[1],
+                dtype=settings.EMBEDDING_DTYPE,
+                model_name=settings.FACE_RECOGNITION_MODEL
+            )
+            for prototype in prototypes
+        ])
+        
+        if commit:
+            self.db.commit()
+
+    @timed("db_write")
+    def save_prototypes(self, prototypes: Dict[int, np.ndarray]) -> None:
+        """Store prototypes for several people in one transaction"""
+        for person_id, person_prototypes in prototypes.items():
+            self.set_person_prototypes(person_id, person_prototypes, commit=False)
+        self.db.commit()
+
+    @timed("db_prototype_load")
+    def get_gallery_prototypes(
+        self,
+        model_name: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Load every stored prototype for a model, optionally of one shard only
+        
+        Returns:
+            (person_ids, float32 matrix of shape (n, dim))
+        """
+        model_name = model_name or settings.FACE_RECOGNITION_MODEL
+        query = self.db.query(
+            PersonPrototype.person_id,
+            PersonPrototype.encoding,
+            PersonPrototype.dim,
+            PersonPrototype.dtype
+        ).filter(
+            PersonPrototype.model_name == model_name
+        )
+        if shard is not None:
+            query = query.filter(PersonPrototype.person_id % shard[1] == shard[0])
+        rows = query.all()
+        
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        
+        rows, matrix = self._decode_rows(rows)
+        person_ids = np.fromiter((row.person_id for row in rows), dtype=np.int64, count=len(rows))
+        
+        return person_ids, matrix
+
+    def _decode_rows(self, rows: List[Any]) -> Tuple[List[Any], np.ndarray]:
+        """Decode the encoding blobs of query rows into one float32 matrix
+        
+        Returns:
+            (the rows that were kept, matrix with one row per kept row)
+        """
+        # Embeddings of different sizes can never be compared; keep the dominant one
+        dim = Counter(row.dim for row in rows).most_common(1)[0][0]
+        rows = [row for row in rows if row.dim == dim]
+        
+        # Decode each dtype group with a single frombuffer call
+        matrix = np.empty((len(rows), dim), dtype=np.float32)
+        groups: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            groups.setdefault(row.dtype or 'float32', []).append(i)
+        for dtype, indexes in groups.items():
+            matrix[indexes] = decode_embeddings([rows[i].encoding for i in indexes], dim, dtype)
+        
+        return rows, matrix
+
+    def get_person_encodings(self, person_id: int) -> List[np.ndarray]:
         """Get all face encodings for a specific person"""
         encodings = self.db.query(FaceEncoding).filter(
             FaceEncoding.person_id == person_id
         ).all()
         
-        return [json.loads(enc.encoding) for enc in encodings]
+        return [decode_embedding(enc.encoding, enc.dtype or 'float32') for enc in encodings]
 
-    def delete_person(self, person_id: int) -> bool:
-        """Delete a person and all their face encodings"""
-        # First delete all face encodings for this person
-        self.db.query(FaceEncoding).filter(
+    @timed("db_person")
+    def get_person_face_metadata(self, person_id: int) -> List[Any]:
+        """Get a person's encoding rows without loading the embedding payload"""
+        return self.db.query(
+            FaceEncoding.id,
+            FaceEncoding.image_path,
+            FaceEncoding.model_name,
+            FaceEncoding.dim,
+            FaceEncoding.dtype,
+            FaceEncoding.created_at
+        ).filter(
             FaceEncoding.person_id == person_id
-        ).delete()
-        
-        # Then delete the person
-        result = self.db.query(Person).filter(
-            Person.id == person_id
-        ).delete()
+        ).order_by(FaceEncoding.id).all()
+
+    def _build_face_encoding(self, person_id: int, encoding, image_path: str) -> FaceEncoding:
+        """Create an unsaved FaceEncoding row in the configured binary format"""
+        vector = np.asarray(encoding, dtype=np.float32).ravel()
+        return FaceEncoding(
+            person_id=person_id,
+            encoding=encode_embedding(vector, settings.EMBEDDING_DTYPE),
+            dim=len(vector),
+            dtype=settings.EMBEDDING_DTYPE,
+            model_name=settings.FACE_RECOGNITION_MODEL,
+            image_path=image_path
+        )
+
+    @timed("db_version")
+    def get_gallery_version(self) -> int:
+        """Get the current gallery version shared by all worker processes"""
+        version = self.db.query(GalleryState.version).filter(GalleryState.id == 1).scalar()
+        return version or 0
+
+    def bump_gallery_version(self, commit: bool = True) -> int:
+        """Increment the gallery version and return the new value"""
+        self.db.query(GalleryState).filter(GalleryState.id == 1).update(
+            {GalleryState.version: GalleryState.version + 1}
+        )
+        version = self.get_gallery_version()
         
-        self.db.commit()
-        return result > 0
+        if commit:
+            self.db.commit()
+        return version
+
+    @timed("db_write")
+    def delete_person(self, person_id: int) -> bool:
+        """Delete a person and all their face encodings"""
+        with gallery_index.local_write():
+            # Encodings and prototypes go with the person through ON DELETE CASCADE
+            result = self.db.query(Person).filter(
+                Person.id == person_id
+            ).delete()
+            
+            # Nobody was deleted: leave the gallery version (and every worker's gallery) alone
+            if not result:
+                self.db.rollback()
+                return False
+            
+            version = self.bump_gallery_version(commit=False)
+            self.db.commit()
+            
+            # Tombstone the person's rows in the in-memory gallery
+            gallery_index.remove_person(person_id, version)
+        return True
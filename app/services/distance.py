@@ -0,0 +1,117 @@
+import numpy as np
+from typing import Optional, Tuple
+
+METRICS = ("cosine", "euclidean", "euclidean_l2")
+
+# DeepFace's verification thresholds per model and metric
+DEEPFACE_THRESHOLDS = {
+    "VGG-Face": {"cosine": 0.68, "euclidean": 1.17, "euclidean_l2": 1.17},
+    "Facenet": {"cosine": 0.40, "euclidean": 10.0, "euclidean_l2": 0.80},
+    "Facenet512": {"cosine": 0.30, "euclidean": 23.56, "euclidean_l2": 1.04},
+    "ArcFace": {"cosine": 0.68, "euclidean": 4.15, "euclidean_l2": 1.13},
+    "Dlib": {"cosine": 0.07, "euclidean": 0.6, "euclidean_l2": 0.4},
+    "SFace": {"cosine": 0.593, "euclidean": 10.734, "euclidean_l2": 1.055},
+    "OpenFace": {"cosine": 0.10, "euclidean": 0.55, "euclidean_l2": 0.55},
+    "DeepFace": {"cosine": 0.23, "euclidean": 64.0, "euclidean_l2": 0.64},
+    "DeepID": {"cosine": 0.015, "euclidean": 45.0, "euclidean_l2": 0.17},
+    "GhostFaceNet": {"cosine": 0.65, "euclidean": 35.71, "euclidean_l2": 1.10},
+}
+# DeepFace's fallback for models it has no tuned threshold for
+BASE_THRESHOLDS = {"cosine": 0.40, "euclidean": 0.55, "euclidean_l2": 0.75}
+
+# Gallery rows upcast to float32 at a time when the gallery is stored as float16
+BLOCK_ROWS = 16384
+
+def check_metric(metric: str) -> str:
+    if metric not in METRICS:
+        raise ValueError(f"Unknown distance metric '{metric}'; expected one of {', '.join(METRICS)}")
+    return metric
+
+def default_threshold(model_name: str, metric: str) -> float:
+    """DeepFace's distance threshold for a recognition model and metric"""
+    check_metric(metric)
+    return DEEPFACE_THRESHOLDS.get(model_name, BASE_THRESHOLDS)[metric]
+
+def l2_normalize(vectors, dtype=np.float32) -> Tuple[np.ndarray, np.ndarray]:
+    """Unit-length rows and the original row norms
+
+    Returns:
+        (normalized (n, dim) matrix in `dtype`, float32 norms of shape (n,))
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1)
+    unit = vectors / np.maximum(norms, 1e-12)[:, None]
+    return unit.astype(dtype, copy=False), norms.astype(np.float32, copy=False)
+
+def cosine_similarity(unit_probes: np.ndarray, unit_gallery: np.ndarray) -> np.ndarray:
+    """(n_probes, n_gallery) dot products of pre-normalized rows, in float32
+
+    float16 galleries are upcast one block of rows at a time: NumPy has no
+    half-precision BLAS, and converting the whole matrix per call would undo
+    the memory saving.
+    """
+    unit_probes = np.asarray(unit_probes, dtype=np.float32)
+    if unit_gallery.dtype == np.float32:
+        return unit_probes @ unit_gallery.T
+
+    similarity = np.empty((len(unit_probes), len(unit_gallery)), dtype=np.float32)
+    for start in range(0, len(unit_gallery), BLOCK_ROWS):
+        block = unit_gallery[start:start + BLOCK_ROWS].astype(np.float32)
+        np.matmul(unit_probes, block.T, out=similarity[:, start:start + BLOCK_ROWS])
+    return similarity
+
+def cosine_distance(unit_probes: np.ndarray, unit_gallery: np.ndarray) -> np.ndarray:
+    """1 - cos(a, b): 0 for identical directions, 2 for opposite ones"""
+    return 1 - cosine_similarity(unit_probes, unit_gallery)
+
+def euclidean_l2_distance(unit_probes: np.ndarray, unit_gallery: np.ndarray) -> np.ndarray:
+    """Euclidean distance between the normalized vectors, sqrt(2 - 2 cos(a, b))"""
+    return from_similarity("euclidean_l2", cosine_similarity(unit_probes, unit_gallery))
+
+def euclidean_distance(
+    unit_probes: np.ndarray,
+    unit_gallery: np.ndarray,
+    probe_norms: np.ndarray,
+    gallery_norms: np.ndarray
+) -> np.ndarray:
+    """Euclidean distance between the raw vectors, given their unit rows and norms"""
+    return from_similarity(
+        "euclidean", cosine_similarity(unit_probes, unit_gallery), probe_norms, gallery_norms
+    )
+
+def from_similarity(
+    metric: str,
+    similarity: np.ndarray,
+    probe_norms: Optional[np.ndarray] = None,
+    gallery_norms: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Convert cosine similarities to distances for a metric; smaller is always closer
+
+    Args:
+        metric: One of METRICS
+        similarity: (n_probes, n_gallery) cosine similarities
+        probe_norms: Raw probe norms, needed for "euclidean"
+        gallery_norms: Raw gallery norms, needed for "euclidean"
+    """
+    if metric == "cosine":
+        return 1 - similarity
+    if metric == "euclidean_l2":
+        # |a - b|^2 = 2 - 2cos(a, b) for unit vectors
+        return np.sqrt(np.maximum(2 - 2 * similarity, 0))
+    if metric == "euclidean":
+        # |a - b|^2 = |a|^2 + |b|^2 - 2|a||b|cos(a, b)
+        squared = (
+            probe_norms[:, None] ** 2
+            + gallery_norms[None, :] ** 2
+            - 2 * probe_norms[:, None] * gallery_norms[None, :] * similarity
+        )
+        return np.sqrt(np.maximum(squared, 0))
+    check_metric(metric)
+
+def pairwise_distances(metric: str, probes, gallery) -> np.ndarray:
+    """Distances between raw (unnormalized) probe and gallery embeddings"""
+    unit_probes, probe_norms = l2_normalize(probes)
+    unit_gallery, gallery_norms = l2_normalize(gallery)
+    return from_similarity(
+        check_metric(metric), cosine_similarity(unit_probes, unit_gallery), probe_norms, gallery_norms
+    )
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.config import settings
+
+class EmbeddingCache:
+    """Bounded LRU + TTL cache of face detections and embeddings per image.
+
+    Entries are keyed by a BLAKE2 hash of the decoded pixels together with the
+    recognition model and detector, so resending the same image (retries,
+    re-posted frames, re-run batch jobs) skips detection and embedding. With
+    a `disk_path`, entries are also written through to a small SQLite file
+    that survives restarts and backs up the in-memory tier.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        ttl_seconds: float = None,
+        disk_path: str = None,
+        disk_max_entries: int = None
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.EMBEDDING_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.EMBEDDING_CACHE_TTL_SECONDS
+        self.disk_path = disk_path if disk_path is not None else settings.EMBEDDING_CACHE_PATH
+        self.disk_max_entries = (
+            disk_max_entries if disk_max_entries is not None else settings.EMBEDDING_CACHE_DISK_SIZE
+        )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key(self, frame: np.ndarray, model_name: str, detector_backend: str) -> str:
+        """Content hash of a decoded frame for one model/detector pair"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{model_name}|{detector_backend}|{frame.shape}|{frame.dtype}|".encode())
+        digest.update(np.ascontiguousarray(frame).data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached faces for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, faces = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return faces
+                del self._entries[key]
+                self.expirations += 1
+
+        stored = self._disk_get(key, now)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, *stored)
+        return stored[1]
+
+    def put(self, key: str, faces: List[Dict[str, Any]]) -> None:
+        """Store the detected faces (boxes and embeddings) of one image"""
+        now = time.time()
+        with self._lock:
+            self._insert(key, now, faces)
+        self._disk_put(key, now, faces)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for sizing the cache"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_path": self.disk_path or None
+        }
+
+    def _insert(self, key: str, created: float, faces: List[Dict[str, Any]]) -> None:
+        """Add an entry and evict the least recently used ones; caller holds the lock"""
+        self._entries[key] = (created, faces)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.disk_path:
+            return None
+        with self._disk_lock:
+            if self._disk is None:
+                disk = sqlite3.connect(self.disk_path, check_same_thread=False, isolation_level=None)
+                disk.execute("PRAGMA journal_mode=WAL")
+                disk.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_cache "
+                    "(key TEXT PRIMARY KEY, created REAL NOT NULL, faces TEXT NOT NULL)"
+                )
+                self._disk = disk
+        return self._disk
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        try:
+            disk = self._connect()
+            if disk is None:
+                return None
+            with self._disk_lock:
+                row = disk.execute(
+                    "SELECT created, faces FROM embedding_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None or now - row[0] > self.ttl_seconds:
+                return None
+            return row[0], json.loads(row[1])
+        except Exception as e:
+            print(f"Error reading embedding cache: {str(e)}")
+            return None
+
+    def _disk_put(self, key: str, created: float, faces: List[Dict[str, Any]]) -> None:
+        try:
+            disk = self._connect()
+            if disk is None:
+                return
+            with self._disk_lock:
+                disk.execute(
+                    "INSERT OR REPLACE INTO embedding_cache (key, created, faces) VALUES (?, ?, ?)",
+                    (key, created, json.dumps(faces, default=float))
+                )
+                self._disk_writes += 1
+                # Expire and trim the file now and then rather than on every write
+                if self._disk_writes % 1000 == 0:
+                    disk.execute("DELETE FROM embedding_cache WHERE created < ?", (created - self.ttl_seconds,))
+                    disk.execute(
+                        "DELETE FROM embedding_cache WHERE key IN ("
+                        "SELECT key FROM embedding_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                        (self.disk_max_entries,)
+                    )
+        except Exception as e:
+            print(f"Error writing embedding cache: {str(e)}")
+
+# Shared embedding cache for the whole process
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import settings
+from app.services.metrics import record
+
+class ExecutorBusy(Exception):
+    """Raised when an executor already holds as much work as it is allowed to"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"The {name} executor is at capacity, retry in {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on running plus queued work.
+
+    Blocking work submitted from async endpoints runs on the pool instead of
+    the event loop. Once `max_workers + max_queue` calls are in flight, new
+    submissions fail fast with ExecutorBusy instead of piling up latency.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.retry_after = retry_after or settings.RETRY_AFTER_SECONDS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently running or waiting for a worker"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a free worker"""
+        return max(0, self._in_flight - self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call on the pool and await its result"""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy(self.name, self.retry_after)
+
+        with self._counter_lock:
+            self._in_flight += 1
+        try:
+            # Run in a copy of the caller's context so stage timings reach its request trace
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._timed_call, time.perf_counter(), fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _timed_call(self, submitted: float, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Record how long a call waited for a worker, then run it"""
+        record(f"{self.name}_queue_wait", time.perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and wait for running calls to finish"""
+        self._executor.shutdown(wait=wait)
+
+    def _release(self) -> None:
+        with self._counter_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+# Model work: detection, embedding and matching
+inference_executor = BoundedExecutor("inference", settings.INFERENCE_WORKERS, settings.INFERENCE_QUEUE_SIZE)
+
+# Short blocking I/O: database lookups and file handling
+io_executor = BoundedExecutor("io", settings.IO_WORKERS, settings.IO_QUEUE_SIZE)
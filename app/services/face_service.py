@@ -1,13 +1,28 @@
 import os
 import cv2
 import numpy as np
-from deepface import DeepFace
-from typing import List, Dict, Any, Optional, Tuple
-from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
 import uuid
-import json
+from sqlalchemy.exc import IntegrityError
 
 from app.config import settings
+from app.services.gallery_index import gallery_index
+from app.services.distance import default_threshold
+from app.services.model_manager import model_manager
+from app.services.inference_scheduler import inference_scheduler
+from app.services.prototypes import compute_prototypes
+from app.services.face_tracker import FaceTracker
+from app.services.embedding_cache import embedding_cache
+from app.services.metrics import span
+from app.services.sharded_gallery import ShardsUnavailable
+
+def decode_image(image_data: bytes) -> Optional[np.ndarray]:
+    """Decode uploaded image bytes into a BGR frame, or None if invalid"""
+    if not image_data:
+        return None
+    with span("decode"):
+        nparr = np.frombuffer(image_data, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
 class FaceService:
     def __init__(self, db_service):
@@ -15,35 +30,72 @@ class FaceService:
         self.model_name = settings.FACE_RECOGNITION_MODEL
         self.detector_backend = settings.FACE_DETECTION_MODEL
         self.distance_metric = settings.DISTANCE_METRIC
-        self.threshold = settings.THRESHOLD
-        
-        # Ensure upload directory exists
-        os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+        self.threshold = (
+            settings.THRESHOLD if settings.THRESHOLD is not None
+            else default_threshold(self.model_name, self.distance_metric)
+        )
 
-    def detect_faces(self, image_path: str) -> List[Dict[str, Any]]:
-        """Detect faces in an image and return face locations and encodings"""
-        try:
-            # Use DeepFace to detect and extract faces
-            face_objs = DeepFace.represent(
-                img_path=image_path,
-                model_name=self.model_name,
-                detector_backend=self.detector_backend,
-                enforce_detection=False
-            )
-            
-            # If no faces found, return empty list
-            if not face_objs:
-                return []
-                
-            # If single face is detected, convert to list
-            if isinstance(face_objs, dict):
-                face_objs = [face_objs]
+    def detect_faces(self, image: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Detect faces in an image path or BGR frame and return face locations and encodings"""
+        return self.detect_faces_batch([image])[0]
+
+    def detect_faces_batch(self, images: List[Union[str, np.ndarray, None]]) -> List[List[Dict[str, Any]]]:
+        """Detect faces in several images and embed all of their crops in one batch"""
+        # Images seen before are answered from the content-hash cache
+        with span("cache_lookup"):
+            keys = [
+                embedding_cache.key(image, self.model_name, self.detector_backend)
+                if embedding_cache.enabled and isinstance(image, np.ndarray) else None
+                for image in images
+            ]
+            cached = [embedding_cache.get(key) if key else None for key in keys]
+        
+        detections = []
+        for image, hit in zip(images, cached):
+            if image is None or hit is not None:
+                detections.append([])
+                continue
+            try:
+                # Detect and align faces with the preloaded detector
+                with span("detect"):
+                    faces = model_manager.extract_faces(image, enforce_detection=False) or []
                 
-            return face_objs
-            
-        except Exception as e:
-            print(f"Error in detect_faces: {str(e)}")
-            return []
+                # If single face is detected, convert to list
+                if isinstance(faces, dict):
+                    faces = [faces]
+            except Exception as e:
+                print(f"Error in detect_faces: {str(e)}")
+                faces = []
+            detections.append(faces)
+        
+        crops = [face['face'] for faces in detections for face in faces]
+        embeddings = iter([])
+        if crops:
+            try:
+                # Embed the crops together with those of concurrent requests
+                with span("embed"):
+                    embeddings = iter(inference_scheduler.embed(crops))
+            except Exception as e:
+                print(f"Error in detect_faces: {str(e)}")
+                return [hit or [] for hit in cached]
+        
+        results = []
+        for key, hit, faces in zip(keys, cached, detections):
+            if hit is not None:
+                results.append(hit)
+                continue
+            result = [
+                {
+                    'embedding': next(embeddings).tolist(),
+                    'facial_area': face.get('facial_area', {}),
+                    'face_confidence': face.get('confidence')
+                }
+                for face in faces
+            ]
+            if key:
+                embedding_cache.put(key, result)
+            results.append(result)
+        return results
 
     def save_face_image(self, image_data: bytes, person_name: str) -> str:
         """Save face image to disk and return the file path"""
@@ -56,47 +108,74 @@ class FaceService:
         filepath = os.path.join(person_dir, filename)
         
         # Convert bytes to numpy array and save as image
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = decode_image(image_data)
         cv2.imwrite(filepath, img)
         
         return filepath
 
     def register_person(self, name: str, image_paths: List[str], email: str = None) -> Dict[str, Any]:
-        """Register a new person with multiple face images"""
+        """Register a new person with multiple face image files"""
+        frames = [cv2.imread(img_path) for img_path in image_paths]
+        return self.register_person_frames(name, frames, email, image_names=image_paths)
+
+    def register_person_frames(
+        self,
+        name: str,
+        frames: List[Optional[np.ndarray]],
+        email: str = None,
+        image_names: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Register a new person with multiple decoded BGR frames
+        
+        Args:
+            name: Name of the person
+            frames: Decoded images; None entries (undecodable uploads) are skipped
+            email: Email of the person (optional)
+            image_names: Name stored as the image path of each frame
+        """
+        image_names = image_names or [f"frame_{i}" for i in range(len(frames))]
+        
         # Check if person already exists
         existing_person = self.db_service.get_person_by_name(name)
         if existing_person:
             return {"status": "error", "message": f"Person with name '{name}' already exists"}
         
-        # Add person to database
-        person = self.db_service.add_person(name=name, email=email)
-        
-        # Process each image
+        # Detect faces in every image before touching the database
         saved_paths = []
-        for img_path in image_paths:
-            # Detect faces in the image
-            face_objs = self.detect_faces(img_path)
-            
+        embeddings = []
+        for face_objs, img_path in zip(self.detect_faces_batch(frames), image_names):
             if not face_objs:
                 continue
-                
-            # Use the first detected face
-            face = face_objs[0]
-            
-            # Save the face encoding to database
-            self.db_service.add_face_encoding(
-                person_id=person.id,
-                encoding=face['embedding'],
-                image_path=img_path
-            )
             
+            # Use the first detected face
             saved_paths.append(img_path)
+            embeddings.append(face_objs[0]['embedding'])
         
         if not saved_paths:
-            # If no valid faces found in any image, delete the person record
-            self.db_service.delete_person(person.id)
             return {"status": "error", "message": "No valid faces found in any of the provided images"}
+        
+        # Summarize the person for the first matching stage
+        with span("prototypes"):
+            prototypes = compute_prototypes(embeddings)
+        
+        # Keep this process from rebuilding the gallery between the commit
+        # and the in-memory update
+        with gallery_index.local_write():
+            # Write the person, their encodings and prototypes in one transaction
+            try:
+                with span("db_write"):
+                    person = self.db_service.add_person(name=name, email=email, commit=False)
+                    self.db_service.add_face_encodings(person.id, list(zip(saved_paths, embeddings)), commit=False)
+                    self.db_service.set_person_prototypes(person.id, prototypes, commit=False)
+                    version = self.db_service.bump_gallery_version()
+            except IntegrityError:
+                # A concurrent registration took the name (or email) first
+                self.db_service.db.rollback()
+                return {"status": "error", "message": f"Person with name '{name}' or that email already exists"}
+            
+            # Append the new encodings to the in-memory gallery
+            with span("gallery_update"):
+                gallery_index.add_person(person.id, person.name, embeddings, version, prototypes)
             
         return {
             "status": "success",
@@ -106,55 +185,57 @@ class FaceService:
         }
 
     def recognize_face(self, image_path: str) -> Dict[str, Any]:
-        """Recognize a face in the given image"""
+        """Recognize a face in the given image file"""
+        return self.recognize_frame(cv2.imread(image_path))
+
+    def recognize_frame(self, frame: Optional[np.ndarray]) -> Dict[str, Any]:
+        """Recognize a face in a decoded BGR frame"""
         try:
-            # Read the image to verify it's valid
-            img = cv2.imread(image_path)
-            if img is None:
+            # Make sure the image decoded to something valid
+            if frame is None:
                 return {"status": "error", "message": "Invalid image file"}
                 
             # Detect faces in the input image
-            face_objs = self.detect_faces(image_path)
+            face_objs = self.detect_faces(frame)
             
             if not face_objs:
                 return {"status": "no_face", "message": "No faces detected in the image"}
                 
-            # Get all known face encodings from the database
-            known_encodings = self.db_service.get_all_face_encodings()
+            # Pick up gallery changes made by other worker processes
+            with span("gallery_refresh"):
+                gallery_index.refresh(self.db_service)
             
-            if not known_encodings:
+            if not len(gallery_index):
                 return {"status": "no_known_faces", "message": "No known faces in the database"}
                 
-            # Compare with each known face
+            # Skip if no face was actually detected (DeepFace might return empty results with enforce_detection=False)
+            faces = [face for face in face_objs if face and 'embedding' in face]
+            
+            # Match every detected face against the whole gallery in one product
+            with span("match"):
+                candidates = gallery_index.search([face['embedding'] for face in faces], k=1)
+            
             best_match = None
             min_distance = float('inf')
             
-            for face in face_objs:
-                # Skip if no face was actually detected (DeepFace might return empty results with enforce_detection=False)
-                if not face or 'embedding' not in face:
+            for face, face_candidates in zip(faces, candidates):
+                if not face_candidates:
                     continue
                     
-                for known in known_encodings:
-                    if not known or 'encoding' not in known:
-                        continue
-                        
-                    # Calculate distance between face encodings
-                    distance = self._calculate_distance(
-                        np.array(face['embedding']),
-                        np.array(known['encoding'])
-                    )
-                    
-                    if distance < min_distance and distance <= self.threshold:
-                        min_distance = distance
-                        best_match = {
-                            'person_id': known['person_id'],
-                            'name': known['name'],
-                            'distance': distance,
-                            'face_location': face.get('facial_area', {})
-                        }
+                known = face_candidates[0]
+                distance = known['distance']
+                
+                if distance < min_distance and distance <= self.threshold:
+                    min_distance = distance
+                    best_match = {
+                        'person_id': known['person_id'],
+                        'name': known['name'],
+                        'distance': distance,
+                        'face_location': face.get('facial_area', {})
+                    }
             
             if best_match:
-                confidence = 1 - (best_match['distance'] / self.threshold)
+                confidence = self._confidence(best_match['distance'])
                 # Only consider it a match if confidence is above a certain threshold
                 if confidence > 0.6:  # 60% confidence threshold
                     return {
@@ -175,6 +256,9 @@ class FaceService:
                 "message": "No matching face found in the database"
             }
             
+        except ShardsUnavailable:
+            # Not an answer about this image; the endpoint turns it into a 503
+            raise
         except Exception as e:
             print(f"Error in recognize_face: {str(e)}")
             return {
@@ -182,12 +266,127 @@ class FaceService:
                 "message": f"Error processing image: {str(e)}"
             }
     
-    def _calculate_distance(self, encoding1: np.ndarray, encoding2: np.ndarray) -> float:
-        """Calculate distance between two face encodings"""
-        if self.distance_metric == 'cosine':
-            return np.dot(encoding1, encoding2) / (np.linalg.norm(encoding1) * np.linalg.norm(encoding2))
-        elif self.distance_metric == 'euclidean':
-            return np.linalg.norm(encoding1 - encoding2)
-        else:
-            # Default to cosine distance
-            return np.dot(encoding1, encoding2) / (np.linalg.norm(encoding1) * np.linalg.norm(encoding2))
+    def recognize_frames(self, frames: List[Optional[np.ndarray]], top_k: int = 3) -> List[Dict[str, Any]]:
+        """Recognize every face in several decoded BGR frames
+        
+        All frames are detected first, every face crop is embedded in one
+        batch and all probes are matched against the gallery in one product.
+        
+        Returns:
+            One result per frame with per-face locations, match and top-k candidates
+        """
+        detections = self.detect_faces_batch(frames)
+        
+        # Pick up gallery changes made by other worker processes
+        with span("gallery_refresh"):
+            gallery_index.refresh(self.db_service)
+        
+        probes = [face['embedding'] for faces in detections for face in faces]
+        with span("match"):
+            candidates = iter(gallery_index.search(probes, k=top_k, unique_persons=True))
+        
+        results = []
+        for frame, faces in zip(frames, detections):
+            if frame is None:
+                results.append({"status": "error", "message": "Invalid image file", "faces": []})
+                continue
+            if not faces:
+                results.append({"status": "no_face", "message": "No faces detected in the image", "faces": []})
+                continue
+            
+            face_results = []
+            for face in faces:
+                face_candidates = next(candidates)
+                person = self._best_person(face_candidates)
+                
+                face_results.append({
+                    "face_location": face.get('facial_area', {}),
+                    "face_confidence": face.get('face_confidence'),
+                    "recognized": person is not None,
+                    "person": person,
+                    "candidates": face_candidates
+                })
+            results.append({"status": "success", "faces": face_results})
+        
+        return results
+
+    def recognize_tracked_frame(
+        self,
+        frame: Optional[np.ndarray],
+        tracker: FaceTracker,
+        top_k: int = 1
+    ) -> Dict[str, Any]:
+        """Recognize the faces of one video frame, reusing identities of tracked faces
+        
+        Every frame runs the fast stream detector, but only faces whose track
+        is new, stale or visibly changed are embedded and matched.
+        
+        Returns:
+            The frame result with one entry per tracked face
+        """
+        if frame is None:
+            return {"status": "error", "message": "Invalid image frame", "tracks": []}
+        
+        try:
+            with span("detect"):
+                faces = model_manager.extract_faces(
+                    frame,
+                    enforce_detection=False,
+                    detector_backend=settings.STREAM_DETECTOR_BACKEND
+                ) or []
+        except Exception as e:
+            print(f"Error in recognize_tracked_frame: {str(e)}")
+            faces = []
+        
+        # Without a detection DeepFace returns the whole frame with zero confidence
+        faces = [face for face in faces if face.get('confidence') != 0 and face.get('facial_area')]
+        boxes = [
+            [face['facial_area'][key] for key in ('x', 'y', 'w', 'h')]
+            for face in faces
+        ]
+        with span("track"):
+            tracks = tracker.update(frame, boxes)
+        
+        pending = [(track, face) for track, face in zip(tracks, faces) if tracker.needs_embedding(track)]
+        if pending:
+            with span("embed"):
+                embeddings = inference_scheduler.embed([face['face'] for _, face in pending])
+            
+            # Pick up gallery changes made by other worker processes
+            with span("gallery_refresh"):
+                gallery_index.refresh(self.db_service)
+            with span("match"):
+                candidates = gallery_index.search(embeddings, k=top_k, unique_persons=True)
+            for (track, _), face_candidates in zip(pending, candidates):
+                tracker.mark_embedded(track, self._best_person(face_candidates), face_candidates)
+        
+        embedded = {id(track) for track, _ in pending}
+        return {
+            "status": "success" if tracks else "no_face",
+            "tracks": [
+                {
+                    "track_id": track.track_id,
+                    "face_location": face['facial_area'],
+                    "recognized": track.person is not None,
+                    "person": track.person,
+                    "candidates": track.candidates,
+                    "embedded": id(track) in embedded
+                }
+                for track, face in zip(tracks, faces)
+            ]
+        }
+
+    def _best_person(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The recognized person for a face's candidates, or None"""
+        if not candidates or candidates[0]['distance'] > self.threshold:
+            return None
+        best = candidates[0]
+        confidence = self._confidence(best['distance'])
+        # Same 60% confidence bar as single-image recognition
+        if confidence <= 0.6:
+            return None
+        return {"id": best['person_id'], "name": best['name'], "confidence": confidence}
+
+    def _confidence(self, distance: float) -> float:
+        """Map a match distance to a confidence relative to the threshold"""
+        return 1 - (distance / self.threshold)
@@ -0,0 +1,134 @@
+import time
+import cv2
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+from app.config import settings
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two sets of (x, y, w, h) boxes"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    intersection = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+def face_thumbnail(frame: np.ndarray, box: np.ndarray, size: int = 16) -> Optional[np.ndarray]:
+    """Tiny normalized grayscale patch used to notice appearance changes"""
+    x, y, w, h = [int(v) for v in box]
+    crop = frame[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)]
+    if not crop.size:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+
+class Track:
+    """One face followed across frames and the identity last assigned to it"""
+
+    def __init__(self, track_id: int, box: np.ndarray, thumbnail: Optional[np.ndarray]):
+        self.track_id = track_id
+        self.box = box
+        self.thumbnail = thumbnail
+        self.hits = 1
+        self.missed = 0
+        self.person = None
+        self.candidates: List[Dict[str, Any]] = []
+        self.embedded_at = None  # time.monotonic() of the last embedding
+        self.embedded_thumbnail = None
+
+    @property
+    def centroid(self) -> np.ndarray:
+        return self.box[:2] + self.box[2:] / 2
+
+class FaceTracker:
+    """Associates per-frame detections with tracks by IoU, then by centroid.
+
+    A track only needs a new embedding when it is new, its identity is older
+    than STREAM_REEMBED_SECONDS, or its face looks noticeably different from
+    when it was last embedded. Everything else reuses the last identity.
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = None,
+        max_missed: int = None,
+        reembed_seconds: float = None,
+        appearance_threshold: float = None
+    ):
+        self.iou_threshold = iou_threshold if iou_threshold is not None else settings.STREAM_IOU_THRESHOLD
+        self.max_missed = max_missed if max_missed is not None else settings.STREAM_MAX_MISSED_FRAMES
+        self.reembed_seconds = reembed_seconds if reembed_seconds is not None else settings.STREAM_REEMBED_SECONDS
+        self.appearance_threshold = (
+            appearance_threshold if appearance_threshold is not None else settings.STREAM_APPEARANCE_THRESHOLD
+        )
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    def update(self, frame: np.ndarray, boxes: List[np.ndarray]) -> List[Track]:
+        """Match this frame's detections to tracks; returns the track of each detection"""
+        boxes = [np.asarray(box, dtype=np.float32) for box in boxes]
+        assigned: List[Optional[Track]] = [None] * len(boxes)
+        free = list(range(len(self.tracks)))
+
+        if boxes and self.tracks:
+            overlaps = box_iou(np.stack(boxes), np.stack([track.box for track in self.tracks]))
+            # Greedy association, best overlap first
+            for flat in np.argsort(-overlaps, axis=None):
+                det, trk = np.unravel_index(flat, overlaps.shape)
+                if overlaps[det, trk] < self.iou_threshold:
+                    break
+                if assigned[det] is None and trk in free:
+                    assigned[det] = self.tracks[trk]
+                    free.remove(trk)
+
+            # Fast motion can leave no overlap; fall back to the nearest centroid
+            for det, box in enumerate(boxes):
+                if assigned[det] is not None or not free:
+                    continue
+                centroid = box[:2] + box[2:] / 2
+                distances = [np.linalg.norm(self.tracks[trk].centroid - centroid) for trk in free]
+                nearest = int(np.argmin(distances))
+                if distances[nearest] < max(box[2], box[3]):
+                    assigned[det] = self.tracks[free.pop(nearest)]
+
+        for det, box in enumerate(boxes):
+            track = assigned[det]
+            if track is None:
+                track = Track(self._next_id, box, face_thumbnail(frame, box))
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[det] = track
+            else:
+                track.box = box
+                track.thumbnail = face_thumbnail(frame, box)
+                track.hits += 1
+                track.missed = 0
+
+        for trk in free:
+            self.tracks[trk].missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+        return assigned
+
+    def needs_embedding(self, track: Track, now: float = None) -> bool:
+        """Whether a track's identity has to be recomputed this frame"""
+        now = now if now is not None else time.monotonic()
+        if track.embedded_at is None:
+            return True
+        if now - track.embedded_at >= self.reembed_seconds:
+            return True
+        if track.thumbnail is None or track.embedded_thumbnail is None:
+            return False
+        change = float(np.mean(np.abs(track.thumbnail - track.embedded_thumbnail)))
+        return change > self.appearance_threshold
+
+    def mark_embedded(self, track: Track, person: Optional[Dict[str, Any]], candidates, now: float = None) -> None:
+        """Record the identity computed for a track"""
+        track.person = person
+        track.candidates = candidates
+        track.embedded_at = now if now is not None else time.monotonic()
+        track.embedded_thumbnail = track.thumbnail
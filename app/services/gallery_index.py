@@ -0,0 +1,607 @@
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.services.ann_index import IVFPQIndex
+from app.services.distance import check_metric, cosine_similarity, from_similarity, l2_normalize
+from app.services.prototypes import compute_prototypes
+from app.services.shared_gallery import SharedGalleryReader
+
+class GallerySnapshot:
+    """Immutable view of the gallery at one database version.
+
+    Readers grab the current snapshot once per request and never see a
+    half-applied registration or deletion.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        norms: np.ndarray,
+        person_ids: np.ndarray,
+        alive: np.ndarray,
+        names: Dict[int, str],
+        version: int,
+        ann_state: Optional[Tuple] = None,
+        proto_embeddings: Optional[np.ndarray] = None,
+        proto_person_ids: Optional[np.ndarray] = None
+    ):
+        self.embeddings = embeddings
+        self.norms = norms
+        self.person_ids = person_ids
+        self.alive = alive
+        self.names = names
+        self.version = version
+        self.ann_state = ann_state
+        self.proto_embeddings = proto_embeddings if proto_embeddings is not None else np.empty((0, 0), dtype=np.float32)
+        self.proto_person_ids = proto_person_ids if proto_person_ids is not None else np.empty(0, dtype=np.int64)
+        self.dead_count = int(len(alive) - np.count_nonzero(alive))
+
+    def __len__(self) -> int:
+        return len(self.person_ids) - self.dead_count
+
+class GalleryIndex:
+    """Process-wide in-memory index of all enrolled face encodings.
+
+    Embeddings are kept as one contiguous matrix of L2-normalized rows (float32,
+    or float16 with GALLERY_DTYPE) with a parallel array of person ids, so matching a probe against the whole
+    gallery is a single matrix product instead of a Python loop.
+
+    Writes are copy-on-write: new rows are appended past the end of the
+    currently published snapshot (growing the buffer geometrically), deleted
+    rows are tombstoned and compacted away once they pile up, and every change
+    is published as a new snapshot. Changes made by other worker processes are
+    picked up by comparing the database gallery version on each refresh.
+
+    With SEARCH_BACKEND set to "ivfpq", galleries of at least
+    ANN_MIN_GALLERY_SIZE rows are searched through an IVF-PQ index that
+    shortlists candidates, which are then re-ranked exactly. Smaller galleries
+    use two-stage matching when TWO_STAGE_MATCHING is on: probes are first
+    compared with a few prototypes per person (see app.services.prototypes)
+    and only the encodings of the PROTOTYPE_SHORTLIST closest people are
+    compared in full.
+
+    With SHARED_GALLERY_DIR set (by the app.serve launcher), the index never
+    reads the database: it maps the generations the launcher publishes there
+    read-only (see app.services.shared_gallery), so N worker processes share
+    one copy of the matrix. Local writes are then left to the launcher, which
+    republishes once it sees the new database version.
+
+    With `shard` set to (index, count) the index only holds the people whose
+    person_id % count == index; app.shard_worker serves one such slice to the
+    scatter-gather search of app.services.sharded_gallery.
+    """
+
+    def __init__(
+        self,
+        distance_metric: str = None,
+        compact_ratio: float = None,
+        backend: str = None,
+        shared_dir: str = None,
+        shard: Optional[Tuple[int, int]] = None
+    ):
+        self.distance_metric = check_metric(distance_metric or settings.DISTANCE_METRIC)
+        self.dtype = np.dtype(settings.GALLERY_DTYPE)
+        self.compact_ratio = compact_ratio if compact_ratio is not None else settings.GALLERY_COMPACT_RATIO
+        shared_dir = settings.SHARED_GALLERY_DIR if shared_dir is None else shared_dir
+        self.shared = SharedGalleryReader(shared_dir) if shared_dir else None
+        self.backend = backend or settings.SEARCH_BACKEND
+        # Shared generations are searched exactly (with prototypes), never through IVF-PQ
+        self.ann = IVFPQIndex() if self.backend == "ivfpq" and self.shared is None else None
+        # Whether the ANN lists were rebuilt from the current buffers (and kept in step since)
+        self._ann_synced = False
+        self._retraining = False
+        self.shard = shard
+        self.ann_path = settings.ANN_INDEX_PATH
+        if shard is not None:
+            root, ext = os.path.splitext(self.ann_path)
+            self.ann_path = f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
+        self.loaded = False
+        self._buffer = np.empty((0, 0), dtype=self.dtype)
+        self._norm_buffer = np.empty(0, dtype=np.float32)
+        self._id_buffer = np.empty(0, dtype=np.int64)
+        # Prototypes are few per person, so they are simply copied on write
+        self._prototypes = np.empty((0, 0), dtype=np.float32)
+        self._proto_ids = np.empty(0, dtype=np.int64)
+        self._snapshot = GallerySnapshot(
+            self._buffer, self._norm_buffer, self._id_buffer,
+            np.empty(0, dtype=bool), {}, version=-1
+        )
+        # Reentrant, so local writes can hold it across their commit (see local_write)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def people(self) -> int:
+        return len(self._snapshot.names)
+
+    def snapshot(self) -> GallerySnapshot:
+        """Return the currently published snapshot"""
+        return self._snapshot
+
+    def build(self, db_service) -> None:
+        """(Re)build the index from every encoding stored in the database"""
+        if self.shared is not None:
+            self._attach_shared(timeout=settings.SHARED_GALLERY_WAIT_SECONDS)
+            if not self.loaded:
+                raise RuntimeError(f"No gallery published in {self.shared.directory}")
+            return
+
+        with self._lock:
+            self._build(db_service)
+
+    def refresh(self, db_service) -> None:
+        """Rebuild the index if the database changed behind our back"""
+        if self.shared is not None:
+            if self.shared.changed() or not self.loaded:
+                self._attach_shared()
+            return
+
+        if self.loaded and db_service.get_gallery_version() == self._snapshot.version:
+            return
+
+        with self._lock:
+            # Another request may have rebuilt it while we waited for the lock
+            if self.loaded and db_service.get_gallery_version() == self._snapshot.version:
+                return
+            self._build(db_service)
+
+    def local_write(self):
+        """Lock to hold from committing a gallery write until it is applied here.
+
+        Without it a refresh in between sees the new database version before
+        the in-memory update and rebuilds the whole gallery. Take it before
+        the write's first statement, so threads of this process always take
+        this lock before the database one.
+        """
+        return self._lock
+
+    def add_person(self, person_id: int, name: str, embeddings, version: int, prototypes=None) -> None:
+        """Append a newly enrolled person's encodings to the gallery.
+
+        Args:
+            person_id: ID of the enrolled person
+            name: Name of the enrolled person
+            embeddings: Face encodings stored for the person
+            version: Gallery version returned by the write that stored them
+            prototypes: Prototypes stored for the person (computed if omitted)
+        """
+        vectors, norms = l2_normalize(embeddings)
+        if prototypes is None:
+            prototypes = compute_prototypes(vectors)
+        prototypes = np.atleast_2d(np.asarray(prototypes, dtype=np.float32))
+
+        with self._lock:
+            current = self._snapshot
+            if not self._can_apply(version, vectors.shape[1]):
+                return
+
+            size = len(current.person_ids)
+            new_size = size + len(vectors)
+            if new_size > len(self._id_buffer) or self._buffer.shape[1] != vectors.shape[1]:
+                self._grow(new_size, vectors.shape[1])
+
+            # Rows past `size` are not visible through any published snapshot
+            self._buffer[size:new_size] = vectors
+            self._norm_buffer[size:new_size] = norms
+            self._id_buffer[size:new_size] = person_id
+            if self._ann_active():
+                self.ann.add(vectors, start_row=size, version=version)
+            if len(self._proto_ids) and self._prototypes.shape[1] == prototypes.shape[1]:
+                self._prototypes = np.concatenate([self._prototypes, prototypes])
+                self._proto_ids = np.concatenate([self._proto_ids, np.full(len(prototypes), person_id, dtype=np.int64)])
+            else:
+                self._prototypes = prototypes
+                self._proto_ids = np.full(len(prototypes), person_id, dtype=np.int64)
+
+            names = dict(current.names)
+            names[person_id] = name
+            self._publish(
+                new_size,
+                np.concatenate([current.alive, np.ones(len(vectors), dtype=bool)]),
+                names,
+                version
+            )
+            self._maybe_retrain()
+
+    def remove_person(self, person_id: int, version: int) -> None:
+        """Tombstone every gallery row that belongs to a deleted person"""
+        with self._lock:
+            current = self._snapshot
+            if not self._can_apply(version):
+                return
+
+            alive = current.alive & (current.person_ids != person_id)
+            keep = self._proto_ids != person_id
+            self._prototypes = self._prototypes[keep]
+            self._proto_ids = self._proto_ids[keep]
+            names = {pid: name for pid, name in current.names.items() if pid != person_id}
+            self._publish(len(current.person_ids), alive, names, version)
+
+            if self._snapshot.dead_count > self.compact_ratio * len(self._snapshot.person_ids):
+                self._compact()
+
+    def search(self, probes, k: int = 1, unique_persons: bool = False) -> List[List[Dict[str, Any]]]:
+        """Return the k closest gallery rows for each probe embedding.
+
+        Args:
+            probes: A single embedding or a (n_probes, dim) array of embeddings
+            k: Number of candidates to return per probe
+            unique_persons: Return the k closest people (by their best row)
+                instead of the k closest rows
+
+        Returns:
+            One list per probe of candidates sorted by ascending distance
+        """
+        snapshot = self._snapshot
+
+        if not len(probes):
+            return []
+
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        if not len(snapshot) or probes.shape[1] != snapshot.embeddings.shape[1]:
+            return [[] for _ in range(len(probes))]
+
+        unit_probes, probe_norms = l2_normalize(probes)
+        if snapshot.ann_state is not None:
+            return self._search_ann(snapshot, unit_probes, probe_norms, k, unique_persons)
+        if self._use_prototypes(snapshot, k):
+            shortlisted = self._shortlist_people(snapshot, unit_probes)
+            if len(shortlisted):
+                snapshot = shortlisted
+
+        similarity = cosine_similarity(unit_probes, snapshot.embeddings)
+        distances = from_similarity(self.distance_metric, similarity, probe_norms, snapshot.norms)
+        if snapshot.dead_count:
+            distances[:, ~snapshot.alive] = np.inf
+
+        k = min(k, len(snapshot))
+        if not unique_persons:
+            return self._collect(snapshot, distances, self._top_rows(distances, k), k, unique=False)
+
+        # The first k distinct people in row order are exactly the k closest
+        # people, so widen the row window until every probe has k of them
+        people = min(k, len(snapshot.names))
+        width = k
+        while True:
+            results = self._collect(snapshot, distances, self._top_rows(distances, width), people, unique=True)
+            if width >= len(snapshot) or all(len(found) >= people for found in results):
+                return results
+            width = min(len(snapshot), width * 4)
+
+    def retrain_ann(self) -> None:
+        """Retrain the ANN quantizers on the current gallery and persist them
+
+        Training runs on a snapshot outside the lock, so searches and
+        enrollments carry on; rows enrolled meanwhile are encoded when the
+        new index is swapped in.
+        """
+        if self.ann is None:
+            return
+        snapshot = self._snapshot
+        ann = IVFPQIndex(self.ann.nlist, self.ann.pq_subvectors, self.ann.nprobe, self.ann.rerank)
+        ann.train(snapshot.embeddings[snapshot.alive])
+
+        with self._lock:
+            if ann.dim != self._buffer.shape[1]:
+                # The embedding model changed while training; the next build retrains
+                return
+            self._ann_synced = False
+            self.ann = ann
+            self._compact()
+            self.ann.reset(self._snapshot.embeddings, self._snapshot.version)
+            self._ann_synced = True
+            self._save_ann()
+            self._republish()
+
+    def _search_ann(
+        self,
+        snapshot: GallerySnapshot,
+        unit_probes: np.ndarray,
+        probe_norms: np.ndarray,
+        k: int,
+        unique_persons: bool
+    ) -> List[List[Dict[str, Any]]]:
+        """Shortlist rows with the ANN index, then re-rank them exactly"""
+        size = len(snapshot.person_ids)
+        count = max(self.ann.rerank, k)
+        results = []
+        for probe, probe_norm in zip(unit_probes, probe_norms):
+            rows = self.ann.shortlist(probe, snapshot.ann_state, count=count)
+            rows = rows[rows < size]
+            rows = rows[snapshot.alive[rows]]
+
+            distances = from_similarity(
+                self.distance_metric,
+                cosine_similarity(probe[None, :], snapshot.embeddings[rows]),
+                np.array([probe_norm]),
+                snapshot.norms[rows]
+            )[0]
+            order = np.argsort(distances)
+            results.append(self._candidates(snapshot, rows[order], distances[order], k, unique_persons))
+        return results
+
+    def _use_prototypes(self, snapshot: GallerySnapshot, k: int) -> bool:
+        """Whether shortlisting people by prototype saves any work"""
+        return (
+            settings.TWO_STAGE_MATCHING
+            and k <= settings.PROTOTYPE_SHORTLIST < len(snapshot.names)
+            and snapshot.proto_embeddings.shape[1] == snapshot.embeddings.shape[1]
+        )
+
+    def _shortlist_people(self, snapshot: GallerySnapshot, unit_probes: np.ndarray) -> GallerySnapshot:
+        """Restrict a snapshot to the people whose prototypes are closest to any probe"""
+        shortlist = settings.PROTOTYPE_SHORTLIST
+        similarity = unit_probes @ snapshot.proto_embeddings.T
+        width = min(similarity.shape[1], 4 * shortlist)
+        top = np.argpartition(-similarity, width - 1, axis=1)[:, :width]
+        order = np.argsort(-np.take_along_axis(similarity, top, axis=1), axis=1)
+
+        people = []
+        for rows in np.take_along_axis(top, order, axis=1):
+            # The first `shortlist` distinct people in prototype order
+            person_ids, first = np.unique(snapshot.proto_person_ids[rows], return_index=True)
+            people.append(person_ids[np.argsort(first)][:shortlist])
+
+        rows = np.flatnonzero(np.isin(snapshot.person_ids, np.concatenate(people)) & snapshot.alive)
+        return GallerySnapshot(
+            snapshot.embeddings[rows],
+            snapshot.norms[rows],
+            snapshot.person_ids[rows],
+            np.ones(len(rows), dtype=bool),
+            snapshot.names,
+            snapshot.version
+        )
+
+    def _top_rows(self, distances: np.ndarray, k: int) -> np.ndarray:
+        """Indexes of the k smallest distances per probe, sorted ascending"""
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def _collect(
+        self,
+        snapshot: GallerySnapshot,
+        distances: np.ndarray,
+        top: np.ndarray,
+        limit: int,
+        unique: bool
+    ) -> List[List[Dict[str, Any]]]:
+        """Turn row indexes into up to `limit` candidate dicts per probe"""
+        return [
+            self._candidates(snapshot, rows, distances[probe_idx, rows], limit, unique)
+            for probe_idx, rows in enumerate(top)
+        ]
+
+    def _candidates(
+        self,
+        snapshot: GallerySnapshot,
+        rows: np.ndarray,
+        distances: np.ndarray,
+        limit: int,
+        unique: bool
+    ) -> List[Dict[str, Any]]:
+        """Candidate dicts for one probe from rows sorted by ascending distance"""
+        candidates = []
+        seen = set()
+        for row, distance in zip(rows, distances):
+            person_id = int(snapshot.person_ids[row])
+            if unique and person_id in seen:
+                continue
+            seen.add(person_id)
+            candidates.append({
+                'person_id': person_id,
+                'name': snapshot.names.get(person_id),
+                'distance': float(distance)
+            })
+            if len(candidates) >= limit:
+                break
+        return candidates
+
+    def _build(self, db_service) -> None:
+        """Load every encoding from the database; caller holds the lock"""
+        # Read the version first so a concurrent write only causes another refresh
+        version = db_service.get_gallery_version()
+        person_ids, names, matrix = db_service.get_gallery_embeddings(shard=self.shard)
+        self._load_prototypes(db_service, person_ids, matrix)
+
+        if len(matrix):
+            self._buffer, self._norm_buffer = l2_normalize(matrix, self.dtype)
+        else:
+            self._buffer, self._norm_buffer = matrix.astype(self.dtype), np.empty(0, dtype=np.float32)
+        self._id_buffer = person_ids
+        if self.ann is not None:
+            self._sync_ann(version)
+        self._publish(
+            len(person_ids),
+            np.ones(len(person_ids), dtype=bool),
+            names,
+            version
+        )
+        self.loaded = True
+        self._maybe_retrain()
+
+    def _load_prototypes(self, db_service, person_ids: np.ndarray, matrix: np.ndarray) -> None:
+        """Load stored prototypes and compute the ones missing for older enrollments"""
+        proto_ids, prototypes = db_service.get_gallery_prototypes(shard=self.shard)
+        if len(proto_ids) and prototypes.shape[1] != matrix.shape[1]:
+            proto_ids, prototypes = proto_ids[:0], np.empty((0, matrix.shape[1]), dtype=np.float32)
+        # Ignore prototypes of people whose encodings were not loaded
+        enrolled = np.isin(proto_ids, person_ids)
+        proto_ids, prototypes = proto_ids[enrolled], prototypes[enrolled]
+
+        missing = np.setdiff1d(np.unique(person_ids), proto_ids)
+        if len(missing):
+            order = np.argsort(person_ids, kind="stable")
+            sorted_ids = person_ids[order]
+            starts = np.searchsorted(sorted_ids, missing, side="left")
+            ends = np.searchsorted(sorted_ids, missing, side="right")
+            computed = {
+                int(person_id): compute_prototypes(matrix[order[start:end]])
+                for person_id, start, end in zip(missing, starts, ends)
+            }
+            try:
+                db_service.save_prototypes(computed)
+            except Exception as e:
+                print(f"Error saving prototypes: {str(e)}")
+            proto_ids = np.concatenate([proto_ids] + [
+                np.full(len(person_prototypes), person_id, dtype=np.int64)
+                for person_id, person_prototypes in computed.items()
+            ])
+            prototypes = np.concatenate([prototypes.reshape(-1, matrix.shape[1])] + list(computed.values()))
+
+        self._prototypes = prototypes.astype(np.float32, copy=False)
+        self._proto_ids = proto_ids
+
+    def _can_apply(self, version: int, dim: int = None) -> bool:
+        """Check that a write directly follows the published snapshot.
+
+        Anything else means another process wrote in between; the next
+        refresh will notice the version mismatch and reload. Mapped shared
+        generations are read-only and only change through the launcher.
+        """
+        if self.shared is not None or not self.loaded or version != self._snapshot.version + 1:
+            return False
+        if dim is not None and len(self._snapshot) and self._buffer.shape[1] != dim:
+            return False
+        return True
+
+    def _attach_shared(self, timeout: float = 0.0) -> None:
+        """Swap in the latest generation published by the launcher, if it is new"""
+        with self._lock:
+            generation = self.shared.load(timeout)
+            if generation is None:
+                return
+
+            self._buffer = generation["embeddings"]
+            self._norm_buffer = generation["norms"]
+            self._id_buffer = generation["person_ids"]
+            self._prototypes = generation["prototypes"]
+            self._proto_ids = generation["proto_person_ids"]
+            self._publish(
+                len(self._id_buffer),
+                np.ones(len(self._id_buffer), dtype=bool),
+                generation["names"],
+                generation["version"]
+            )
+            self.loaded = True
+
+    def _grow(self, min_capacity: int, dim: int) -> None:
+        """Move the buffers to new arrays with room for at least min_capacity rows"""
+        size = len(self._snapshot.person_ids)
+        capacity = max(min_capacity, 2 * len(self._id_buffer), 64)
+
+        buffer = np.empty((capacity, dim), dtype=self.dtype)
+        norm_buffer = np.empty(capacity, dtype=np.float32)
+        id_buffer = np.empty(capacity, dtype=np.int64)
+        if size and self._buffer.shape[1] == dim:
+            buffer[:size] = self._buffer[:size]
+            norm_buffer[:size] = self._norm_buffer[:size]
+            id_buffer[:size] = self._id_buffer[:size]
+
+        self._buffer, self._norm_buffer, self._id_buffer = buffer, norm_buffer, id_buffer
+
+    def _compact(self) -> None:
+        """Drop tombstoned rows into fresh buffers and republish"""
+        current = self._snapshot
+        alive = current.alive
+        self._buffer = np.ascontiguousarray(current.embeddings[alive])
+        self._norm_buffer = current.norms[alive].copy()
+        self._id_buffer = current.person_ids[alive].copy()
+        if self._ann_active():
+            self.ann.remap(alive)
+        self._publish(len(self._id_buffer), np.ones(len(self._id_buffer), dtype=bool), current.names, current.version)
+
+    def _ann_active(self) -> bool:
+        return (
+            self.ann is not None and self._ann_synced
+            and self.ann.trained and self.ann.dim == self._buffer.shape[1]
+        )
+
+    def _sync_ann(self, version: int) -> None:
+        """Bring the ANN index in line with freshly loaded buffers"""
+        # The old lists number rows of the old buffers; never append to them
+        self._ann_synced = False
+        size = len(self._id_buffer)
+        if size < settings.ANN_MIN_GALLERY_SIZE:
+            # Too small to train on, but keep trained quantizers in step so the
+            # index is usable again once enrollments take it past the minimum
+            if self.ann.trained and self.ann.dim == self._buffer.shape[1]:
+                self.ann.reset(self._buffer, version)
+                self._ann_synced = True
+            return
+
+        if not self.ann.trained and not self.ann.load(self.ann_path):
+            self.ann.train(self._buffer)
+        elif self.ann.dim != self._buffer.shape[1]:
+            # The embedding model changed; the quantizers are useless now
+            self.ann.train(self._buffer)
+
+        # A persisted index of the same version and size matches row for row
+        if self.ann.version != version or self.ann.size != size:
+            self.ann.reset(self._buffer, version)
+            self._save_ann()
+        self._ann_synced = True
+
+    def _maybe_retrain(self) -> None:
+        """Retrain in the background once the gallery outgrew the sample the quantizers were fitted to"""
+        growth = settings.ANN_RETRAIN_GROWTH
+        if growth <= 0 or self._retraining or not self._ann_active():
+            return
+        if len(self._snapshot) <= growth * max(self.ann.trained_size, 1):
+            return
+        self._retraining = True
+        threading.Thread(target=self._retrain_in_background, name="ann-retrain", daemon=True).start()
+
+    def _retrain_in_background(self) -> None:
+        try:
+            self.retrain_ann()
+        except Exception as e:
+            print(f"Error retraining ANN index: {str(e)}")
+        finally:
+            self._retraining = False
+
+    def _save_ann(self) -> None:
+        try:
+            self.ann.save(self.ann_path)
+        except Exception as e:
+            print(f"Error saving ANN index: {str(e)}")
+
+    def _republish(self) -> None:
+        """Publish the current snapshot again so it captures the latest ANN state"""
+        current = self._snapshot
+        self._publish(len(current.person_ids), current.alive, current.names, current.version)
+
+    def _publish(self, size: int, alive: np.ndarray, names: Dict[int, str], version: int) -> None:
+        """Atomically swap in a new snapshot over the first `size` buffer rows"""
+        ann_state = None
+        if self._ann_active() and self.ann.size == size and size >= settings.ANN_MIN_GALLERY_SIZE:
+            ann_state = self.ann.state
+        self._snapshot = GallerySnapshot(
+            self._buffer[:size],
+            self._norm_buffer[:size],
+            self._id_buffer[:size],
+            alive,
+            names,
+            version,
+            ann_state,
+            self._prototypes,
+            self._proto_ids
+        )
+
+# Shared index for the whole process, or a client of the shard workers
+if settings.GALLERY_SHARDS:
+    from app.services.sharded_gallery import ShardedGallery
+
+    gallery_index = ShardedGallery(settings.GALLERY_SHARDS.split(","))
+else:
+    gallery_index = GalleryIndex()
@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.services.model_manager import model_manager
+from app.services.metrics import registry, record
+
+# Crops per forward pass
+batch_size_histogram = registry.histogram(
+    "faceid_inference_batch_size", "Face crops embedded per forward pass", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+class InferenceScheduler:
+    """Dynamic micro-batcher for face embedding inference.
+
+    Requests hand in aligned face crops and get a future per crop. A single
+    worker thread collects crops from all concurrent callers until either
+    `max_batch_size` crops are queued or `max_wait_ms` has passed since the
+    first one arrived, runs one batched forward pass and resolves the futures.
+    """
+
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None, embed_fn=None):
+        self.max_batch_size = max_batch_size or settings.INFERENCE_MAX_BATCH_SIZE
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else settings.INFERENCE_MAX_WAIT_MS
+        self.embed_fn = embed_fn or model_manager.embed_batch
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of face crops waiting for a forward pass"""
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the worker thread if it is not running yet"""
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker thread after it drains the crops already queued"""
+        with self._lock:
+            if not self.running:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, faces: List[np.ndarray]) -> List[Future]:
+        """Queue face crops for embedding and return one future per crop"""
+        if not self.running:
+            self.start()
+
+        futures = []
+        for face in faces:
+            future = Future()
+            self._queue.put((face, future))
+            futures.append(future)
+        return futures
+
+    def embed(self, faces: List[np.ndarray]) -> List[np.ndarray]:
+        """Embed face crops, blocking until their batch has run"""
+        return [future.result() for future in self.submit(faces)]
+
+    def _run(self) -> None:
+        """Worker loop: gather a batch, run it, resolve its futures"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    # Past the deadline, only take crops that are already waiting
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]) -> None:
+        """Run one forward pass and hand each caller its embedding"""
+        # Callers may have given up on their futures in the meantime
+        batch = [(face, future) for face, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            embeddings = self.embed_fn([face for face, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # Runs on the scheduler thread, so this only feeds the histograms
+        record("embed_forward", time.perf_counter() - started)
+        batch_size_histogram.observe(len(batch))
+
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+# Shared scheduler for the whole process
+inference_scheduler = InferenceScheduler()
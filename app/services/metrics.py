@@ -0,0 +1,278 @@
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.config import settings
+
+log = logging.getLogger("faceid.metrics")
+
+# Latency buckets in seconds, from sub-millisecond matching to slow registrations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Histogram:
+    """Prometheus-style histogram keyed by label values"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for label_values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _labels(self.label_names, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def total(self) -> float:
+        """Sum over every label combination"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in values)
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time.
+
+    The callback returns a number, or a dict from a label value (or tuple of
+    label values) to a number. With kind="counter" the value is exposed as a
+    counter, for totals another component already keeps.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        callback: Callable[[], Union[float, Dict]],
+        labels: Tuple[str, ...] = (),
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.label_names = labels
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            log.warning("Error reading gauge %s: %s", self.name, e)
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {float(value or 0)}")
+        return lines
+
+class MetricsRegistry:
+    """Every metric of the process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._names = set()
+
+    def register(self, metric):
+        if metric.name in self._names:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._names.add(metric.name)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, callback, labels: Tuple[str, ...] = (), kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, callback, labels, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class RequestTrace:
+    """Stage timings collected for one request, for the slow-request log"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def breakdown(self) -> Dict[str, float]:
+        """Milliseconds per stage, summed over repeated spans"""
+        totals: Dict[str, float] = {}
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds * 1000
+        return {stage: round(ms, 3) for stage, ms in totals.items()}
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "faceid_stage_seconds", "Time spent in each recognition pipeline stage", ("stage",)
+)
+request_seconds = registry.histogram(
+    "faceid_request_seconds", "End-to-end HTTP request latency", ("method", "route")
+)
+requests_total = registry.counter(
+    "faceid_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+
+# The trace of the request being handled; executors copy it into their threads
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("current_trace", default=None)
+
+slow_log = logging.getLogger("faceid.slow_requests")
+if not slow_log.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.INFO)
+    slow_log.propagate = False
+
+def record(stage: str, seconds: float) -> None:
+    """Record a stage duration in its histogram and the current request's trace"""
+    stage_seconds.observe(seconds, stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.spans.append((stage, seconds))
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+def timed(stage: str):
+    """Decorator form of span() for functions that are one stage as a whole"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def finish_trace(trace: RequestTrace, route: str, status: int) -> None:
+    """Record a finished request and log its stage breakdown if it was slow"""
+    seconds = time.perf_counter() - trace.started
+    request_seconds.observe(seconds, trace.method, route)
+    requests_total.inc(trace.method, route, str(status))
+
+    if settings.SLOW_REQUEST_MS and seconds * 1000 >= settings.SLOW_REQUEST_MS:
+        slow_log.info(json.dumps({
+            "event": "slow_request",
+            "method": trace.method,
+            "route": route,
+            "path": trace.path,
+            "status": status,
+            "duration_ms": round(seconds * 1000, 3),
+            "stages_ms": trace.breakdown()
+        }))
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request and collects its stage trace"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_trace.reset(token)
+            finish_trace(trace, route_label(scope), status)
+
+def route_label(scope) -> str:
+    """Route template of a handled request, e.g. /api/v1/person/{person_id}
+
+    The template, not the path, so person IDs do not turn into one time
+    series each.
+    """
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path_format"):
+        return "unmatched"
+    # Newer FastAPI versions hand over the route of an included router without
+    # its prefix; the prefix is whatever part of the path the route does not match
+    path = scope["path"]
+    for start, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[start:]):
+            return path[:start] + route.path_format
+    return route.path_format
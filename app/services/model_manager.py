@@ -0,0 +1,174 @@
+import threading
+import time
+import cv2
+import numpy as np
+from typing import List, Dict, Any, Union
+
+from app.config import settings
+
+def _import_deepface():
+    """Import DeepFace, and with it TensorFlow, on first use rather than at startup"""
+    try:
+        from deepface import DeepFace
+    except ImportError:
+        # Only the stub backend can run without DeepFace and TensorFlow
+        raise RuntimeError("DeepFace is not installed; install it or set FACE_MODEL_BACKEND=stub")
+    return DeepFace
+
+class ModelManager:
+    """Owns the DeepFace recognition model and face detector for the process.
+
+    Both are built once (normally in a background thread started by the
+    FastAPI lifespan hook) and warmed up with a synthetic image, so the first
+    real request does not pay for graph construction. DeepFace itself is only
+    imported by load(), which keeps TensorFlow out of the API's import time.
+    """
+
+    def __init__(self, model_name: str = None, detector_backend: str = None, backend: str = None):
+        self.model_name = model_name or settings.FACE_RECOGNITION_MODEL
+        self.detector_backend = detector_backend or settings.FACE_DETECTION_MODEL
+        self.backend = backend or settings.FACE_MODEL_BACKEND
+        self.model = None
+        self.detector = None
+        self.ready = False
+        self.load_seconds = None
+        self.load_error = None
+        self._deepface = None
+        self._lock = threading.Lock()
+
+    def load(self, warm_up: bool = True) -> None:
+        """Build the model and detector once and optionally warm them up"""
+        with self._lock:
+            if self.ready:
+                return
+
+            started = time.perf_counter()
+            try:
+                if self.backend == "stub":
+                    from app.services.stub_model import StubFaceModel
+
+                    self.model = StubFaceModel(self.model_name, settings.STUB_MODEL_LATENCY_MS)
+                    self.detector = self.model
+                    warm_up = False
+                else:
+                    self._deepface = _import_deepface()
+                    self.model = self._deepface.build_model(self.model_name)
+                    self.detector = self._build_detector()
+            except Exception as e:
+                self.load_error = str(e)
+                raise
+
+            if warm_up:
+                self._warm_up()
+
+            self.load_seconds = time.perf_counter() - started
+            self.ready = True
+            print(f"Loaded {self.backend} {self.model_name} with {self.detector_backend} detector in {self.load_seconds:.2f}s")
+
+    def extract_faces(
+        self,
+        img: Union[str, np.ndarray],
+        enforce_detection: bool = False,
+        detector_backend: str = None
+    ) -> List[Dict[str, Any]]:
+        """Detect and align faces without running the recognition model"""
+        if not self.ready:
+            self.load(warm_up=False)
+
+        if self.backend == "stub":
+            return self.model.extract_faces(img, enforce_detection)
+
+        return self._deepface.extract_faces(
+            img_path=img,
+            detector_backend=detector_backend or self.detector_backend,
+            enforce_detection=enforce_detection,
+            align=True
+        )
+
+    def embed_batch(self, faces: List[np.ndarray]) -> np.ndarray:
+        """Embed a batch of aligned face crops with one forward pass.
+
+        Args:
+            faces: RGB face crops as returned by extract_faces
+
+        Returns:
+            A (len(faces), dim) float32 array of embeddings
+        """
+        if not self.ready:
+            self.load(warm_up=False)
+
+        return self._forward(faces)
+
+    def _forward(self, faces: List[np.ndarray]) -> np.ndarray:
+        """Run the recognition model on a batch of face crops"""
+        if self.backend == "stub":
+            return self.model.embed(faces)
+
+        batch = np.stack([self._prepare_face(face) for face in faces])
+        # DeepFace wraps the Keras model in a client object in newer releases
+        keras_model = getattr(self.model, "model", self.model)
+        embeddings = keras_model.predict_on_batch(batch)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(faces), -1)
+
+    def _prepare_face(self, face: np.ndarray) -> np.ndarray:
+        """Resize a face crop to the model input the same way DeepFace.represent does"""
+        target_h, target_w = self._input_shape()
+
+        # extract_faces returns RGB while the models expect BGR
+        img = np.asarray(face, dtype=np.float32)[:, :, ::-1]
+        if img.max() > 1:
+            img = img / 255.0
+
+        # Scale to fit, then pad to the exact input size keeping the aspect ratio
+        factor = min(target_h / img.shape[0], target_w / img.shape[1])
+        size = (max(1, int(img.shape[1] * factor)), max(1, int(img.shape[0] * factor)))
+        img = cv2.resize(img, size)
+
+        pad_h = target_h - img.shape[0]
+        pad_w = target_w - img.shape[1]
+        img = np.pad(
+            img,
+            ((pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)),
+            mode="constant"
+        )
+        if img.shape[:2] != (target_h, target_w):
+            img = cv2.resize(img, (target_w, target_h))
+        return img.astype(np.float32)
+
+    def _input_shape(self):
+        """Return the (height, width) the recognition model expects"""
+        shape = getattr(self.model, "input_shape", None)
+        if shape is not None and len(shape) == 2:
+            # DeepFace clients report (width, height)
+            return int(shape[1]), int(shape[0])
+        # Plain Keras models report (batch, height, width, channels)
+        height, width = getattr(self.model, "model", self.model).input_shape[1:3]
+        return int(height), int(width)
+
+    def _build_detector(self):
+        """Build the face detector through DeepFace's model cache"""
+        try:
+            return self._deepface.build_model(self.detector_backend, task="face_detector")
+        except TypeError:
+            # Older DeepFace releases build detectors lazily on first use,
+            # which the warm-up inference takes care of
+            return None
+
+    def _warm_up(self) -> None:
+        """Run one inference on a synthetic image to finish graph construction"""
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+        try:
+            self._deepface.represent(
+                img_path=image,
+                model_name=self.model_name,
+                detector_backend=self.detector_backend,
+                enforce_detection=False
+            )
+            # The batched path used by the inference scheduler is traced separately
+            self._forward([image])
+        except Exception as e:
+            print(f"Error in model warm-up: {str(e)}")
+
+# Shared model manager for the whole process
+model_manager = ModelManager()
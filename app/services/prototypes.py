@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.config import settings
+from app.services.ann_index import kmeans
+from app.services.distance import l2_normalize
+
+def compute_prototypes(embeddings, clusters: int = None, min_images: int = None) -> np.ndarray:
+    """Summarize one person's embeddings as a few normalized prototypes.
+
+    The first row is always the normalized centroid. People with at least
+    `min_images` embeddings also get up to `clusters` k-means sub-centroids,
+    which cover distinct poses or lighting better than a single average.
+
+    Returns:
+        A (n_prototypes, dim) float32 array of unit vectors
+    """
+    clusters = clusters if clusters is not None else settings.PROTOTYPE_CLUSTERS
+    min_images = min_images if min_images is not None else settings.PROTOTYPE_MIN_IMAGES
+
+    vectors, _ = l2_normalize(embeddings)
+    prototypes = [vectors.mean(axis=0, keepdims=True)]
+
+    if clusters > 1 and len(vectors) >= min_images:
+        prototypes.append(kmeans(vectors, min(clusters, len(vectors) // 2), iterations=10))
+
+    return l2_normalize(np.concatenate(prototypes))[0]
@@ -0,0 +1,209 @@
+import heapq
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any
+
+import numpy as np
+
+from app.config import settings
+from app.services.metrics import registry, record
+
+shard_failures = registry.counter(
+    "faceid_shard_failures_total", "Shard searches that missed the deadline or failed", ("shard", "reason")
+)
+
+class ShardsUnavailable(Exception):
+    """Raised when too few gallery shards answer a search before the deadline"""
+
+    def __init__(self, message: str, retry_after: int = None):
+        super().__init__(message)
+        self.retry_after = retry_after if retry_after is not None else settings.RETRY_AFTER_SECONDS
+
+def shard_of(person_id: int, shards: int) -> int:
+    """Shard holding a person; the shard workers load the same partition in SQL"""
+    return person_id % shards
+
+def merge_results(responses: List[List[List[Dict[str, Any]]]], probes: int, k: int) -> List[List[Dict[str, Any]]]:
+    """Merge per-shard top-k candidate lists into the overall top-k per probe.
+
+    Shards hold disjoint people, so the overall k closest rows (or people)
+    are among the union of every shard's k closest, and a person never
+    appears twice in the merged list of a unique_persons search.
+    """
+    return [
+        heapq.nsmallest(k, (candidate for results in responses for candidate in results[probe]),
+                        key=lambda candidate: candidate["distance"])
+        for probe in range(probes)
+    ]
+
+class ShardClient:
+    """Keep-alive HTTP connections to one shard worker, one per calling thread"""
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlparse(url)
+        self.url = url
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, timeout: float, body: bytes = None, headers: Dict[str, str] = None) -> Dict[str, Any]:
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            elif connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The shard closed an idle keep-alive connection (or restarted); reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+            except Exception:
+                connection.close()
+                self._local.connection = None
+                raise
+        if response.status != 200:
+            raise RuntimeError(f"{self.url} answered {response.status}: {payload[:200]!r}")
+        return json.loads(payload)
+
+class ShardedGallery:
+    """Scatter-gather search over gallery shards served by app.shard_worker.
+
+    Stands in for the process-wide GalleryIndex when GALLERY_SHARDS lists
+    shard worker URLs. Every search is sent to all shards in parallel and the
+    per-shard top-k are merged; the caller applies THRESHOLD to the merged
+    candidates exactly as with a local index. Shards that miss the
+    SHARD_TIMEOUT_MS deadline or fail are counted in
+    faceid_shard_failures_total and left out of the answer, unless
+    SHARD_ALLOW_PARTIAL is off or no shard answered at all, in which case
+    the search raises ShardsUnavailable (a 503 for the client).
+
+    Shard workers follow the database gallery version themselves, so local
+    writes need no forwarding.
+    """
+
+    def __init__(self, urls: List[str], timeout_ms: float = None, allow_partial: bool = None):
+        self.clients = [ShardClient(url.strip()) for url in urls if url.strip()]
+        self.timeout = (timeout_ms if timeout_ms is not None else settings.SHARD_TIMEOUT_MS) / 1000
+        self.allow_partial = settings.SHARD_ALLOW_PARTIAL if allow_partial is None else allow_partial
+        self.loaded = False
+        self._status: Dict[int, Dict[str, Any]] = {}
+        self._checked = 0.0
+        # Enough threads for every shard of every concurrent recognition
+        self._pool = ThreadPoolExecutor(
+            max_workers=len(self.clients) * max(1, settings.INFERENCE_WORKERS),
+            thread_name_prefix="shard-search"
+        )
+
+    def __len__(self) -> int:
+        return sum(status["rows"] for status in self._status.values())
+
+    @property
+    def version(self) -> int:
+        """Oldest gallery version any shard last reported"""
+        if len(self._status) < len(self.clients):
+            return -1
+        return min(status["version"] for status in self._status.values())
+
+    @property
+    def people(self) -> int:
+        return sum(status["people"] for status in self._status.values())
+
+    def status(self) -> Dict[int, Dict[str, Any]]:
+        """Gallery version, rows and people each shard last reported"""
+        return dict(self._status)
+
+    def build(self, db_service=None, wait_seconds: float = 30.0) -> None:
+        """Wait until every shard answers its health check; refresh keeps trying after that"""
+        deadline = time.monotonic() + wait_seconds
+        while not self._check_shards():
+            if time.monotonic() >= deadline:
+                missing = [client.url for shard, client in enumerate(self.clients) if shard not in self._status]
+                print(f"Error in gallery shards: not answering: {', '.join(missing)}")
+                return
+            time.sleep(0.5)
+
+    def refresh(self, db_service=None) -> None:
+        """Re-read shard sizes while the gallery looks empty or a shard has not answered yet"""
+        if (not self.loaded or not len(self)) and time.monotonic() - self._checked >= 1.0:
+            self._check_shards()
+
+    def local_write(self):
+        """Nothing to hold: the shards follow the database version themselves"""
+        return nullcontext()
+
+    def add_person(self, *args, **kwargs) -> None:
+        """Nothing to do: the owning shard reloads when the gallery version changes"""
+
+    def remove_person(self, *args, **kwargs) -> None:
+        """Nothing to do: the owning shard reloads when the gallery version changes"""
+
+    def search(self, probes, k: int = 1, unique_persons: bool = False) -> List[List[Dict[str, Any]]]:
+        """Return the k closest gallery rows (or people) for each probe across all shards"""
+        if not len(probes):
+            return []
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        body = probes.astype("<f4").tobytes()
+        path = f"/search?k={k}&unique={int(unique_persons)}"
+        headers = {"Content-Type": "application/octet-stream", "X-Embedding-Dim": str(probes.shape[1])}
+
+        started = time.perf_counter()
+        futures = {
+            self._pool.submit(client.request, "POST", path, self.timeout, body, headers): shard
+            for shard, client in enumerate(self.clients)
+        }
+        done, late = wait(futures, timeout=self.timeout)
+        record("shard_gather", time.perf_counter() - started)
+
+        responses = []
+        for future in done:
+            shard = futures[future]
+            try:
+                response = future.result()
+            except TimeoutError:
+                # The socket deadline expired just as the wait did
+                shard_failures.inc(str(shard), "timeout")
+                continue
+            except Exception as e:
+                shard_failures.inc(str(shard), "error")
+                print(f"Error searching gallery shard {shard}: {str(e)}")
+                continue
+            self._update_status(shard, response)
+            responses.append(response["results"])
+        for future in late:
+            shard_failures.inc(str(futures[future]), "timeout")
+
+        missing = len(self.clients) - len(responses)
+        if missing and (not self.allow_partial or not responses):
+            raise ShardsUnavailable(f"{missing} of {len(self.clients)} gallery shards did not answer in time")
+        return merge_results(responses, len(probes), k)
+
+    def _check_shards(self) -> bool:
+        """Fetch every shard's status; True if all of them answered"""
+        self._checked = time.monotonic()
+        futures = {
+            self._pool.submit(client.request, "GET", "/healthz", max(self.timeout, 1.0)): shard
+            for shard, client in enumerate(self.clients)
+        }
+        answered = 0
+        for future, shard in futures.items():
+            try:
+                self._update_status(shard, future.result())
+                answered += 1
+            except Exception:
+                pass
+        self.loaded = self.loaded or answered == len(self.clients)
+        return answered == len(self.clients)
+
+    def _update_status(self, shard: int, response: Dict[str, Any]) -> None:
+        self._status[shard] = {key: response[key] for key in ("version", "rows", "people")}
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+MANIFEST = "manifest.json"
+ARRAYS = ("embeddings", "norms", "person_ids", "prototypes", "proto_person_ids")
+
+def default_directory() -> str:
+    """A fresh directory on tmpfs when there is one, so mapped pages never touch disk"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    return str(Path(base or "/tmp") / f"faceid-gallery-{os.getpid()}")
+
+class SharedGalleryWriter:
+    """Publishes gallery generations as .npy files that worker processes memory-map.
+
+    Every publish writes a new `gen-<n>` directory and then atomically replaces
+    the manifest naming it, so readers only ever see complete generations.
+    The previous generation is kept for readers that have just read the old
+    manifest; older ones are deleted. Mappings of deleted files stay valid, so
+    a worker keeps searching its generation until it swaps to the next one.
+    """
+
+    def __init__(self, directory: str, keep: int = 2):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.generation = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def publish(self, snapshot) -> int:
+        """Write the live rows of a GallerySnapshot as the next generation
+
+        Returns:
+            The new generation number
+        """
+        generation = self.generation + 1
+        path = self.directory / f"gen-{generation:08d}"
+        path.mkdir()
+
+        alive = snapshot.alive
+        arrays = {
+            "embeddings": snapshot.embeddings[alive],
+            "norms": snapshot.norms[alive],
+            "person_ids": snapshot.person_ids[alive],
+            "prototypes": snapshot.proto_embeddings,
+            "proto_person_ids": snapshot.proto_person_ids
+        }
+        for name, array in arrays.items():
+            np.save(path / f"{name}.npy", np.ascontiguousarray(array))
+        (path / "names.json").write_text(json.dumps({str(pid): name for pid, name in snapshot.names.items()}))
+
+        manifest = {
+            "generation": generation,
+            "version": snapshot.version,
+            "path": path.name,
+            "rows": int(len(arrays["person_ids"])),
+            "published_at": time.time()
+        }
+        tmp = self.directory / f".{MANIFEST}.{generation}"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self.directory / MANIFEST)
+        self.generation = generation
+
+        for old in self.directory.glob("gen-*"):
+            if int(old.name[4:]) <= generation - self.keep:
+                shutil.rmtree(old, ignore_errors=True)
+        return generation
+
+    def close(self) -> None:
+        """Remove every generation and the manifest"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class SharedGalleryReader:
+    """Maps the generations published by a SharedGalleryWriter read-only"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.generation = 0
+        self._manifest_id = None
+
+    def changed(self) -> bool:
+        """Cheap check (one stat) for a manifest newer than the mapped generation"""
+        try:
+            stat = os.stat(self.directory / MANIFEST)
+        except FileNotFoundError:
+            return False
+        # os.replace gives every manifest a new inode
+        return (stat.st_ino, stat.st_mtime_ns) != self._manifest_id
+
+    def load(self, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Map the latest generation if it is newer than the current one.
+
+        Args:
+            timeout: Seconds to wait for a first manifest to appear
+
+        Returns:
+            The generation's arrays, names and version, or None if unchanged
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self._load()
+            except FileNotFoundError:
+                # No manifest yet, or the generation it named was just replaced twice
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(0.05)
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        manifest_path = self.directory / MANIFEST
+        stat = os.stat(manifest_path)
+        manifest = json.loads(manifest_path.read_text())
+        if manifest["generation"] == self.generation:
+            self._manifest_id = (stat.st_ino, stat.st_mtime_ns)
+            return None
+
+        path = self.directory / manifest["path"]
+        # Plain ndarray views of the read-only mappings
+        generation = {name: np.asarray(np.load(path / f"{name}.npy", mmap_mode="r")) for name in ARRAYS}
+        # Prototypes are few per person and searched with fancy indexing; keep them private
+        generation["prototypes"] = np.array(generation["prototypes"])
+        generation["proto_person_ids"] = np.array(generation["proto_person_ids"])
+        generation["names"] = {int(pid): name for pid, name in json.loads((path / "names.json").read_text()).items()}
+        generation["version"] = manifest["version"]
+        generation["generation"] = manifest["generation"]
+
+        self.generation = manifest["generation"]
+        self._manifest_id = (stat.st_ino, stat.st_mtime_ns)
+        return generation
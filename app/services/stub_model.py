@@ -0,0 +1,71 @@
+import time
+import zlib
+import cv2
+import numpy as np
+from typing import List, Dict, Any, Union
+
+# Embedding sizes of the DeepFace models, so stub galleries have realistic shapes
+MODEL_DIMS = {
+    "VGG-Face": 4096,
+    "Facenet": 128,
+    "Facenet512": 512,
+    "OpenFace": 128,
+    "DeepFace": 4096,
+    "DeepID": 160,
+    "ArcFace": 512,
+    "Dlib": 128,
+    "SFace": 128,
+    "GhostFaceNet": 512,
+}
+
+class StubFaceModel:
+    """Deterministic stand-in for the DeepFace detector and recognition model.
+
+    Used with FACE_MODEL_BACKEND="stub" to benchmark and load-test the API
+    without TensorFlow. Every non-blank image holds one "face" in its central
+    region, and its embedding is a fixed random projection of a small
+    grayscale thumbnail, so the same image always gets the same embedding
+    and similar images get similar ones. `latency_ms` is slept once per
+    batch to stand in for the forward pass.
+    """
+
+    def __init__(self, model_name: str, latency_ms: float = 0.0, thumbnail_size: int = 32):
+        self.model_name = model_name
+        self.dim = MODEL_DIMS.get(model_name, 128)
+        self.latency_ms = latency_ms
+        self.thumbnail_size = thumbnail_size
+        rng = np.random.default_rng(zlib.crc32(model_name.encode()))
+        self.projection = rng.normal(size=(thumbnail_size * thumbnail_size, self.dim)).astype(np.float32)
+
+    def extract_faces(self, img: Union[str, np.ndarray], enforce_detection: bool = False) -> List[Dict[str, Any]]:
+        """One centered face per non-blank image, shaped like DeepFace.extract_faces output"""
+        frame = cv2.imread(img) if isinstance(img, str) else img
+        if frame is None or not frame.size or float(frame.std()) < 1.0:
+            if enforce_detection:
+                raise ValueError("Face could not be detected in the image")
+            return []
+
+        height, width = frame.shape[:2]
+        x, y, w, h = width // 5, height // 5, max(1, 3 * width // 5), max(1, 3 * height // 5)
+        crop = frame[y:y + h, x:x + w]
+        if crop.ndim == 2:
+            crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+        return [{
+            "face": crop[:, :, ::-1].astype(np.float32) / 255.0,
+            "facial_area": {"x": x, "y": y, "w": w, "h": h},
+            "confidence": 0.99
+        }]
+
+    def embed(self, faces: List[np.ndarray]) -> np.ndarray:
+        """Embed RGB face crops as one (len(faces), dim) float32 array"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        size = self.thumbnail_size
+        thumbnails = np.empty((len(faces), size * size), dtype=np.float32)
+        for i, face in enumerate(faces):
+            face = np.asarray(face, dtype=np.float32)
+            gray = face.mean(axis=2) if face.ndim == 3 else face
+            thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).ravel()
+            thumbnails[i] = (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+        return thumbnails @ self.projection
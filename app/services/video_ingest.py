@@ -0,0 +1,276 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from app.config import settings
+from app.services.face_tracker import FaceTracker
+
+class DropOldestQueue:
+    """Bounded queue that discards its oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize: int):
+        self._items = deque(maxlen=max(1, maxsize))
+        self._not_empty = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item: Any) -> None:
+        with self._not_empty:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._not_empty.notify()
+
+    def get(self, timeout: float = None) -> Optional[Any]:
+        """Oldest queued item, or None if nothing arrived within timeout"""
+        with self._not_empty:
+            if not self._items and not self._not_empty.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+class RateMeter:
+    """Exponentially smoothed events per second"""
+
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self.rate = 0.0
+        self._last = None
+
+    def tick(self, now: float) -> None:
+        if self._last is not None and now > self._last:
+            instant = 1.0 / (now - self._last)
+            self.rate += self.smoothing * (instant - self.rate)
+        self._last = now
+
+class VideoSource:
+    """Reads one RTSP URL or video file on its own capture thread.
+
+    Frames are decimated at capture time: only every `frame_skip`-th frame
+    and at most `max_fps` frames per second are decoded and queued; the rest
+    are only grabbed, which keeps RTSP buffers drained at little cost. Queued
+    frames go into a drop-oldest queue so a slow consumer loses stale frames
+    rather than falling further behind the live stream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        frame_skip: int = None,
+        max_fps: float = None,
+        queue_size: int = None,
+        loop: bool = False,
+        reconnect_seconds: float = None
+    ):
+        self.name = name
+        self.url = url
+        self.frame_skip = max(1, frame_skip or settings.STREAM_FRAME_SKIP)
+        self.max_fps = max_fps if max_fps is not None else settings.STREAM_MAX_FPS
+        self.loop = loop
+        self.reconnect_seconds = (
+            reconnect_seconds if reconnect_seconds is not None else settings.STREAM_RECONNECT_SECONDS
+        )
+        self.queue = DropOldestQueue(queue_size or settings.STREAM_QUEUE_SIZE)
+        self.finished = threading.Event()
+        self.captured = 0
+        self.skipped = 0
+        self.reconnects = 0
+        self.capture_rate = RateMeter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_file(self) -> bool:
+        return "://" not in self.url
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        capture = cv2.VideoCapture(self.url)
+        if not capture.isOpened():
+            capture.release()
+            return None
+        # Keep as little as possible buffered inside the RTSP client
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                capture = self._open()
+                if capture is None:
+                    print(f"Error opening video source {self.name}: {self.url}")
+                    if self.is_file:
+                        return
+                else:
+                    try:
+                        self._read_frames(capture)
+                    finally:
+                        capture.release()
+                    if self.is_file and not self.loop:
+                        return
+
+                # Live sources drop out; retry after a pause
+                if self._stop.wait(self.reconnect_seconds):
+                    return
+                self.reconnects += 1
+        finally:
+            self.finished.set()
+
+    def _read_frames(self, capture: cv2.VideoCapture) -> None:
+        """Grab frames until the source ends, queueing the ones that pass decimation"""
+        frame_index = 0
+        next_due = 0.0
+        file_fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        started = time.monotonic()
+        while not self._stop.is_set():
+            if not capture.grab():
+                return
+            frame_index += 1
+            now = time.monotonic()
+            self.capture_rate.tick(now)
+
+            # Play files back at their own frame rate instead of as fast as they decode
+            if self.is_file and self._stop.wait(max(0.0, started + frame_index / file_fps - now)):
+                return
+
+            if frame_index % self.frame_skip or (self.max_fps and now < next_due):
+                self.skipped += 1
+                continue
+            if self.max_fps:
+                next_due = max(next_due + 1.0 / self.max_fps, now - 1.0 / self.max_fps)
+
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            self.captured += 1
+            self.queue.put((frame_index, time.time(), frame))
+
+class IngestionWorker:
+    """Runs many video sources through the shared FaceService pipeline.
+
+    Every source gets a capture thread and a recognition thread with its own
+    face tracker. Embedding requests from all sources meet in the shared
+    inference scheduler, so concurrent streams are embedded in common batches.
+    """
+
+    def __init__(
+        self,
+        face_service_factory: Callable[[], Any],
+        on_event: Callable[[str, Dict[str, Any]], None] = None
+    ):
+        self.face_service_factory = face_service_factory
+        self.on_event = on_event or (lambda source, event: None)
+        self.sources: Dict[str, VideoSource] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def add_source(self, source: VideoSource) -> None:
+        if source.name in self.sources:
+            raise ValueError(f"Duplicate video source name: {source.name}")
+        self.sources[source.name] = source
+        self._stats[source.name] = {
+            "processed": 0,
+            "events": 0,
+            "errors": 0,
+            "lag_ms": 0.0,
+            "process_rate": RateMeter()
+        }
+
+    def start(self) -> None:
+        for source in self.sources.values():
+            source.start()
+            thread = threading.Thread(target=self._consume, args=(source,), name=f"recognize-{source.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for source in self.sources.values():
+            source.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def wait(self) -> None:
+        """Block until every source has ended (files) or stop() is called"""
+        for thread in self._threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stream FPS, lag and frame counters"""
+        report = {}
+        for name, source in self.sources.items():
+            stats = self._stats[name]
+            report[name] = {
+                "url": source.url,
+                "capture_fps": round(source.capture_rate.rate, 2),
+                "process_fps": round(stats["process_rate"].rate, 2),
+                "lag_ms": round(stats["lag_ms"], 1),
+                "captured": source.captured,
+                "skipped": source.skipped,
+                "dropped": source.queue.dropped,
+                "queued": len(source.queue),
+                "processed": stats["processed"],
+                "events": stats["events"],
+                "errors": stats["errors"],
+                "reconnects": source.reconnects,
+                "running": not source.finished.is_set()
+            }
+        return report
+
+    def _consume(self, source: VideoSource) -> None:
+        """Recognize queued frames of one source until it ends"""
+        face_service = self.face_service_factory()
+        tracker = FaceTracker()
+        stats = self._stats[source.name]
+
+        while not self._stop.is_set():
+            item = source.queue.get(timeout=0.5)
+            if item is None:
+                if source.finished.is_set() and not len(source.queue):
+                    return
+                continue
+
+            frame_index, captured_at, frame = item
+            try:
+                result = face_service.recognize_tracked_frame(frame, tracker)
+            except Exception as e:
+                print(f"Error in stream {source.name}: {str(e)}")
+                stats["errors"] += 1
+                continue
+
+            stats["processed"] += 1
+            stats["lag_ms"] = 1000 * (time.time() - captured_at)
+            stats["process_rate"].tick(time.monotonic())
+
+            # Only report identities that were (re)computed on this frame
+            fresh = [track for track in result.get("tracks", []) if track.get("embedded")]
+            if fresh:
+                stats["events"] += 1
+                self.on_event(source.name, {
+                    "source": source.name,
+                    "frame": frame_index,
+                    "timestamp": captured_at,
+                    "tracks": fresh
+                })
+
+def parse_source(spec: str, index: int) -> Tuple[str, str]:
+    """Split a `name=url` source argument; unnamed sources are numbered"""
+    name, sep, url = spec.partition("=")
+    if sep and "://" not in name and name:
+        return name, url
+    return f"stream{index}", spec
@@ -0,0 +1,143 @@
+"""Search worker serving one shard of the gallery.
+
+The gallery is partitioned by person id: shard i of n holds the people with
+person_id % n == i, read from the same database as the API. The API fans
+every probe out to all shards and merges their top-k
+(app.services.sharded_gallery). The worker checks the database gallery
+version every --poll-seconds and rebuilds its slice when someone was
+enrolled or deleted.
+
+Endpoints:
+    POST /search?k=1&unique=0   little-endian float32 probes, X-Embedding-Dim header
+    GET  /healthz               shard, gallery version, rows and people as JSON
+
+Usage:
+    python -m app.shard_worker --shard 0 --shards 4 --port 9100
+    GALLERY_SHARDS=http://127.0.0.1:9100,http://127.0.0.1:9101,... uvicorn app.main:app
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+from app.config import settings
+
+def serve_shard(index, shard: int, host: str, port: int, delay_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Serve searches of a shard's GalleryIndex on a background thread"""
+
+    class ShardHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so the API reuses one connection per thread, and no
+        # Nagle delay between the header and body writes of a response
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path != "/healthz":
+                self.send_json(404, {"detail": "Not found"})
+                return
+            self.send_json(200, self.status())
+
+        def do_POST(self):
+            url = urllib.parse.urlparse(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if url.path != "/search":
+                self.send_json(404, {"detail": "Not found"})
+                return
+            try:
+                params = urllib.parse.parse_qs(url.query)
+                k = int(params.get("k", ["1"])[0])
+                unique = params.get("unique", ["0"])[0] == "1"
+                probes = np.frombuffer(body, dtype="<f4").reshape(-1, int(self.headers["X-Embedding-Dim"]))
+            except Exception as e:
+                self.send_json(400, {"detail": f"Invalid search request: {str(e)}"})
+                return
+            if delay_ms:
+                time.sleep(delay_ms / 1000)
+            results = index.search(probes, k=k, unique_persons=unique)
+            self.send_json(200, {**self.status(), "results": results})
+
+        def status(self) -> dict:
+            return {
+                "shard": shard,
+                "version": index.version,
+                "rows": len(index),
+                "people": index.people,
+                "loaded": index.loaded
+            }
+
+        def send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            try:
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The API stopped waiting for this shard at its deadline
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ShardHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="shard-server", daemon=True).start()
+    return server
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve searches over one shard of the gallery")
+    parser.add_argument("--shard", type=int, required=True, help="Index of this shard, from 0")
+    parser.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--poll-seconds", type=float, default=settings.SHARD_POLL_SECONDS)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Extra latency per search, to exercise deadlines")
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard < args.shards:
+        parser.error("--shard must be between 0 and --shards - 1")
+
+    from app.database.models import SessionLocal
+    from app.services.db_service import DatabaseService
+    from app.services.gallery_index import GalleryIndex
+
+    # The shard reads the database directly, never another shard or a shared gallery
+    index = GalleryIndex(shared_dir="", shard=(args.shard, args.shards))
+
+    def refresh() -> None:
+        db = SessionLocal()
+        try:
+            index.refresh(DatabaseService(db))
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    refresh()
+    print(
+        f"Shard {args.shard}/{args.shards}: {len(index)} rows of {index.people} people "
+        f"loaded in {time.perf_counter() - started:.2f}s"
+    )
+
+    server = serve_shard(index, args.shard, args.host, args.port, args.delay_ms)
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        while not stopping.wait(args.poll_seconds):
+            try:
+                refresh()
+            except Exception as e:
+                print(f"Error refreshing shard {args.shard}: {str(e)}")
+    finally:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Headless recognition of many live video sources.
+
+Each source is an RTSP/HTTP URL or a local video file, optionally named with
+`name=url`. Frames are decimated and queued per source, recognized through
+the shared FaceService pipeline with per-source face tracking, and every
+newly computed identity is written as one JSON line. Per-stream FPS, lag and
+drop counters are printed periodically and served as JSON when
+--metrics-port is given.
+
+Usage:
+    python -m app.stream_worker lobby=rtsp://10.0.0.5/stream1 door=rtsp://10.0.0.6/stream1
+    python -m app.stream_worker sample.mp4 --loop --frame-skip 3 --events events.jsonl
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from app.config import settings
+
+def serve_metrics(worker, port: int) -> ThreadingHTTPServer:
+    """Serve worker.metrics() as JSON on a background thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(worker.metrics()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recognize faces in many RTSP streams or video files")
+    parser.add_argument("sources", nargs="+", help="Video sources as URL, file path or name=URL")
+    parser.add_argument("--frame-skip", type=int, default=settings.STREAM_FRAME_SKIP, help="Process every Nth frame")
+    parser.add_argument("--max-fps", type=float, default=settings.STREAM_MAX_FPS, help="Per-source frame cap (0 for none)")
+    parser.add_argument("--queue-size", type=int, default=settings.STREAM_QUEUE_SIZE, help="Frames buffered per source")
+    parser.add_argument("--loop", action="store_true", help="Restart video files when they end")
+    parser.add_argument("--events", help="Append recognition events to this JSON lines file (default: stdout)")
+    parser.add_argument("--metrics-port", type=int, help="Serve per-stream metrics as JSON on this port")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between metrics log lines")
+    args = parser.parse_args(argv)
+
+    from app.database.models import init_db, get_db
+    from app.services.db_service import DatabaseService
+    from app.services.face_service import FaceService
+    from app.services.gallery_index import gallery_index
+    from app.services.model_manager import model_manager
+    from app.services.inference_scheduler import inference_scheduler
+    from app.services.video_ingest import IngestionWorker, VideoSource, parse_source
+
+    init_db()
+    for db in get_db():
+        gallery_index.build(DatabaseService(db))
+    model_manager.load(warm_up=settings.WARM_UP_MODELS)
+    inference_scheduler.start()
+
+    sessions = []
+
+    def open_face_service() -> FaceService:
+        # Sessions are not thread-safe, so every recognition thread gets its own
+        session = get_db()
+        sessions.append(session)
+        return FaceService(DatabaseService(next(session)))
+
+    events = open(args.events, "a") if args.events else sys.stdout
+    events_lock = threading.Lock()
+
+    def write_event(source: str, event: dict) -> None:
+        with events_lock:
+            events.write(json.dumps(event) + "\n")
+            events.flush()
+
+    worker = IngestionWorker(open_face_service, on_event=write_event)
+    for index, spec in enumerate(args.sources):
+        name, url = parse_source(spec, index)
+        worker.add_source(VideoSource(
+            name,
+            url,
+            frame_skip=args.frame_skip,
+            max_fps=args.max_fps,
+            queue_size=args.queue_size,
+            loop=args.loop
+        ))
+
+    server = serve_metrics(worker, args.metrics_port) if args.metrics_port else None
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    worker.start()
+    try:
+        while not stopping.wait(args.report_every):
+            metrics = worker.metrics()
+            for name, stream in metrics.items():
+                print(
+                    f"{name}: {stream['process_fps']:.1f}/{stream['capture_fps']:.1f} fps, "
+                    f"lag {stream['lag_ms']:.0f}ms, {stream['dropped']} dropped, {stream['events']} events",
+                    file=sys.stderr
+                )
+            if not any(stream["running"] or stream["queued"] for stream in metrics.values()):
+                break
+        if not stopping.is_set():
+            # Let the recognition threads finish what is already queued
+            worker.wait()
+    finally:
+        worker.stop()
+        inference_scheduler.stop()
+        if server is not None:
+            server.shutdown()
+        if events is not sys.stdout:
+            events.close()
+        for session in sessions:
+            session.close()
+
+    print(json.dumps(worker.metrics(), indent=2), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Recall vs. latency of the IVF-PQ gallery backend against the exact scan.
+
+Builds a synthetic clustered gallery (several noisy embeddings per person),
+searches it with the exact scan and with the ANN backend at several nprobe
+settings, and reports person-level recall@1 and per-probe latency.
+
+Usage:
+    python -m benchmarks.ann_recall --gallery 200000 --people 40000
+    python -m benchmarks.ann_recall --output ann_recall.json
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.gallery_index import GalleryIndex
+
+class SyntheticGallery:
+    """Stands in for DatabaseService when building a GalleryIndex"""
+
+    def __init__(self, size: int, people: int, dim: int, noise: float, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.centers = rng.normal(size=(people, dim)).astype(np.float32)
+        self.person_ids = rng.integers(0, people, size).astype(np.int64)
+        self.embeddings = self.centers[self.person_ids] + noise * rng.normal(size=(size, dim)).astype(np.float32)
+        self.names = {person_id: f"person_{person_id}" for person_id in range(people)}
+        self.noise = noise
+        self.rng = rng
+
+    def get_gallery_version(self) -> int:
+        return 0
+
+    def get_gallery_embeddings(self, model_name=None, shard=None):
+        if shard is None:
+            return self.person_ids, self.names, self.embeddings
+        # Same partition as DatabaseService: person_id % shards == index
+        rows = self.person_ids % shard[1] == shard[0]
+        person_ids = self.person_ids[rows]
+        return person_ids, {int(pid): self.names[int(pid)] for pid in np.unique(person_ids)}, self.embeddings[rows]
+
+    def get_gallery_prototypes(self, model_name=None, shard=None):
+        # Let the index compute prototypes in memory
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+    def save_prototypes(self, prototypes) -> None:
+        pass
+
+    def probes(self, count: int) -> np.ndarray:
+        """Fresh noisy views of enrolled people"""
+        people = self.rng.integers(0, len(self.centers), count)
+        noise = self.noise * self.rng.normal(size=(count, self.centers.shape[1]))
+        return (self.centers[people] + noise).astype(np.float32)
+
+def time_search(index: GalleryIndex, probes: np.ndarray):
+    """Search probes one at a time like /recognize does; returns (results, ms per probe)"""
+    results = []
+    started = time.perf_counter()
+    for probe in probes:
+        results.append(index.search(probe, k=1)[0])
+    elapsed = time.perf_counter() - started
+    return results, 1000 * elapsed / len(probes)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gallery", type=int, default=100000, help="Number of gallery embeddings")
+    parser.add_argument("--people", type=int, default=20000, help="Number of distinct people")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--noise", type=float, default=0.5, help="Per-embedding noise around each person")
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--rerank", type=int, default=100)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    source = SyntheticGallery(args.gallery, args.people, args.dim, args.noise)
+    probes = source.probes(args.probes)
+
+    exact = GalleryIndex(backend="exact")
+    exact.build(source)
+    truth, exact_ms = time_search(exact, probes)
+
+    ann = GalleryIndex(backend="ivfpq")
+    with tempfile.TemporaryDirectory() as tmp:
+        ann.ann_path = str(Path(tmp) / "bench.ann.npz")
+        started = time.perf_counter()
+        ann.build(source)
+        build_seconds = time.perf_counter() - started
+
+    if ann.snapshot().ann_state is None:
+        raise SystemExit("Gallery is smaller than ANN_MIN_GALLERY_SIZE; raise --gallery or lower the setting")
+
+    report = {
+        "gallery": args.gallery,
+        "people": args.people,
+        "dim": args.dim,
+        "probes": args.probes,
+        "rerank": args.rerank,
+        "nlist": len(ann.ann.coarse),
+        "build_seconds": build_seconds,
+        "exact_ms_per_probe": exact_ms,
+        "runs": []
+    }
+
+    print(f"gallery={args.gallery} people={args.people} nlist={report['nlist']} build={build_seconds:.1f}s")
+    print(f"{'backend':>10} {'nprobe':>7} {'recall@1':>9} {'ms/probe':>9} {'speedup':>8}")
+    print(f"{'exact':>10} {'-':>7} {1.0:>9.3f} {exact_ms:>9.3f} {1.0:>8.1f}")
+
+    ann.ann.rerank = args.rerank
+    for nprobe in args.nprobe:
+        ann.ann.nprobe = nprobe
+        found, ann_ms = time_search(ann, probes)
+        recall = np.mean([
+            bool(expected) and bool(got) and expected[0]["person_id"] == got[0]["person_id"]
+            for expected, got in zip(truth, found)
+        ])
+        report["runs"].append({"nprobe": nprobe, "recall_at_1": float(recall), "ms_per_probe": ann_ms})
+        print(f"{'ivfpq':>10} {nprobe:>7} {recall:>9.3f} {ann_ms:>9.3f} {exact_ms / ann_ms:>8.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
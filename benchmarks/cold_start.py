@@ -0,0 +1,172 @@
+"""Import-time and cold-start budgets for the API process.
+
+Checks, each in fresh interpreters so nothing is already imported:
+    imports     `python -X importtime -c "import app.main"` stays under
+                --import-budget-ms (best of --repeats runs), and pulls in
+                none of FORBIDDEN_MODULES (ML frameworks, Alembic)
+    side effects importing app.main creates neither the database file nor
+                the upload folder
+    serve       a uvicorn server answers /healthz and a CRUD endpoint
+                (GET /api/v1/people) within --serve-budget-ms of being
+                launched, however long the model takes to load; the time
+                until /readyz turns 200 is reported but not budgeted
+
+Exits with status 1 if any budget is exceeded, so CI can run it after the
+test suite. The server check runs with the stub model by default; pass
+--deepface to time the real backend (the CRUD budget should hold there too,
+since DeepFace loads in the background).
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --import-budget-ms 800 --output cold_start.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+from benchmarks.common import write_report
+from benchmarks.load_test import Client, start_server
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Never imported with app.main: ML frameworks belong to the inference layer,
+# which imports them on first use, and migrations run in the lifespan hook
+FORBIDDEN_MODULES = ("tensorflow", "keras", "tf_keras", "deepface", "torch", "alembic")
+
+def import_times(module: str, env: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    """(self, cumulative) microseconds per module imported by `import module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def check_imports(module: str, repeats: int, budget_ms: float, env: Dict[str, str]) -> Dict[str, Any]:
+    runs = [import_times(module, env) for _ in range(repeats)]
+    best = min(runs, key=lambda times: times[module][1])
+    slowest = sorted(
+        ((name, cumulative) for name, (_, cumulative) in best.items() if name.count(".") == 0 and name != module),
+        key=lambda item: -item[1]
+    )[:8]
+    forbidden = sorted(
+        name for name in best if name.split(".")[0] in FORBIDDEN_MODULES
+    )
+    import_ms = best[module][1] / 1000
+    return {
+        "module": module,
+        "import_ms": import_ms,
+        "budget_ms": budget_ms,
+        "slowest_packages_ms": {name: cumulative / 1000 for name, cumulative in slowest},
+        "forbidden_modules": forbidden,
+        "ok": import_ms <= budget_ms and not forbidden
+    }
+
+def check_side_effects(env: Dict[str, str], database: Path, upload_folder: Path) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.main"], cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    created = [str(path) for path in (database, upload_folder) if path.exists()]
+    return {"created_at_import": created, "ok": result.returncode == 0 and not created}
+
+def wait_for(client: Client, path: str, server: subprocess.Popen, started: float, timeout: float) -> float:
+    """Milliseconds from launching the server until `path` returns 200"""
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if client.get(path)[0] == 200:
+                return (time.perf_counter() - started) * 1000
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{path} not answered after {timeout:.0f}s")
+
+def check_serve(port: int, database_url: str, stub: bool, budget_ms: float, ready_timeout: float) -> Dict[str, Any]:
+    client = Client(f"http://127.0.0.1:{port}", 2.0)
+    started = time.perf_counter()
+    server = start_server(port, database_url, stub, 0.0, 1, embedding_cache=True)
+    try:
+        healthz_ms = wait_for(client, "/healthz", server, started, ready_timeout)
+        crud_ms = wait_for(client, "/api/v1/people?limit=1", server, started, ready_timeout)
+        readyz_ms = wait_for(client, "/readyz", server, started, ready_timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "healthz_ms": healthz_ms,
+        "crud_ms": crud_ms,
+        "readyz_ms": readyz_ms,
+        "budget_ms": budget_ms,
+        "ok": max(healthz_ms, crud_ms) <= budget_ms
+    }
+
+def print_checks(report: Dict[str, Any]) -> List[str]:
+    """Print every check and return the names of those that failed"""
+    imports = report["imports"]
+    print(f"import {imports['module']:<28} {imports['import_ms']:>8.1f} ms  (budget {imports['budget_ms']:.0f} ms)")
+    for name, ms in imports["slowest_packages_ms"].items():
+        print(f"    {name:<32} {ms:>8.1f} ms")
+    if imports["forbidden_modules"]:
+        print(f"forbidden modules imported: {', '.join(imports['forbidden_modules'])}")
+    if report["side_effects"]["created_at_import"]:
+        print(f"created at import: {', '.join(report['side_effects']['created_at_import'])}")
+    serve = report.get("serve")
+    if serve:
+        print(f"{'/healthz after launch':<35} {serve['healthz_ms']:>8.1f} ms  (budget {serve['budget_ms']:.0f} ms)")
+        print(f"{'GET /api/v1/people after launch':<35} {serve['crud_ms']:>8.1f} ms  (budget {serve['budget_ms']:.0f} ms)")
+        print(f"{'/readyz after launch':<35} {serve['readyz_ms']:>8.1f} ms")
+    failed = [name for name in ("imports", "side_effects", "serve") if name in report and not report[name]["ok"]]
+    print("FAILED: " + ", ".join(failed) if failed else "All cold-start budgets met")
+    return failed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main", help="Module whose import is budgeted")
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--serve-budget-ms", type=float, default=3000.0,
+                        help="Budget from launching uvicorn to /healthz and a CRUD endpoint answering")
+    parser.add_argument("--repeats", type=int, default=3, help="Import runs; the fastest is budgeted")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--deepface", action="store_true", help="Serve with DeepFace instead of the stub model")
+    parser.add_argument("--no-serve", action="store_true", help="Only check imports")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "cold_start.db"
+        upload_folder = Path(tmp) / "captured_faces"
+        database_url = f"sqlite:///{database}"
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["UPLOAD_FOLDER"] = str(upload_folder)
+        env = dict(os.environ)
+
+        report = {
+            "benchmark": "cold_start",
+            "imports": check_imports(args.module, args.repeats, args.import_budget_ms, env),
+            "side_effects": check_side_effects(env, database, upload_folder)
+        }
+        if not args.no_serve:
+            report["serve"] = check_serve(
+                args.port, database_url, not args.deepface, args.serve_budget_ms, args.ready_timeout
+            )
+        failed = print_checks(report)
+        if args.output:
+            write_report(args.output, report)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Helpers shared by the benchmark scripts: percentiles and report metadata."""
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+
+# App modules are imported inside the functions so scripts can set DATABASE_URL
+# and FACE_MODEL_BACKEND in the environment before settings are first read
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of latencies, in milliseconds"""
+    if not seconds:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max())
+    }
+
+def time_call(fn, repeats: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """Latency summary of calling fn() repeatedly"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return latency_summary(timings)
+
+def git_commit() -> str:
+    from app.config import BASE_DIR
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def report_metadata() -> Dict[str, Any]:
+    """Where and with what configuration a report was produced"""
+    from app.config import settings
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "FACE_MODEL_BACKEND": settings.FACE_MODEL_BACKEND,
+            "FACE_RECOGNITION_MODEL": settings.FACE_RECOGNITION_MODEL,
+            "DISTANCE_METRIC": settings.DISTANCE_METRIC,
+            "SEARCH_BACKEND": settings.SEARCH_BACKEND,
+            "TWO_STAGE_MATCHING": settings.TWO_STAGE_MATCHING,
+            "GALLERY_DTYPE": settings.GALLERY_DTYPE,
+            "EMBEDDING_CACHE_SIZE": settings.EMBEDDING_CACHE_SIZE
+        }
+    }
+
+def write_report(path: Path, report: Dict[str, Any]) -> None:
+    """Write a report as JSON with metadata for comparing across commits"""
+    path.write_text(json.dumps({"metadata": report_metadata(), **report}, indent=2, default=float))
+    print(f"Wrote {path}")
@@ -0,0 +1,72 @@
+"""Compare two benchmark reports written with --output, e.g. from two commits.
+
+Every numeric leaf present in both reports is printed with its relative
+change; latencies (keys ending in _ms or seconds) that grew, and throughputs
+(keys containing per_second) that shrank, by more than --threshold percent
+are flagged as regressions and make the script exit with status 1.
+
+Usage:
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Any, Iterator, Tuple
+
+def leaves(report: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """(dotted path, value) of every number in a report; list items are keyed by name fields"""
+    if isinstance(report, dict):
+        for key, value in report.items():
+            if key != "metadata":
+                yield from leaves(value, f"{prefix}{key}.")
+    elif isinstance(report, list):
+        for index, item in enumerate(report):
+            label = index
+            if isinstance(item, dict):
+                label = "/".join(str(item[key]) for key in ("scenario", "mode", "metric", "dtype", "nprobe") if key in item) or index
+            yield from leaves(item, f"{prefix}{label}.")
+    elif isinstance(report, (int, float)) and not isinstance(report, bool):
+        yield prefix.rstrip("."), float(report)
+
+def direction(path: str) -> int:
+    """+1 if larger is better, -1 if smaller is better, 0 if neither"""
+    name = path.rsplit(".", 1)[-1]
+    if "per_second" in name or name in ("speedup", "recall_at_1"):
+        return 1
+    if name.endswith("_ms") or name in ("seconds", "ms_per_probe"):
+        return -1
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before", help="Baseline report")
+    parser.add_argument("after", help="Report to check")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--all", action="store_true", help="Also print values that did not move")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{before.get('metadata', {}).get('commit', '?')} -> {after.get('metadata', {}).get('commit', '?')}")
+
+    baseline: Dict[str, float] = dict(leaves(before))
+    regressions = 0
+    for path, value in leaves(after):
+        if path not in baseline:
+            continue
+        old = baseline[path]
+        change = 100.0 * (value - old) / abs(old) if old else 0.0
+        better = direction(path)
+        regressed = better and -better * change > args.threshold
+        regressions += bool(regressed)
+        if regressed or args.all or (better and abs(change) > args.threshold):
+            flag = "REGRESSION" if regressed else ""
+            print(f"{path:<70} {old:>12.3f} {value:>12.3f} {change:>+8.1f}% {flag}")
+
+    print(f"{regressions} regression(s) beyond {args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Registration write throughput against SQLite journal and commit strategies.
+
+Registers synthetic people (several encodings each) into a scratch database
+with:
+    legacy  SQLite defaults (rollback journal, synchronous=FULL), one commit per encoding
+    wal     WAL with synchronous=NORMAL, one commit per encoding
+    bulk    WAL with synchronous=NORMAL, one transaction per person
+and reports encodings written per second, optionally from several threads.
+
+Usage:
+    python -m benchmarks.db_writes --people 200 --encodings 10 --threads 4
+    python -m benchmarks.db_writes --output db_writes.json
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database.models import Base, GalleryState, create_db_engine
+from app.services.db_service import DatabaseService
+
+def register(db_service: DatabaseService, name: str, embeddings: np.ndarray, bulk: bool) -> None:
+    """Write one person the way FaceService did before and after bulk writes"""
+    encodings = [(f"{name}_{i}.jpg", embedding) for i, embedding in enumerate(embeddings)]
+    if bulk:
+        person = db_service.add_person(name, commit=False)
+        db_service.add_face_encodings(person.id, encodings, commit=False)
+        db_service.bump_gallery_version()
+        return
+
+    person = db_service.add_person(name)
+    for image_path, embedding in encodings:
+        db_service.add_face_encoding(person.id, embedding, image_path)
+    db_service.bump_gallery_version()
+
+def run(mode: str, people: int, encodings: int, dim: int, threads: int, directory: Path) -> dict:
+    """Register `people` people split across `threads` writers; returns throughput"""
+    path = directory / f"{mode}.db"
+    if mode == "legacy":
+        # The engine as it was configured before: SQLite defaults throughout
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    else:
+        engine = create_db_engine(f"sqlite:///{path}")
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(GalleryState.__table__.insert().values(id=1, version=0))
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(people, encodings, dim)).astype(np.float32).tolist()
+    errors = []
+
+    def writer(worker: int) -> None:
+        db = Session()
+        db_service = DatabaseService(db)
+        try:
+            for index in range(worker, people, threads):
+                register(db_service, f"{mode}_{index}", vectors[index], bulk=mode == "bulk")
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - started
+    engine.dispose()
+
+    return {
+        "mode": mode,
+        "seconds": seconds,
+        "people_per_second": people / seconds,
+        "encodings_per_second": people * encodings / seconds,
+        "errors": len(errors)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=200)
+    parser.add_argument("--encodings", type=int, default=10, help="Encodings per person")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent writer threads")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "wal", "bulk"])
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    report = {
+        "people": args.people,
+        "encodings": args.encodings,
+        "threads": args.threads,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "runs": []
+    }
+    print(f"{'mode':>8} {'seconds':>8} {'people/s':>9} {'encodings/s':>12} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            result = run(mode, args.people, args.encodings, args.dim, max(1, args.threads), Path(tmp))
+            report["runs"].append(result)
+            print(
+                f"{mode:>8} {result['seconds']:>8.2f} {result['people_per_second']:>9.1f} "
+                f"{result['encodings_per_second']:>12.1f} {result['errors']:>7}"
+            )
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Concurrent load test of /api/v1/recognize and /api/v1/register.
+
+Starts a local uvicorn server on a scratch database holding a synthetic
+gallery (or targets --url), then drives it with `--concurrency` client
+threads for `--duration` seconds per scenario:
+    recognize   POST one image to /api/v1/recognize
+    register    POST --images-per-person images under a fresh name to /api/v1/register
+    mixed       --register-share of the requests register, the rest recognize
+and reports requests/s, p50/p95/p99 latency and status codes per scenario.
+Mean server-side stage timings are scraped from /metrics around every
+scenario. Unless --no-stages is given, the in-process per-stage timings of
+benchmarks.micro are also measured on the same database afterwards.
+
+Probe images are synthetic; the recognize pool is registered before the run
+so probes hit enrolled people. With --stub the server uses the stub model
+(FACE_MODEL_BACKEND=stub) and needs no TensorFlow.
+
+Usage:
+    python -m benchmarks.load_test --stub --people 10000 --concurrency 8 --duration 20
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --scenarios recognize
+    python -m benchmarks.load_test --stub --output load.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from benchmarks.common import latency_summary, write_report
+from benchmarks.micro import encode_jpeg, synthetic_image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+def multipart(fields: List[Tuple[str, str]], files: List[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    """Encode form fields and (field, filename, data) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+class Client:
+    """Keep-alive HTTP client for one load generator thread"""
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urllib.parse.urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def post(self, path: str, body: bytes, content_type: str) -> Tuple[int, bytes]:
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def get(self, path: str) -> Tuple[int, bytes]:
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+def register_request(images: List[bytes]) -> Tuple[str, bytes, str]:
+    body, content_type = multipart(
+        [("name", f"load_{uuid.uuid4().hex[:12]}")],
+        [("images", f"face_{i}.jpg", data) for i, data in enumerate(images)]
+    )
+    return "/api/v1/register", body, content_type
+
+def recognize_request(image: bytes) -> Tuple[str, bytes, str]:
+    body, content_type = multipart([], [("image", "probe.jpg", image)])
+    return "/api/v1/recognize", body, content_type
+
+def run_scenario(
+    url: str,
+    scenario: str,
+    probes: List[bytes],
+    enroll_images: List[bytes],
+    concurrency: int,
+    duration: float,
+    images_per_person: int,
+    register_share: float,
+    timeout: float
+) -> Dict[str, Any]:
+    """Drive one scenario from `concurrency` threads and summarize the responses"""
+    deadline = time.perf_counter() + duration
+    records: List[Tuple[str, int, float, str]] = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        client = Client(url, timeout)
+        rng = np.random.default_rng(index)
+        local = []
+        for request_number in itertools.count():
+            if time.perf_counter() >= deadline:
+                break
+            registering = scenario == "register" or (scenario == "mixed" and rng.random() < register_share)
+            if registering:
+                start = (index * 7919 + request_number * images_per_person) % len(enroll_images)
+                images = [enroll_images[(start + i) % len(enroll_images)] for i in range(images_per_person)]
+                kind, (path, body, content_type) = "register", register_request(images)
+            else:
+                kind, (path, body, content_type) = "recognize", recognize_request(probes[rng.integers(len(probes))])
+
+            started = time.perf_counter()
+            try:
+                status, payload = client.post(path, body, content_type)
+                outcome = json.loads(payload).get("status", "") if status == 200 else ""
+            except Exception as e:
+                status, outcome = 0, type(e).__name__
+            local.append((kind, status, time.perf_counter() - started, outcome))
+        with lock:
+            records.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = {"scenario": scenario, "concurrency": concurrency, "seconds": elapsed, "requests": {}}
+    for kind in sorted({record[0] for record in records}):
+        kind_records = [record for record in records if record[0] == kind]
+        ok = [record[2] for record in kind_records if record[1] == 200]
+        result["requests"][kind] = {
+            "total": len(kind_records),
+            "requests_per_second": len(kind_records) / elapsed,
+            "ok_per_second": len(ok) / elapsed,
+            "status_codes": dict(Counter(str(record[1]) for record in kind_records)),
+            "outcomes": dict(Counter(record[3] for record in kind_records if record[3])),
+            "latency": latency_summary(ok),
+            "latency_all": latency_summary([record[2] for record in kind_records])
+        }
+    return result
+
+def start_server(
+    port: int,
+    database_url: str,
+    stub: bool,
+    stub_latency_ms: float,
+    workers: int,
+    embedding_cache: bool
+) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    if not embedding_cache:
+        # Repeated probe images would otherwise be answered from the cache
+        env["EMBEDDING_CACHE_SIZE"] = "0"
+    if stub:
+        env["FACE_MODEL_BACKEND"] = "stub"
+        env["STUB_MODEL_LATENCY_MS"] = str(stub_latency_ms)
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"
+        ],
+        cwd=BASE_DIR,
+        env=env
+    )
+
+def wait_ready(url: str, server: subprocess.Popen, timeout: float) -> None:
+    client = Client(url, 5.0)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if client.get("/readyz")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Server at {url} not ready after {timeout:.0f}s")
+
+STAGE_LINE = re.compile(r'^faceid_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+def scrape_stages(client: Client) -> Dict[str, Tuple[float, float]]:
+    """(total seconds, count) per stage from the server's /metrics, or {} if unavailable"""
+    try:
+        status, body = client.get("/metrics")
+    except OSError:
+        return {}
+    if status != 200:
+        return {}
+    stages: Dict[str, List[float]] = {}
+    for line in body.decode().splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            stages.setdefault(stage, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {stage: (total, count) for stage, (total, count) in stages.items()}
+
+def stage_means(before: Dict[str, Tuple[float, float]], after: Dict[str, Tuple[float, float]]) -> Dict[str, Any]:
+    """Server-side calls and mean milliseconds per stage between two scrapes"""
+    means = {}
+    for stage, (total, count) in sorted(after.items()):
+        old_total, old_count = before.get(stage, (0.0, 0.0))
+        if count > old_count:
+            means[stage] = {"calls": int(count - old_count), "mean_ms": 1000 * (total - old_total) / (count - old_count)}
+    return means
+
+def print_result(result: Dict[str, Any]) -> None:
+    for kind, stats in result["requests"].items():
+        latency = stats["latency"]
+        print(
+            f"{result['scenario']:>10} {kind:>10} {stats['total']:>7} {stats['ok_per_second']:>8.1f} "
+            f"{latency['p50_ms']:>9.1f} {latency['p95_ms']:>9.1f} {latency['p99_ms']:>9.1f}  {stats['status_codes']}"
+        )
+    stages = ", ".join(f"{stage} {stats['mean_ms']:.1f}" for stage, stats in result.get("server_stages", {}).items())
+    if stages:
+        print(f"{'':>10} server stage means (ms): {stages}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Target a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--stub", action="store_true", help="Run the server with the stub model")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="Simulated forward pass per batch")
+    parser.add_argument("--people", type=int, default=1000, help="Synthetic gallery size in people")
+    parser.add_argument("--encodings", type=int, default=5, help="Encodings per synthetic person")
+    parser.add_argument("--scenarios", nargs="+", default=["recognize", "register", "mixed"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per scenario")
+    parser.add_argument("--images-per-person", type=int, default=3)
+    parser.add_argument("--register-share", type=float, default=0.1, help="Share of registrations in mixed")
+    parser.add_argument("--probe-pool", type=int, default=64, help="Distinct probe images")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--embedding-cache", action="store_true", help="Keep the server's embedding cache on")
+    parser.add_argument("--no-stages", action="store_true", help="Skip the in-process stage timings")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    probes = [encode_jpeg(synthetic_image(rng)) for _ in range(args.probe_pool)]
+    enroll_images = [encode_jpeg(synthetic_image(rng)) for _ in range(max(args.probe_pool, 64))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{Path(tmp) / 'load.db'}"
+        server = None
+        if args.url:
+            url = args.url
+        else:
+            # Populate in-process before the server reads the database
+            os.environ["DATABASE_URL"] = database_url
+            if args.stub:
+                os.environ["FACE_MODEL_BACKEND"] = "stub"
+            from app.database.models import init_db, SessionLocal
+            from app.services.db_service import DatabaseService
+            from benchmarks.synthetic_gallery import populate
+
+            init_db()
+            db = SessionLocal()
+            try:
+                populate(DatabaseService(db), args.people, args.encodings)
+            finally:
+                db.close()
+            url = f"http://127.0.0.1:{args.port}"
+            server = start_server(
+                args.port, database_url, args.stub, args.stub_latency_ms, args.workers, args.embedding_cache
+            )
+
+        report = {
+            "benchmark": "load_test",
+            "url": url,
+            "people": args.people if server else None,
+            "encodings": args.encodings if server else None,
+            "workers": args.workers,
+            "stub_latency_ms": args.stub_latency_ms if args.stub else None,
+            "embedding_cache": args.embedding_cache,
+            "runs": []
+        }
+        try:
+            wait_ready(url, server, args.ready_timeout)
+
+            # Enroll the probe images so recognition requests find their people
+            client = Client(url, args.timeout)
+            for start in range(0, len(probes), args.images_per_person):
+                client.post(*register_request(probes[start:start + args.images_per_person]))
+
+            print(f"{'scenario':>10} {'request':>10} {'total':>7} {'ok/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for scenario in args.scenarios:
+                before = scrape_stages(client)
+                result = run_scenario(
+                    url, scenario, probes, enroll_images, args.concurrency, args.duration,
+                    args.images_per_person, args.register_share, args.timeout
+                )
+                # Where the server spent its time during this scenario
+                result["server_stages"] = stage_means(before, scrape_stages(client))
+                report["runs"].append(result)
+                print_result(result)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+        if server is not None and not args.no_stages:
+            from benchmarks.micro import run as run_micro, print_report
+
+            # Per-stage costs behind the end-to-end latencies, on the same gallery
+            report["stages"] = run_micro(args.people, args.encodings, repeats=20)
+            print_report(report["stages"], "stages.")
+
+        if args.output:
+            write_report(args.output, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""In-process micro-benchmarks of the recognition pipeline, stage by stage.
+
+Times, on a synthetic gallery in a scratch database:
+    decode      decode_image on JPEG uploads of a few sizes
+    db_load     DatabaseService.get_gallery_embeddings and get_all_face_encodings
+    build       GalleryIndex.build from the database
+    match       GalleryIndex.search for one probe and a batch of probes
+    detect      model_manager.extract_faces on a decoded frame
+    embed       model_manager.embed_batch on face crops
+    recognize   FaceService.recognize_frame end to end (embedding cache off)
+
+With --stub the detector and recognition model are replaced by the stub
+backend (FACE_MODEL_BACKEND=stub), so everything runs without TensorFlow.
+
+Usage:
+    python -m benchmarks.micro --stub --people 2000 --encodings 5
+    python -m benchmarks.micro --output micro.json
+"""
+import argparse
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, List
+
+import cv2
+import numpy as np
+
+from benchmarks.common import time_call, write_report
+
+def synthetic_image(rng: np.random.Generator, width: int = 640, height: int = 480) -> np.ndarray:
+    """Smooth random BGR image that compresses like a photo rather than noise"""
+    small = rng.integers(0, 256, size=(max(1, height // 40), max(1, width // 40), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.GaussianBlur(image, (0, 0), 3)
+
+def encode_jpeg(image: np.ndarray) -> bytes:
+    ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return data.tobytes()
+
+def bench_decode(rng: np.random.Generator, repeats: int) -> Dict[str, Any]:
+    from app.services.face_service import decode_image
+
+    results = {}
+    for width, height in [(320, 240), (640, 480), (1280, 720), (1920, 1080)]:
+        data = encode_jpeg(synthetic_image(rng, width, height))
+        results[f"{width}x{height}"] = {"bytes": len(data), **time_call(lambda: decode_image(data), repeats)}
+    return results
+
+def bench_db_load(db_service, repeats: int) -> Dict[str, Any]:
+    return {
+        "get_gallery_embeddings": time_call(db_service.get_gallery_embeddings, repeats, warmup=1),
+        "get_all_face_encodings": time_call(db_service.get_all_face_encodings, max(1, repeats // 4), warmup=1)
+    }
+
+def bench_match(gallery_index, rng: np.random.Generator, repeats: int) -> Dict[str, Any]:
+    snapshot = gallery_index.snapshot()
+    dim = snapshot.embeddings.shape[1]
+    probes = rng.normal(size=(16, dim)).astype(np.float32)
+    return {
+        "search_1": time_call(lambda: gallery_index.search(probes[:1], k=1), repeats),
+        "search_16": time_call(lambda: gallery_index.search(probes, k=1), repeats),
+        "search_1_top5_people": time_call(lambda: gallery_index.search(probes[:1], k=5, unique_persons=True), repeats)
+    }
+
+def bench_model(model_manager, frames: List[np.ndarray], repeats: int) -> Dict[str, Any]:
+    faces = model_manager.extract_faces(frames[0], enforce_detection=False)
+    crops = [face["face"] for face in faces] * 8 if faces else []
+    results = {"detect": time_call(lambda: model_manager.extract_faces(frames[0], enforce_detection=False), repeats)}
+    if crops:
+        results["embed_1"] = time_call(lambda: model_manager.embed_batch(crops[:1]), repeats)
+        results["embed_8"] = time_call(lambda: model_manager.embed_batch(crops[:8]), repeats)
+    return results
+
+def bench_recognize(face_service, frames: List[np.ndarray], repeats: int) -> Dict[str, Any]:
+    from app.services.embedding_cache import embedding_cache
+
+    # Every call should pay for detection and embedding
+    cache_size, embedding_cache.max_entries = embedding_cache.max_entries, 0
+    try:
+        return {
+            "recognize_frame": time_call(lambda: face_service.recognize_frame(frames[0]), repeats),
+            "recognize_frames_8": time_call(lambda: face_service.recognize_frames(frames[:8], 1), max(1, repeats // 4))
+        }
+    finally:
+        embedding_cache.max_entries = cache_size
+
+def run(people: int, encodings: int, repeats: int, seed: int = 0) -> Dict[str, Any]:
+    """Populate the configured database if empty and time every stage"""
+    from app.database.models import init_db, SessionLocal
+    from app.services.db_service import DatabaseService
+    from app.services.face_service import FaceService
+    from app.services.gallery_index import gallery_index
+    from app.services.model_manager import model_manager
+    from app.services.inference_scheduler import inference_scheduler
+    from benchmarks.synthetic_gallery import populate
+
+    init_db()
+    db = SessionLocal()
+    rng = np.random.default_rng(seed)
+    try:
+        db_service = DatabaseService(db)
+        if not db_service.list_people(limit=1):
+            populate(db_service, people, encodings, seed=seed)
+
+        report = {"people": people, "encodings": encodings, "decode": bench_decode(rng, repeats)}
+        report["db_load"] = bench_db_load(db_service, repeats)
+        report["build"] = time_call(lambda: gallery_index.build(db_service), max(1, repeats // 4), warmup=0)
+        report["gallery_size"] = len(gallery_index)
+        report["match"] = bench_match(gallery_index, rng, repeats)
+
+        model_manager.load(warm_up=False)
+        inference_scheduler.start()
+        frames = [synthetic_image(rng) for _ in range(8)]
+        report["model"] = bench_model(model_manager, frames, repeats)
+        report["recognize"] = bench_recognize(FaceService(db_service), frames, repeats)
+        inference_scheduler.stop()
+        return report
+    finally:
+        db.close()
+
+def print_report(report: Dict[str, Any], prefix: str = "") -> None:
+    for key, value in report.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            print(f"{prefix + key:<45} p50 {value['p50_ms']:>9.3f} ms  p95 {value['p95_ms']:>9.3f} ms  p99 {value['p99_ms']:>9.3f} ms")
+        elif isinstance(value, dict):
+            print_report(value, prefix + key + ".")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=2000)
+    parser.add_argument("--encodings", type=int, default=5, help="Encodings per person")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--stub", action="store_true", help="Use the stub model instead of DeepFace")
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temporary one)")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.stub:
+        os.environ["FACE_MODEL_BACKEND"] = "stub"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{args.database or Path(tmp) / 'micro.db'}"
+        report = run(args.people, args.encodings, args.repeats)
+        print_report(report)
+        if args.output:
+            write_report(args.output, {"benchmark": "micro", **report})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Memory and recognition throughput as uvicorn workers are added.
+
+For every worker count, starts the API on a scratch database holding a
+synthetic gallery in two modes:
+    shared      python -m app.serve: workers map one published gallery
+    private     plain uvicorn --workers: every worker loads its own gallery
+then measures the proportional set size (PSS, shared pages split between
+the processes mapping them) summed over the whole process tree, and the
+/api/v1/recognize throughput with `--concurrency-per-worker` clients per
+worker. Shared mode should stay roughly flat in memory; both modes should
+scale throughput with workers up to the number of cores.
+
+Runs with the stub model (FACE_MODEL_BACKEND=stub) so the numbers reflect
+the serving layer rather than TensorFlow. Memory is read from /proc, so
+this benchmark only runs on Linux.
+
+Usage:
+    python -m benchmarks.multi_worker --workers 1 2 4 --people 20000
+    python -m benchmarks.multi_worker --modes shared --workers 1 2 4 8 --output workers.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+
+from benchmarks.common import write_report
+from benchmarks.load_test import BASE_DIR, Client, run_scenario, start_server
+from benchmarks.micro import encode_jpeg, synthetic_image
+
+def process_tree(pid: int) -> List[int]:
+    """A process and all of its descendants"""
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children = (task / "children").read_text().split()
+        except OSError:
+            continue
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Summed RSS and PSS of a process tree in MiB"""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for member in process_tree(pid):
+        try:
+            lines = Path(f"/proc/{member}/smaps_rollup").read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                totals[f"{key.lower()}_mb"] += int(value.split()[0]) / 1024
+    return totals
+
+def start_shared(port: int, database_url: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url, EMBEDDING_CACHE_SIZE="0", FACE_MODEL_BACKEND="stub")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"
+        ],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+def wait_all_ready(url: str, server: subprocess.Popen, workers: int, timeout: float) -> None:
+    """Wait until /readyz answers 200 often enough in a row that every worker is likely loaded"""
+    client = Client(url, 5.0)
+    deadline = time.perf_counter() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Server at {url} not ready after {timeout:.0f}s")
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            streak = streak + 1 if client.get("/readyz")[0] == 200 else 0
+        except OSError:
+            streak = 0
+        time.sleep(0.05 if streak else 0.25)
+
+def measure(
+    mode: str,
+    workers: int,
+    port: int,
+    database_url: str,
+    probes: List[bytes],
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    if mode == "shared":
+        server = start_shared(port, database_url, workers)
+    else:
+        server = start_server(port, database_url, True, 0.0, workers, embedding_cache=False)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_all_ready(url, server, workers, args.ready_timeout)
+        # Touch the gallery in every worker before reading memory
+        run_scenario(url, "recognize", probes, [], 2 * workers, 2.0, 1, 0.0, args.timeout)
+        memory = memory_mb(server.pid)
+        result = run_scenario(
+            url, "recognize", probes, [], args.concurrency_per_worker * workers, args.duration, 1, 0.0, args.timeout
+        )
+    finally:
+        server.terminate()
+        server.wait()
+    stats = result["requests"]["recognize"]
+    return {
+        "mode": mode,
+        "workers": workers,
+        **memory,
+        "requests_per_second": stats["ok_per_second"],
+        "p50_ms": stats["latency"]["p50_ms"],
+        "p95_ms": stats["latency"]["p95_ms"],
+        "status_codes": stats["status_codes"]
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["shared", "private"], choices=["shared", "private"])
+    parser.add_argument("--people", type=int, default=20000, help="Synthetic gallery size in people")
+    parser.add_argument("--encodings", type=int, default=5, help="Encodings per synthetic person")
+    parser.add_argument("--concurrency-per-worker", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per configuration")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    probes = [encode_jpeg(synthetic_image(rng)) for _ in range(32)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{Path(tmp) / 'workers.db'}"
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["UPLOAD_FOLDER"] = str(Path(tmp) / "captured_faces")
+        os.environ["FACE_MODEL_BACKEND"] = "stub"
+        from app.database.models import init_db, SessionLocal
+        from app.services.db_service import DatabaseService
+        from benchmarks.synthetic_gallery import populate
+
+        init_db()
+        db = SessionLocal()
+        try:
+            populate(DatabaseService(db), args.people, args.encodings)
+        finally:
+            db.close()
+
+        print(f"{'mode':>8} {'workers':>7} {'PSS MiB':>9} {'RSS MiB':>9} {'ok/s':>8} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        runs = []
+        for mode in args.modes:
+            baseline = None
+            for workers in args.workers:
+                run = measure(mode, workers, args.port, database_url, probes, args)
+                baseline = baseline or run["requests_per_second"]
+                run["speedup"] = run["requests_per_second"] / baseline if baseline else 0.0
+                runs.append(run)
+                print(
+                    f"{mode:>8} {workers:>7} {run['pss_mb']:>9.1f} {run['rss_mb']:>9.1f} "
+                    f"{run['requests_per_second']:>8.1f} {run['speedup']:>7.2f}x {run['p50_ms']:>9.2f} {run['p95_ms']:>9.2f}"
+                )
+
+        if args.output:
+            write_report(args.output, {
+                "benchmark": "multi_worker",
+                "people": args.people,
+                "encodings": args.encodings,
+                "cpus": os.cpu_count(),
+                "runs": runs
+            })
+
+if __name__ == "__main__":
+    main()
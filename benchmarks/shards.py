@@ -0,0 +1,147 @@
+"""Search latency of the sharded gallery as shards are added.
+
+Fills a scratch database with a synthetic gallery, then for every shard
+count starts that many local app.shard_worker processes and times
+ShardedGallery.search (the scatter-gather used by the API) for one probe
+and for a batch of probes, next to the in-process GalleryIndex as the
+baseline. Every configuration also reports how often its top-1 person agrees
+with the in-process index.
+
+With --straggler-ms, one more run per shard count slows the last shard down
+by that much, to show that answers stay within SHARD_TIMEOUT_MS (partial
+answers from the other shards) instead of waiting for it.
+
+Usage:
+    python -m benchmarks.shards --shards 1 2 4 8 --people 50000
+    python -m benchmarks.shards --shards 4 --straggler-ms 500 --timeout-ms 100 --output shards.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, List
+
+import numpy as np
+
+from benchmarks.common import time_call, write_report
+from benchmarks.load_test import BASE_DIR
+
+def start_shards(count: int, base_port: int, database_url: str, straggler_ms: float = 0.0) -> List[subprocess.Popen]:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    processes = []
+    for shard in range(count):
+        command = [
+            sys.executable, "-m", "app.shard_worker", "--shard", str(shard), "--shards", str(count),
+            "--host", "127.0.0.1", "--port", str(base_port + shard)
+        ]
+        if straggler_ms and shard == count - 1:
+            command += ["--delay-ms", str(straggler_ms)]
+        processes.append(subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL))
+    return processes
+
+def stop_shards(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+def agreement(results: List[List[Dict[str, Any]]], reference: List[List[Dict[str, Any]]]) -> float:
+    """Share of probes whose top-1 person matches the reference"""
+    same = sum(
+        1 for found, expected in zip(results, reference)
+        if found and expected and found[0]["person_id"] == expected[0]["person_id"]
+    )
+    return same / max(1, len(reference))
+
+def bench(gallery, probes: np.ndarray, reference: List[List[Dict[str, Any]]], k: int, repeats: int) -> Dict[str, Any]:
+    return {
+        "search_1": time_call(lambda: gallery.search(probes[:1], k=k, unique_persons=True), repeats),
+        f"search_{len(probes)}": time_call(lambda: gallery.search(probes, k=k, unique_persons=True), max(1, repeats // 4)),
+        "top1_agreement": agreement(gallery.search(probes, k=k, unique_persons=True), reference)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--people", type=int, default=20000, help="Synthetic gallery size in people")
+    parser.add_argument("--encodings", type=int, default=5, help="Encodings per synthetic person")
+    parser.add_argument("--probes", type=int, default=16, help="Probes per batch search")
+    parser.add_argument("--k", type=int, default=5, help="Candidates per probe")
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--timeout-ms", type=float, default=1000.0, help="Search deadline (SHARD_TIMEOUT_MS)")
+    parser.add_argument("--straggler-ms", type=float, default=0.0, help="Also run with the last shard this much slower")
+    parser.add_argument("--port", type=int, default=9300, help="Port of shard 0; shard i listens on port + i")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{Path(tmp) / 'shards.db'}"
+        os.environ["DATABASE_URL"] = database_url
+        os.environ["GALLERY_SHARDS"] = ""
+        from app.database.models import init_db, SessionLocal
+        from app.services.db_service import DatabaseService
+        from app.services.gallery_index import GalleryIndex
+        from app.services.sharded_gallery import ShardedGallery, shard_failures
+        from benchmarks.synthetic_gallery import populate
+
+        init_db()
+        db = SessionLocal()
+        try:
+            populate(DatabaseService(db), args.people, args.encodings)
+            local = GalleryIndex(shared_dir="")
+            local.build(DatabaseService(db))
+        finally:
+            db.close()
+
+        # Noisy copies of enrolled encodings, so every probe has a true match
+        rng = np.random.default_rng(1)
+        snapshot = local.snapshot()
+        rows = rng.choice(len(snapshot.person_ids), size=args.probes, replace=False)
+        probes = snapshot.embeddings[rows].astype(np.float32) + 0.05 * rng.normal(size=(args.probes, snapshot.embeddings.shape[1]))
+        probes = probes.astype(np.float32)
+        reference = local.search(probes, k=args.k, unique_persons=True)
+
+        report = {"people": args.people, "encodings": args.encodings, "k": args.k, "timeout_ms": args.timeout_ms}
+        report["local"] = bench(local, probes, reference, args.k, args.repeats)
+        runs = [("local", 0, 0.0, report["local"])]
+
+        configurations = [(count, 0.0) for count in args.shards]
+        if args.straggler_ms:
+            configurations += [(count, args.straggler_ms) for count in args.shards if count > 1]
+        report["sharded"] = []
+        for count, straggler_ms in configurations:
+            processes = start_shards(count, args.port, database_url, straggler_ms)
+            try:
+                urls = [f"http://127.0.0.1:{args.port + shard}" for shard in range(count)]
+                gallery = ShardedGallery(urls, timeout_ms=args.timeout_ms, allow_partial=True)
+                gallery.build(wait_seconds=120.0)
+                failures_before = shard_failures.total()
+                result = bench(gallery, probes, reference, args.k, args.repeats)
+                result.update({
+                    "shards": count,
+                    "straggler_ms": straggler_ms,
+                    "rows_per_shard": [status["rows"] for _, status in sorted(gallery.status().items())],
+                    "shard_failures": shard_failures.total() - failures_before
+                })
+            finally:
+                stop_shards(processes)
+            report["sharded"].append(result)
+            runs.append(("sharded", count, straggler_ms, result))
+
+        print(f"{'gallery':>8} {'shards':>6} {'slow ms':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{f'batch{args.probes} p50':>12} {'top1 agree':>10} {'failures':>8}")
+        for name, count, straggler_ms, result in runs:
+            single, batch = result["search_1"], result[f"search_{args.probes}"]
+            print(
+                f"{name:>8} {count or '-':>6} {straggler_ms or '-':>8} {single['p50_ms']:>9.3f} {single['p95_ms']:>9.3f} "
+                f"{single['p99_ms']:>9.3f} {batch['p50_ms']:>12.3f} {result['top1_agreement']:>10.3f} "
+                f"{result.get('shard_failures', 0):>8}"
+            )
+
+        if args.output:
+            write_report(args.output, {"benchmark": "shards", **report})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Fill a database with a synthetic gallery of random unit-vector encodings.
+
+People are written through DatabaseService.add_people_bulk in chunks, exactly
+as a bulk enrollment would store them, so the gallery index, prototypes and
+face counts are all in their normal state. The target database is migrated
+first; point DATABASE_URL at a scratch file, not the real database.
+
+Usage:
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.synthetic_gallery --people 10000 --encodings 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services.stub_model import MODEL_DIMS
+
+def populate(db_service, people: int, encodings: int, dim: int = None, seed: int = 0, chunk: int = 500,
+             prefix: str = "synthetic") -> int:
+    """Add `people` people with `encodings` noisy unit vectors around a random center each
+
+    Returns:
+        The number of encodings written
+    """
+    dim = dim or MODEL_DIMS.get(settings.FACE_RECOGNITION_MODEL, 128)
+    rng = np.random.default_rng(seed)
+    written = 0
+    for start in range(0, people, chunk):
+        count = min(chunk, people - start)
+        centers = rng.normal(size=(count, 1, dim)).astype(np.float32)
+        vectors = centers + 0.3 * rng.normal(size=(count, encodings, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=2, keepdims=True)
+        db_service.add_people_bulk([
+            {
+                "name": f"{prefix}_{start + i}",
+                "encodings": [(f"{prefix}_{start + i}_{j}.jpg", vector) for j, vector in enumerate(person)]
+            }
+            for i, person in enumerate(vectors)
+        ])
+        written += count * encodings
+    return written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--people", type=int, default=1000)
+    parser.add_argument("--encodings", type=int, default=5, help="Encodings per person")
+    parser.add_argument("--dim", type=int, help="Embedding size (default: that of FACE_RECOGNITION_MODEL)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.database.models import init_db, SessionLocal
+    from app.services.db_service import DatabaseService
+
+    init_db()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        written = populate(DatabaseService(db), args.people, args.encodings, args.dim, args.seed)
+        print(f"Wrote {args.people} people and {written} encodings in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,29 +3,77 @@ from deepface import DeepFace
 import os
 import numpy as np
 from scipy.spatial.distance import cosine
+import argparse
+import queue
+import threading
 import time
 
 # Create a directory to store captured images if it doesn't exist
 if not os.path.exists("captured_faces"):
     os.makedirs("captured_faces")
 
-def detect_faces_opencv(frame):
-    # Convert to grayscale for face detection
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    # Load the pre-trained Haar Cascade classifier
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    
-    # Detect faces
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30),
-        flags=cv2.CASCADE_SCALE_IMAGE
-    )
-    
-    return faces
+class FaceDetector:
+    """Haar cascade face detector that is cheap enough to run on live video.
+
+    The cascade is loaded once, detection runs on a downscaled grayscale copy
+    of the frame and boxes are mapped back to full resolution. Full detection
+    only runs every `detect_every` frames; in between, each face is followed
+    by matching its last appearance in a small window around its old box.
+    """
+
+    def __init__(self, detect_width=320, detect_every=3, scale_factor=1.1, min_neighbors=5, min_size=30):
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.detect_width = detect_width
+        self.detect_every = max(1, detect_every)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.frame_index = 0
+        self.boxes = []  # Faces in downscaled coordinates
+        self.templates = []
+
+    def update(self, frame):
+        """Return face boxes (x, y, w, h) in full-resolution coordinates"""
+        scale = min(1.0, self.detect_width / frame.shape[1])
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        if self.frame_index % self.detect_every == 0 or not self.boxes:
+            self.boxes = self._detect(gray)
+        else:
+            self.boxes = self._track(gray)
+        self.templates = [gray[y:y + h, x:x + w].copy() for x, y, w, h in self.boxes]
+        self.frame_index += 1
+
+        return [tuple(int(round(v / scale)) for v in box) for box in self.boxes]
+
+    def _detect(self, gray):
+        # The minimum face size shrinks with the image
+        min_size = max(8, int(self.min_size * self.detect_width / 640))
+        faces = self.cascade.detectMultiScale(
+            cv2.equalizeHist(gray),
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+    def _track(self, gray):
+        boxes = []
+        for (x, y, w, h), template in zip(self.boxes, self.templates):
+            # Search a window half a face larger on every side
+            x0, y0 = max(0, x - w // 2), max(0, y - h // 2)
+            x1, y1 = min(gray.shape[1], x + w + w // 2), min(gray.shape[0], y + h + h // 2)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                continue
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if best > 0.5:
+                boxes.append((x0 + dx, y0 + dy, w, h))
+        return boxes
 
 def draw_face_rectangles(frame, faces):
     # Draw rectangles around detected faces
@@ -43,7 +91,73 @@ def draw_face_rectangles(frame, faces):
     
     return frame
 
-def capture_and_verify():
+class InferenceWorker:
+    """Runs DeepFace on a background thread so the preview never waits for it.
+
+    Frames are handed over in memory. At most one job waits behind the one
+    being processed; further submissions are refused until the worker
+    catches up, so a slow model can never build a backlog.
+    """
+
+    def __init__(self):
+        self.jobs = queue.Queue(maxsize=1)
+        self.results = queue.Queue()
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def busy(self):
+        return self.pending > 0
+
+    def submit(self, kind, frame, save_path=None):
+        """Queue a frame for embedding; returns False if the worker is full"""
+        try:
+            self.jobs.put_nowait((kind, frame, save_path))
+        except queue.Full:
+            return False
+        self.pending += 1
+        return True
+
+    def poll(self):
+        """Return every (kind, embedding, error, save_path) finished so far"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+            self.pending -= 1
+        return finished
+
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            kind, frame, save_path = job
+            try:
+                # Embed straight from the in-memory frame
+                embedding = DeepFace.represent(frame, enforce_detection=True)[0]["embedding"]
+                if save_path:
+                    cv2.imwrite(save_path, frame)
+                self.results.put((kind, embedding, None, save_path))
+            except Exception as e:
+                self.results.put((kind, None, e, save_path))
+
+def capture_and_verify(continuous=False, verify_every=10, smoothing=0.3, threshold=0.25):
+    """Run the enrollment and verification preview
+    
+    Args:
+        continuous: Verify every `verify_every` frames instead of only on 'v'
+        verify_every: Frames between continuous verifications
+        smoothing: Weight of the newest distance in the moving average
+        threshold: Cosine distance below which faces count as the same person
+    """
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         print("Error: Could not open webcam.")
@@ -65,26 +179,78 @@ def capture_and_verify():
     print("-" * 30)
 
     phase = "enrollment"  # Can be 'enrollment' or 'verification'
+    detector = FaceDetector()
+    worker = InferenceWorker()
+    fps = 0.0
+    last_frame_time = time.perf_counter()
+    frame_index = 0
+    average_embedding = None
+    smoothed_distance = None
+    last_result = None  # (text, color) of the latest verification
     
     while True:
         ret, frame = cap.read()
         if not ret:
             print("Error: Failed to grab frame.")
             break
+        frame_index += 1
+        
+        # Continuous verification takes its own copy before overlays are drawn
+        if continuous and phase == "verification" and frame_index % verify_every == 0 and not worker.busy:
+            worker.submit("verify", frame.copy())
 
-        # Create a copy of the frame for display
-        display_frame = frame.copy()
+        # Overlays are drawn straight onto the captured frame; images for
+        # enrollment and verification are grabbed fresh when a key is pressed
+        display_frame = frame
+        
+        now = time.perf_counter()
+        fps = 0.9 * fps + 0.1 / max(now - last_frame_time, 1e-6)
+        last_frame_time = now
+        
+        # Apply whatever the background worker finished since the last frame
+        for kind, embedding, error, save_path in worker.poll():
+            if kind == "enroll":
+                if error is not None:
+                    print(f"Error processing image: {error}")
+                    print("Please ensure a face is clearly visible and try again.")
+                elif len(enrollment_embeddings) < 5:
+                    captured_enrollment_images.append(save_path)
+                    enrollment_embeddings.append(embedding)
+                    print(f"Image {len(captured_enrollment_images)} captured and processed successfully.")
+                    
+                    # If we have 5 images, calculate average embedding
+                    if len(captured_enrollment_images) == 5:
+                        average_embedding = np.mean(enrollment_embeddings, axis=0)
+                        print("\nEnrollment complete! You can now verify faces.")
+                        print("Press 'v' to start verification.")
+            elif kind == "verify":
+                if error is not None:
+                    if not continuous:
+                        print(f"Verification error: {error}")
+                    continue
+                
+                # Calculate distance, smoothed over time in continuous mode
+                distance = cosine(average_embedding, embedding)
+                if continuous and smoothed_distance is not None:
+                    distance = smoothing * distance + (1 - smoothing) * smoothed_distance
+                smoothed_distance = distance
+                
+                result_text = "SAME PERSON" if distance < threshold else "DIFFERENT PERSON"
+                color = (0, 255, 0) if distance < threshold else (0, 0, 255)
+                last_result = (f"Result: {result_text} (Score: {distance:.4f})", color)
+                if not continuous:
+                    print(f"Verification result: {result_text} (Distance: {distance:.4f}, Threshold: {threshold})")
         
         # Detect faces in real-time using OpenCV
         try:
-            # Detect faces using Haar Cascade
-            faces = detect_faces_opencv(frame)
+            # Detect (or track) faces with the cached Haar cascade
+            faces = detector.update(frame)
             
             # Draw face rectangles and info
-            display_frame = draw_face_rectangles(display_frame.copy(), faces)
+            display_frame = draw_face_rectangles(display_frame, faces)
             
-            # Add face count
-            cv2.putText(display_frame, f"Faces: {len(faces)}", (10, 110), 
+            # Add face count and preview frame rate
+            cv2.putText(display_frame, f"Faces: {len(faces)}  FPS: {fps:.1f}", (10, 110), 
                       cv2.FONT_HERSHEY_PLAIN, 1, (0, 255, 0), 1, cv2.LINE_AA)
             
         except Exception as e:
@@ -105,43 +271,41 @@ def capture_and_verify():
                        cv2.FONT_HERSHEY_PLAIN, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
             
         elif phase == "verification":  
-            cv2.putText(display_frame, "VERIFICATION", (10, 30), 
+            cv2.putText(display_frame, "VERIFICATION (continuous)" if continuous else "VERIFICATION", (10, 30), 
                        cv2.FONT_HERSHEY_PLAIN, 0.7, (255, 255, 255), 1, cv2.LINE_AA)
             cv2.putText(display_frame, "Press 'v' to verify | 'q' to quit", (10, 60), 
                        cv2.FONT_HERSHEY_PLAIN, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
+            
+            # Keep the latest result on screen until a newer one arrives
+            if last_result is not None:
+                cv2.putText(display_frame, last_result[0], 
+                           (20, 140), cv2.FONT_HERSHEY_PLAIN, 0.6, last_result[1], 1)
+        
+        if worker.busy:
+            cv2.putText(display_frame, "Processing...", (10, 85 if phase == "verification" else 95), 
+                       cv2.FONT_HERSHEY_PLAIN, 0.5, (0, 200, 255), 1, cv2.LINE_AA)
 
         # Show the frame with instructions
         cv2.imshow('Face Verification System', display_frame)
 
         key = cv2.waitKey(1) & 0xFF
+        
+        # The displayed frame has overlays on it; capture a clean one
+        if key in (ord('s'), ord('v')):
+            ret, clean_frame = cap.read()
+            if ret:
+                frame = clean_frame
 
         if phase == "enrollment" and key == ord('s'):
-            if len(captured_enrollment_images) >= 5:
+            if len(captured_enrollment_images) + worker.pending >= 5:
                 print("Already captured 5 images. Press 'v' to start verification.")
                 continue
                 
             img_name = f"captured_faces/enrollment_face_{img_count}.jpg"
-            cv2.imwrite(img_name, frame)
-            
-            try:
-                # Try to detect face and get embedding
-                embedding = DeepFace.represent(img_name, enforce_detection=True)[0]["embedding"]
-                captured_enrollment_images.append(img_name)
-                enrollment_embeddings.append(embedding)
-                print(f"Image {len(captured_enrollment_images)} captured and processed successfully.")
+            if worker.submit("enroll", frame, save_path=img_name):
                 img_count += 1
-                
-                # If we have 5 images, calculate average embedding
-                if len(captured_enrollment_images) == 5:
-                    average_embedding = np.mean(enrollment_embeddings, axis=0)
-                    print("\nEnrollment complete! You can now verify faces.")
-                    print("Press 'v' to start verification.")
-                    
-            except Exception as e:
-                print(f"Error processing image: {e}")
-                print("Please ensure a face is clearly visible and try again.")
-                if os.path.exists(img_name):
-                    os.remove(img_name)
+            else:
+                print("Still processing the previous image, please wait.")
         
         elif phase == "enrollment" and key == ord('v'):
             if len(captured_enrollment_images) < 5:
@@ -150,50 +314,39 @@ def capture_and_verify():
                 average_embedding = np.mean(enrollment_embeddings, axis=0)
                 phase = "verification"
                 print("\n--- VERIFICATION MODE ---")
-                print("Press 'v' to verify the current frame.")
+                print("Verifying continuously." if continuous else "Press 'v' to verify the current frame.")
                 
         elif phase == "verification" and key == ord('v'):
-            verification_img_name = "captured_faces/verification_face.jpg"
-            cv2.imwrite(verification_img_name, frame)
-            
-            try:
-                # Get embedding for verification
-                verification_result = DeepFace.represent(verification_img_name, enforce_detection=True)[0]["embedding"]
-                
-                # Calculate distance
-                distance = cosine(average_embedding, verification_result)
-                threshold = 0.25  # Adjust threshold as needed
-                
-                # Display result
-                result_text = "SAME PERSON" if distance < threshold else "DIFFERENT PERSON"
-                color = (0, 255, 0) if distance < threshold else (0, 0, 255)
-                
-                # Add result to the frame
-                cv2.putText(display_frame, f"Result: {result_text} (Score: {distance:.4f})", 
-                           (20, 120), cv2.FONT_HERSHEY_PLAIN, 0.6, color, 1)
-                
-                print(f"Verification result: {result_text} (Distance: {distance:.4f}, Threshold: {threshold})")
-                
-                # Show the result for 2 seconds
-                cv2.imshow('Face Verification System', display_frame)
-                cv2.waitKey(2000)
-                
-            except Exception as e:
-                print(f"Verification error: {e}")
+            # Hand the frame to the worker; the result is overlaid when it arrives
+            if not worker.submit("verify", frame):
+                print("Still verifying the previous frame, please wait.")
                 
         elif key == ord('q'):
             print("Quitting...")
             break
 
     # Cleanup
+    worker.stop()
     cap.release()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live face enrollment and verification")
+    parser.add_argument("--continuous", action="store_true", help="Verify continuously instead of on 'v'")
+    parser.add_argument("--verify-every", type=int, default=10, help="Frames between continuous verifications")
+    parser.add_argument("--smoothing", type=float, default=0.3, help="Weight of the newest distance (0-1)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Cosine distance threshold")
+    args = parser.parse_args()
+    
     try:
-        capture_and_verify()
+        capture_and_verify(
+            continuous=args.continuous,
+            verify_every=max(1, args.verify_every),
+            smoothing=args.smoothing,
+            threshold=args.threshold
+        )
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
         # Ensure all OpenCV windows are closed
-        cv2.destroyAllWindows()
\ No newline at end of file
+        cv2.destroyAllWindows()
@@ -2,6 +2,7 @@
 let video, video2, canvas, canvas2, ctx, ctx2;
 let stream = null;
 let capturedImages = [];
+let liveSocket = null;
 
 // DOM elements
 document.addEventListener('DOMContentLoaded', function() {
@@ -29,6 +30,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Event listeners for Recognize tab
     document.getElementById('startCamera2').addEventListener('click', () => startCamera(video2));
     document.getElementById('recognizeBtn').addEventListener('click', recognizeFace);
+    document.getElementById('liveBtn').addEventListener('click', toggleLiveRecognition);
     
     // Initialize tabs
     const tabEl = document.querySelectorAll('button[data-bs-toggle="tab"]');
@@ -44,6 +46,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 document.getElementById('registerBtn').disabled = true;
             } else if (event.target.id === 'recognize-tab') {
                 document.getElementById('recognizeBtn').disabled = true;
+                document.getElementById('liveBtn').disabled = true;
             }
         });
     });
@@ -79,6 +82,7 @@ async function startCamera(videoElement) {
             document.getElementById('capture').disabled = false;
         } else {
             document.getElementById('recognizeBtn').disabled = false;
+            document.getElementById('liveBtn').disabled = false;
         }
         
         // Update canvas dimensions when video metadata is loaded
@@ -94,6 +98,7 @@ async function startCamera(videoElement) {
 
 // Stop camera
 function stopCamera() {
+    stopLiveRecognition();
     if (stream) {
         stream.getTracks().forEach(track => track.stop());
         stream = null;
@@ -333,6 +338,70 @@ async function recognizeFace() {
     }
 }
 
+// Stream webcam frames over a WebSocket and show per-face results
+function toggleLiveRecognition() {
+    if (liveSocket) {
+        stopLiveRecognition();
+        return;
+    }
+    
+    const canvas = document.getElementById('canvas2');
+    const ctx = canvas.getContext('2d');
+    const video = document.getElementById('video2');
+    const resultText = document.getElementById('resultText');
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    
+    liveSocket = new WebSocket(`${protocol}://${window.location.host}/api/v1/recognize/stream`);
+    liveSocket.binaryType = 'arraybuffer';
+    document.getElementById('liveBtn').textContent = 'Stop Live';
+    document.getElementById('personInfo').style.display = 'none';
+    
+    // Send the next frame only once the previous one is answered
+    const sendFrame = () => {
+        if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN) return;
+        canvas.width = video.videoWidth;
+        canvas.height = video.videoHeight;
+        ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+        canvas.toBlob(blob => {
+            if (blob && liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+                liveSocket.send(blob);
+            }
+        }, 'image/jpeg', 0.8);
+    };
+    
+    liveSocket.onopen = sendFrame;
+    liveSocket.onmessage = event => {
+        const result = JSON.parse(event.data);
+        if (result.status === 'success') {
+            const names = result.tracks.map(track =>
+                track.recognized
+                    ? `${track.person.name} (${(track.person.confidence * 100).toFixed(0)}%)`
+                    : `Unknown #${track.track_id}`
+            );
+            resultText.textContent = names.join(', ');
+            resultText.className = result.tracks.some(track => track.recognized) ? 'alert alert-success' : 'alert alert-info';
+        } else if (result.status === 'no_face') {
+            resultText.textContent = 'No face detected';
+            resultText.className = 'alert alert-warning';
+        } else {
+            resultText.textContent = `Error: ${result.message || 'Unexpected response from server'}`;
+            resultText.className = 'alert alert-danger';
+        }
+        requestAnimationFrame(sendFrame);
+    };
+    liveSocket.onclose = () => stopLiveRecognition();
+}
+
+function stopLiveRecognition() {
+    if (liveSocket) {
+        const socket = liveSocket;
+        liveSocket = null;
+        socket.close();
+    }
+    const liveBtn = document.getElementById('liveBtn');
+    if (liveBtn) liveBtn.textContent = 'Live';
+}
+
 // Helper function to convert base64 to blob
 function dataURItoBlob(dataURI) {
     const byteString = atob(dataURI.split(',')[1]);
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Point the app at scratch storage and the stub model before anything imports app.config
+_scratch = tempfile.mkdtemp(prefix="faceid-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'faceid.db')}")
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_scratch, "captured_faces"))
+os.environ.setdefault("ANN_INDEX_PATH", os.path.join(_scratch, "faceid.ann.npz"))
+os.environ.setdefault("FACE_MODEL_BACKEND", "stub")
+os.environ["GALLERY_SHARDS"] = ""
+os.environ["SHARED_GALLERY_DIR"] = ""
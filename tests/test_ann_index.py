@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.gallery_index import GalleryIndex
+from benchmarks.ann_recall import SyntheticGallery
+
+@pytest.fixture
+def small_ann(monkeypatch):
+    # Let a gallery of a few thousand rows use the ANN path
+    monkeypatch.setattr(settings, "ANN_MIN_GALLERY_SIZE", 1000)
+    monkeypatch.setattr(settings, "ANN_RETRAIN_GROWTH", 0.0)
+
+def ann_index(tmp_path) -> GalleryIndex:
+    index = GalleryIndex(backend="ivfpq", shared_dir="")
+    index.ann_path = str(tmp_path / "test.ann.npz")
+    return index
+
+def recall_at_1(index: GalleryIndex, reference: GalleryIndex, probes: np.ndarray) -> float:
+    expected = reference.search(probes, k=1)
+    found = index.search(probes, k=1)
+    return float(np.mean([a[0]["person_id"] == b[0]["person_id"] for a, b in zip(expected, found)]))
+
+def test_ivfpq_recall_against_the_exact_scan(small_ann, tmp_path):
+    source = SyntheticGallery(size=5000, people=1000, dim=64, noise=0.5)
+    exact = GalleryIndex(backend="exact", shared_dir="")
+    exact.build(source)
+    ann = ann_index(tmp_path)
+    ann.build(source)
+
+    assert ann.snapshot().ann_state is not None
+    assert recall_at_1(ann, exact, source.probes(200)) >= 0.9
+
+def test_ann_retrains_once_the_gallery_outgrows_its_training_size(small_ann, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ANN_RETRAIN_GROWTH", 2.0)
+    source = SyntheticGallery(size=1500, people=300, dim=64, noise=0.5)
+    ann = ann_index(tmp_path)
+    ann.build(source)
+    assert ann.ann.trained_size == 1500
+
+    rng = np.random.default_rng(1)
+    version = ann.version
+    for person_id in range(1000, 1400):
+        version += 1
+        ann.add_person(person_id, f"person_{person_id}", rng.normal(size=(4, 64)).astype(np.float32), version)
+
+    deadline = time.monotonic() + 60
+    while ann._retraining and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert ann.ann.trained_size > 3000
+
+    rows = ann.snapshot()
+    assert rows.ann_state is not None
+    # Every enrolled encoding still finds its own person through the retrained index
+    alive = np.flatnonzero(rows.alive)[::10]
+    found = ann.search(np.asarray(rows.embeddings[alive], dtype=np.float32), k=1)
+    agreement = np.mean([result[0]["person_id"] == rows.person_ids[row] for result, row in zip(found, alive)])
+    assert agreement >= 0.95
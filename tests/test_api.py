@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.micro import encode_jpeg, synthetic_image
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="module")
+def face_jpeg():
+    return encode_jpeg(synthetic_image(np.random.default_rng(0)))
+
+def test_register_rejects_other_file_types(client):
+    response = client.post(
+        "/api/v1/register", data={"name": "text file"}, files=[("images", ("notes.txt", b"hello", "text/plain"))]
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Only .png, .jpg and .jpeg files are allowed"
+
+def test_register_duplicate_name_is_a_client_error(client, face_jpeg):
+    files = [("images", ("face.jpg", face_jpeg, "image/jpeg"))]
+    assert client.post("/api/v1/register", data={"name": "duplicate"}, files=files).status_code == 200
+
+    response = client.post("/api/v1/register", data={"name": "duplicate"}, files=files)
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+def test_recognize_rejects_other_file_types(client):
+    response = client.post("/api/v1/recognize", files={"image": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Only .png, .jpg and .jpeg files are allowed"
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Same budget as `python -m benchmarks.cold_start`; the best of a few runs is checked
+IMPORT_BUDGET_MS = 1500.0
+IMPORT_RUNS = 3
+FORBIDDEN_MODULES = ("tensorflow", "keras", "tf_keras", "deepface", "torch", "alembic")
+
+def import_app(tmp_path: Path) -> subprocess.CompletedProcess:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'faceid.db'}",
+        UPLOAD_FOLDER=str(tmp_path / "captured_faces")
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result
+
+def cumulative_import_us(stderr: str) -> dict:
+    """Cumulative microseconds per module from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative_us)
+    return times
+
+def test_app_import_is_within_budget_and_skips_ml_frameworks(tmp_path):
+    runs = [cumulative_import_us(import_app(tmp_path).stderr) for _ in range(IMPORT_RUNS)]
+    best = min(runs, key=lambda times: times["app.main"])
+
+    forbidden = sorted(name for name in best if name.split(".")[0] in FORBIDDEN_MODULES)
+    assert not forbidden, f"import app.main loads {', '.join(forbidden)}"
+    assert best["app.main"] / 1000 <= IMPORT_BUDGET_MS
+
+def test_app_import_creates_nothing(tmp_path):
+    import_app(tmp_path)
+    assert not (tmp_path / "faceid.db").exists()
+    assert not (tmp_path / "captured_faces").exists()
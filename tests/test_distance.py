@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from app.services.distance import (
+    BASE_THRESHOLDS,
+    METRICS,
+    cosine_distance,
+    cosine_similarity,
+    default_threshold,
+    euclidean_distance,
+    euclidean_l2_distance,
+    from_similarity,
+    l2_normalize,
+    pairwise_distances,
+)
+
+def reference(metric: str, a: np.ndarray, b: np.ndarray) -> float:
+    """Textbook distance between two raw embeddings"""
+    if metric == "cosine":
+        return 1 - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    if metric == "euclidean_l2":
+        return np.linalg.norm(a / np.linalg.norm(a) - b / np.linalg.norm(b))
+    return np.linalg.norm(a - b)
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(0)
+    # Raw embeddings are not unit length; scale them like Facenet's outputs
+    probes = rng.normal(scale=3.0, size=(4, 128)).astype(np.float32)
+    gallery = rng.normal(scale=3.0, size=(10, 128)).astype(np.float32)
+    return probes, gallery
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_pairwise_distances_match_reference(metric, embeddings):
+    probes, gallery = embeddings
+    distances = pairwise_distances(metric, probes, gallery)
+
+    expected = np.array([[reference(metric, a, b) for b in gallery] for a in probes])
+    assert distances.shape == (len(probes), len(gallery))
+    np.testing.assert_allclose(distances, expected, rtol=1e-4, atol=1e-4)
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_float16_gallery_stays_close_to_reference(metric, embeddings):
+    probes, gallery = embeddings
+    unit_probes, probe_norms = l2_normalize(probes)
+    unit_gallery, gallery_norms = l2_normalize(gallery, np.float16)
+    distances = from_similarity(metric, cosine_similarity(unit_probes, unit_gallery), probe_norms, gallery_norms)
+
+    expected = np.array([[reference(metric, a, b) for b in gallery] for a in probes])
+    np.testing.assert_allclose(distances, expected, rtol=2e-3, atol=2e-3)
+
+def test_named_kernels_agree_with_from_similarity(embeddings):
+    probes, gallery = embeddings
+    unit_probes, probe_norms = l2_normalize(probes)
+    unit_gallery, gallery_norms = l2_normalize(gallery)
+
+    np.testing.assert_allclose(cosine_distance(unit_probes, unit_gallery), pairwise_distances("cosine", probes, gallery), atol=1e-5)
+    np.testing.assert_allclose(
+        euclidean_l2_distance(unit_probes, unit_gallery), pairwise_distances("euclidean_l2", probes, gallery), atol=1e-5
+    )
+    np.testing.assert_allclose(
+        euclidean_distance(unit_probes, unit_gallery, probe_norms, gallery_norms),
+        pairwise_distances("euclidean", probes, gallery),
+        rtol=1e-5
+    )
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_smaller_distance_means_closer(metric, embeddings):
+    probes, _ = embeddings
+    rng = np.random.default_rng(1)
+    anchor = probes[0]
+    # Increasingly noisy copies of the anchor, same length as the anchor
+    noise = rng.normal(size=anchor.shape).astype(np.float32)
+    copies = np.stack([anchor + scale * noise for scale in (0.0, 0.5, 2.0, 8.0)])
+
+    distances = pairwise_distances(metric, anchor, copies)[0]
+    # Raw euclidean distances are computed from norms, so their rounding scales with the norm
+    scale = np.linalg.norm(anchor) if metric == "euclidean" else 1.0
+    assert distances[0] == pytest.approx(0.0, abs=1e-3 * scale)
+    assert np.all(np.diff(distances) > 0)
+
+@pytest.mark.parametrize("model_name, metric, expected", [
+    ("Facenet", "cosine", 0.40),
+    ("Facenet", "euclidean", 10.0),
+    ("Facenet", "euclidean_l2", 0.80),
+    ("Facenet512", "cosine", 0.30),
+    ("ArcFace", "euclidean_l2", 1.13),
+    ("VGG-Face", "cosine", 0.68),
+    ("SFace", "euclidean", 10.734),
+])
+def test_default_threshold_per_model(model_name, metric, expected):
+    assert default_threshold(model_name, metric) == expected
+
+def test_default_threshold_falls_back_for_unknown_models():
+    for metric in METRICS:
+        assert default_threshold("NoSuchModel", metric) == BASE_THRESHOLDS[metric]
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(ValueError):
+        default_threshold("Facenet", "manhattan")
+    with pytest.raises(ValueError):
+        pairwise_distances("manhattan", np.ones(4), np.ones(4))
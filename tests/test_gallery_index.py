@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.services.gallery_index import GalleryIndex
+from benchmarks.ann_recall import SyntheticGallery
+
+@pytest.fixture
+def source():
+    return SyntheticGallery(size=2000, people=200, dim=64, noise=0.3)
+
+def test_build_from_a_gallery_source(source):
+    index = GalleryIndex(backend="exact", shared_dir="")
+    index.build(source)
+
+    assert index.loaded
+    assert len(index) == len(source.person_ids)
+    assert index.people == len(np.unique(source.person_ids))
+
+    probes = source.embeddings[:20]
+    results = index.search(probes, k=1)
+    assert [found[0]["person_id"] for found in results] == source.person_ids[:20].tolist()
+
+def test_shards_hold_disjoint_people_covering_the_gallery(source):
+    shards = []
+    for shard in range(3):
+        index = GalleryIndex(backend="exact", shared_dir="", shard=(shard, 3))
+        index.build(source)
+        person_ids = {int(pid) for pid in index.snapshot().person_ids}
+        assert all(pid % 3 == shard for pid in person_ids)
+        shards.append(index)
+
+    assert sum(len(index) for index in shards) == len(source.person_ids)
+    assert sum(index.people for index in shards) == len(np.unique(source.person_ids))
+
+def test_incremental_add_and_remove(source):
+    index = GalleryIndex(backend="exact", shared_dir="")
+    index.build(source)
+    version = index.version
+    new_person = np.random.default_rng(1).normal(size=(3, 64)).astype(np.float32)
+
+    index.add_person(10_000, "newcomer", new_person, version + 1)
+    assert index.version == version + 1
+    assert index.search(new_person[0], k=1)[0][0]["person_id"] == 10_000
+
+    index.remove_person(10_000, version + 2)
+    assert index.search(new_person[0], k=1)[0][0]["person_id"] != 10_000
+    assert len(index) == len(source.person_ids)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.metrics import route_label
+
+def make_client() -> TestClient:
+    router = APIRouter()
+
+    @router.get("/person/{person_id}/faces/{face_id}")
+    async def face(person_id: int, face_id: int, request: Request):
+        return {"route": route_label(request.scope)}
+
+    @router.get("/person/{name}")
+    async def person(name: str, request: Request):
+        return {"route": route_label(request.scope)}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    return TestClient(app)
+
+def test_route_label_keeps_the_router_prefix():
+    assert make_client().get("/api/v1/person/7/faces/3").json() == {"route": "/api/v1/person/{person_id}/faces/{face_id}"}
+
+def test_route_label_with_repeated_parameter_values():
+    assert make_client().get("/api/v1/person/1/faces/1").json() == {"route": "/api/v1/person/{person_id}/faces/{face_id}"}
+
+def test_route_label_with_a_value_equal_to_a_literal_segment():
+    assert make_client().get("/api/v1/person/person").json() == {"route": "/api/v1/person/{name}"}
+    assert make_client().get("/api/v1/person/api").json() == {"route": "/api/v1/person/{name}"}
+
+def test_route_label_of_unmatched_requests():
+    assert route_label({"path": "/nope"}) == "unmatched"